@@ -0,0 +1,119 @@
+"""
+Show how the ``0004_hot_path_indexes`` migration changes the query plans and
+timings of the ranking and filtering hot paths.
+
+A throwaway SQLite database is seeded and migrated back to ``0003`` where every
+query is explained and timed, then the migration is applied and the same queries
+are run again::
+
+    python -m benchmarks.query_plans --users 2000 --submissions 100000
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.utils import seed, setup_django
+
+Query = Tuple[str, List[Any]]
+
+
+def get_queries() -> Dict[str, Query]:
+    """Build the SQL of every hot path query"""
+    from django.db.models import Value
+    from django.db.models.functions import Lower
+
+    from leaderboard.models import Competition, Submission, User
+    from leaderboard.rankings import (
+        MINIMUM_SUBMISSIONS,
+        RANKED_SUBMISSION_LIMIT,
+        _get_rankings_sql,
+    )
+
+    # Only select the columns that exist before and after the migrations
+    user = User.objects.only('id', 'username').order_by('?').first()
+    competition = Competition.objects.order_by('?').first()
+
+    querysets = {
+        'User top submissions': Submission.objects.filter(user=user)
+        .order_by('-score')
+        .values_list('score', flat=True)[:RANKED_SUBMISSION_LIMIT],
+        'Competition top submissions': Submission.objects.filter(
+            competition=competition
+        ).order_by('-score')[:RANKED_SUBMISSION_LIMIT],
+        'Submissions page by score': Submission.objects.order_by('score').values(
+            'id', 'name', 'user__username', 'competition__name'
+        )[:20],
+        'User by username': User.objects.only('id', 'username')
+        .annotate(username_lower=Lower('username'))
+        .filter(username_lower=Lower(Value(user.username.upper()))),
+    }
+
+    queries = {
+        name: queryset.query.sql_with_params() for name, queryset in querysets.items()
+    }
+    queries['Rankings'] = (
+        _get_rankings_sql(),
+        [RANKED_SUBMISSION_LIMIT, MINIMUM_SUBMISSIONS],
+    )
+
+    return queries
+
+
+def measure(queries: Dict[str, Query], repeat: int) -> Dict[str, Tuple[str, float]]:
+    """Explain and time each query, returning its plan and median milliseconds"""
+    from django.db import connection
+
+    results = {}
+    with connection.cursor() as cursor:
+        for name, (sql, params) in queries.items():
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = '; '.join(str(row[-1]) for row in cursor.fetchall())
+
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+
+            results[name] = (plan, statistics.median(timings))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--competitions', type=int, default=500)
+    parser.add_argument('--submissions', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'benchmark.sqlite3'))
+
+        from django.core.management import call_command
+
+        # Seed with the current models then keep the data while migrating back
+        call_command('migrate', verbosity=0)
+        seed(args.users, args.competitions, args.submissions)
+        call_command('migrate', 'leaderboard', '0003', verbosity=0)
+
+        queries = get_queries()
+        before = measure(queries, args.repeat)
+        call_command('migrate', 'leaderboard', '0004', verbosity=0)
+        after = measure(queries, args.repeat)
+
+    for name in queries:
+        (plan_before, ms_before), (plan_after, ms_after) = before[name], after[name]
+        print(f'{name}: {ms_before:.2f}ms -> {ms_after:.2f}ms')
+        print(f'  before: {plan_before}')
+        print(f'  after:  {plan_after}')
+
+
+if __name__ == '__main__':
+    main()
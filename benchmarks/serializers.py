@@ -0,0 +1,111 @@
+"""
+Compare the throughput of the DRF model serializers with the ``.values()``
+serializers used by the list endpoints.
+
+Each size is fetched, serialised and rendered to JSON both ways from a throwaway
+SQLite database and the rendered bodies are checked to be identical::
+
+    python -m benchmarks.serializers --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.utils import seed, setup_django
+
+
+def measure(build: Callable[[], bytes], repeat: int) -> Tuple[bytes, float]:
+    """Run ``build`` several times, returning its result and median seconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = build()
+        timings.append(time.perf_counter() - started)
+
+    return body, statistics.median(timings)
+
+
+def get_cases(size: int) -> Dict[str, Tuple[Callable[[], bytes], Callable[[], bytes]]]:
+    """Build the model serializer and values serializer renders of each endpoint"""
+    from rest_framework.renderers import JSONRenderer
+
+    from leaderboard.apis.rest_api import RankingSerializer, SubmissionSerializer
+    from leaderboard.apis.values_serializers import (
+        RankingValuesSerializer,
+        SubmissionValuesSerializer,
+    )
+    from leaderboard.services import RankingService, SubmissionService
+
+    render = JSONRenderer().render
+    # Both ways are timed from the query, .all() stops results being cached
+    submissions = SubmissionService.get_submissions().order_by('score', 'id')[:size]
+    rankings = RankingService.get_rankings()[:size]
+
+    return {
+        'submissions': (
+            lambda: render(SubmissionSerializer(submissions.all(), many=True).data),
+            lambda: render(
+                SubmissionValuesSerializer(
+                    submissions.values(*SubmissionValuesSerializer.values), many=True
+                ).data
+            ),
+        ),
+        'rankings': (
+            lambda: render(RankingSerializer(rankings.all(), many=True).data),
+            lambda: render(
+                RankingValuesSerializer(
+                    rankings.values(*RankingValuesSerializer.values), many=True
+                ).data
+            ),
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'benchmark.sqlite3'))
+
+        from django.core.management import call_command
+
+        from leaderboard.models import User, UserRanking
+
+        call_command('migrate', verbosity=0)
+        largest = max(args.sizes)
+        seed(largest, max(largest // 100, 1), largest)
+        # Rank every user so the rankings can be read at every size
+        UserRanking.objects.bulk_create(
+            [
+                UserRanking(user_id=user_id, total_score=0, submission_count=0, rank=1)
+                for user_id in User.objects.values_list('id', flat=True)
+            ],
+            batch_size=1000,
+        )
+
+        results: List[str] = []
+        for size in args.sizes:
+            for name, (model_build, values_build) in get_cases(size).items():
+                model_body, model_seconds = measure(model_build, args.repeat)
+                values_body, values_seconds = measure(values_build, args.repeat)
+                if model_body != values_body:
+                    raise AssertionError(f'{name} renders differ at {size} rows')
+
+                results.append(
+                    f'{name} x {size}: {size / model_seconds:,.0f} rows/s -> '
+                    f'{size / values_seconds:,.0f} rows/s '
+                    f'({model_seconds / values_seconds:.1f}x)'
+                )
+
+    print('\n'.join(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+Time the leaderboard's hot paths at realistic scale and fail on regressions.
+
+A throwaway database is seeded with the given amount of submissions, then each case
+is run cold, with the cache cleared, recording its query count, median wall time and
+peak Python memory. The results are compared with a stored baseline::
+
+    python -m benchmarks.suite --submissions 10000 100000 1000000
+    python -m benchmarks.suite --postgres --submissions 100000
+    python -m benchmarks.suite --submissions 10000 --update-baseline
+
+A case regresses when it makes more queries than its baseline, or takes more time or
+memory than its baseline multiplied by ``--tolerance``. Timings depend on the
+machine so the stored baseline should be refreshed with ``--update-baseline`` when
+the benchmarks are first run somewhere new.
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.utils import benchmark_database, seed
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+Result = Dict[str, float]
+Case = Callable[[], object]
+
+
+def measure(case: Case, repeat: int) -> Result:
+    """
+    Run a case cold ``repeat`` times for its timing and once more for its memory
+
+    :param case: The callable to measure.
+    :param repeat: The amount of timed runs.
+    :return: The query count, median seconds and peak memory in KiB of the case.
+    """
+    from django.core.cache import cache
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    for _ in range(repeat):
+        cache.clear()
+        # The query log is capped so it has to be emptied for every query to count
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            case()
+            timings.append(time.perf_counter() - started)
+        # The captured queries are read from the log lazily so count them now
+        query_count = len(queries)
+
+    # Tracing slows everything down so memory is measured in a separate run
+    cache.clear()
+    tracemalloc.start()
+    try:
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'queries': query_count,
+        'seconds': round(statistics.median(timings), 6),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def get_cases(client) -> Dict[str, Case]:
+    """Build the cases, reading the IDs used by the retrieve endpoints up front"""
+    from django.urls import reverse
+
+    from leaderboard.models import Competition, Submission, User
+    from leaderboard.services import UserService
+
+    user_id = User.objects.order_by('username').values_list('id', flat=True)[0]
+    competition_id = Competition.objects.order_by('name').values_list('id', flat=True)[
+        0
+    ]
+    submission_id = Submission.objects.order_by('name').values_list('id', flat=True)[0]
+
+    def get(url: str) -> Case:
+        def request() -> object:
+            response = client.get(url)
+            if response.status_code != 200:
+                raise AssertionError(f'{url} responded {response.status_code}')
+            # Consume streamed bodies so they are part of the measurement
+            return response.getvalue()
+
+        return request
+
+    return {
+        'get_user_rankings': UserService.get_user_rankings,
+        'users list': get('/api/users/'),
+        'users retrieve': get(f'/api/users/{user_id}/'),
+        'competitions list': get('/api/competitions/'),
+        'competitions retrieve': get(f'/api/competitions/{competition_id}/'),
+        'competition rankings': get(f'/api/competitions/{competition_id}/rankings/'),
+        'submissions list': get('/api/submissions/'),
+        'submissions retrieve': get(f'/api/submissions/{submission_id}/'),
+        'rankings': get('/api/submissions/rankings/'),
+        'rankings stream': get('/api/submissions/rankings/?stream=true'),
+        'leaderboard page': get(reverse('leaderboard')),
+        'leaderboard data': get(reverse('leaderboard-data')),
+    }
+
+
+def write_import_file(
+    path: str, prefix: str, users: int, submissions_per_user: int
+) -> None:
+    """Write a gzipped import file in the format of ``resources/scores.json``"""
+    with gzip.open(path, 'wt') as json_file:
+        json.dump(
+            [
+                {
+                    'name': f'{prefix.title()} User{user}',
+                    'submissions': [
+                        {
+                            'score': 100 + (user * 7919 + index * 104729) % 9900,
+                            'name': f'{prefix} {user}-{index} '
+                            f'in "imported {index % 50}"',
+                        }
+                        for index in range(submissions_per_user)
+                    ],
+                }
+                for user in range(users)
+            ],
+            json_file,
+        )
+
+
+def run(submissions: int, repeat: int) -> Dict[str, Result]:
+    """Seed the database with ``submissions`` and measure every case"""
+    from django.core.management import call_command
+    from django.test import Client
+
+    from leaderboard.models import Competition, Submission, User, UserRanking
+    from leaderboard.services import RankingService
+
+    # Start from an empty database at every scale
+    for model in [UserRanking, Submission, Competition, User]:
+        model.objects.all().delete()
+    seed(max(submissions // 50, 10), max(submissions // 500, 5), submissions)
+    RankingService.rebuild_rankings()
+
+    client = Client()
+    results = {name: measure(case, repeat) for name, case in get_cases(client).items()}
+
+    # Importing writes to the database so it is measured last, with a new file for
+    # the timed run and the memory run so neither only finds duplicates
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for prefix in ['timed', 'traced']:
+            path = os.path.join(directory, f'{prefix}.json.gz')
+            write_import_file(path, prefix, max(submissions // 500, 1), 50)
+            paths.append(path)
+
+        results['import_user_submissions'] = measure(
+            lambda: call_command(
+                'import_user_submissions', paths.pop(0), bulk=True, stdout=io.StringIO()
+            ),
+            1,
+        )
+
+    return results
+
+
+def compare(
+    baseline: Dict[str, Result], results: Dict[str, Result], tolerance: float
+) -> List[str]:
+    """
+    Find the cases that regressed from their baseline
+
+    :return: A description of each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+
+        if result['queries'] > expected['queries']:
+            regressions.append(
+                f'{name}: {result["queries"]} queries, baseline {expected["queries"]}'
+            )
+        for metric, slack in [('seconds', 0.01), ('peak_kib', 64)]:
+            # A little slack stops noise failing the cases that are only a few
+            # milliseconds or kilobytes
+            if result[metric] > expected[metric] * tolerance + slack:
+                regressions.append(
+                    f'{name}: {result[metric]} {metric}, baseline {expected[metric]}'
+                )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--submissions', type=int, nargs='+', default=[10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        '--postgres',
+        action='store_true',
+        help='Run against PostgreSQL using the DATABASE_* environment variables',
+    )
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=1.5,
+        help='How many times slower or larger than its baseline a case may be',
+    )
+    args = parser.parse_args()
+
+    engine = 'postgresql' if args.postgres else 'sqlite'
+    try:
+        with open(args.baseline) as baseline_file:
+            baselines = json.load(baseline_file)
+    except FileNotFoundError:
+        baselines = {}
+
+    regressions = []
+    with benchmark_database(postgres=args.postgres):
+        from django.test.utils import setup_test_environment
+
+        # Let the test client talk to the site
+        setup_test_environment()
+
+        for submissions in args.submissions:
+            results = run(submissions, args.repeat)
+            key = str(submissions)
+
+            print(f'{engine} x {submissions} submissions')
+            for name, result in results.items():
+                print(
+                    f'  {name}: {result["queries"]} queries, '
+                    f'{result["seconds"] * 1000:.1f}ms, {result["peak_kib"]:.0f}KiB'
+                )
+
+            if args.update_baseline:
+                baselines.setdefault(engine, {})[key] = results
+            else:
+                baseline = baselines.get(engine, {}).get(key, {})
+                regressions += [
+                    f'{engine} x {submissions}: {regression}'
+                    for regression in compare(baseline, results, args.tolerance)
+                ]
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f'Baseline written to {args.baseline}')
+
+    if regressions:
+        print('Regressions:\n  ' + '\n  '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Helpers shared by the benchmarks to run against a throwaway database
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+import django
+
+
+def setup_django(database_name: str) -> None:
+    """
+    Configure Django to use a new SQLite database at ``database_name``
+
+    This has to be called before any models are imported.
+    """
+    os.environ['DATABASE_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ['DATABASE_NAME'] = database_name
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+    django.setup()
+
+
+@contextmanager
+def benchmark_database(postgres: bool = False) -> Iterator[None]:
+    """
+    Set up Django against a new, migrated database that is dropped afterwards
+
+    SQLite databases are created in a temporary directory. PostgreSQL databases are
+    created next to the one configured by the ``DATABASE_*`` environment variables,
+    like the test runner does, so that server has to be running.
+
+    :param postgres: Whether to use PostgreSQL instead of SQLite.
+    """
+    if not postgres:
+        with tempfile.TemporaryDirectory() as directory:
+            setup_django(os.path.join(directory, 'benchmark.sqlite3'))
+
+            from django.core.management import call_command
+
+            call_command('migrate', verbosity=0)
+            yield
+        return
+
+    os.environ['DATABASE_ENGINE'] = 'django.db.backends.postgresql'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+    django.setup()
+
+    from django.db import connection
+
+    name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(name, verbosity=0)
+
+
+def seed(
+    users: int,
+    competitions: int,
+    submissions: int,
+    random_seed: int = 0,
+    batch_size: int = 5000,
+) -> None:
+    """
+    Fill the database with random users, competitions and submissions using the
+    generators behind the ``generate_submissions`` command
+
+    Submissions are generated and written a batch at a time so memory use does not
+    grow with the amount of rows, and passwords are left unusable instead of hashed.
+    The same seed always spreads the same scores between the same users and
+    competitions.
+    """
+    from leaderboard.generators import (
+        create_competitions,
+        create_users,
+        generate_submission_rows,
+        write_submission_rows,
+    )
+
+    user_ids = create_users(users, 'benchmark', batch_size)
+    competition_ids = create_competitions(competitions, 'benchmark', batch_size)
+    rows = generate_submission_rows(
+        count=submissions,
+        prefix='benchmark',
+        user_ids=user_ids,
+        competition_ids=competition_ids,
+        seed=random_seed,
+    )
+    write_submission_rows(rows, batch_size)
@@ -48,6 +48,19 @@ DATABASES = {
 }
 DATABASES['default']['ATOMIC_REQUESTS'] = True
 
+# CACHES
+# ------------------------------------------------------------------------------
+# The leaderboard version counters live in the cache, so it must be shared by every
+# worker process and management command. The default file cache is shared by the
+# processes of one host, set CACHE_URL to a cache like Redis
+# (rediscache://127.0.0.1:6379/1, which needs django-redis) to share it between hosts
+CACHES = {
+    'default': env.cache(
+        'CACHE_URL',
+        default=f'filecache://{os.path.join(ROOT_DIR, ".cache")}?max_entries=10000',
+    )
+}
+
 # URLS
 # ------------------------------------------------------------------------------
 ROOT_URLCONF = 'config.urls'
@@ -102,6 +115,8 @@ AUTH_PASSWORD_VALIDATORS = [
 # MIDDLEWARE
 # ------------------------------------------------------------------------------
 MIDDLEWARE = [
+    'leaderboard.metrics.MetricsMiddleware',
+    'leaderboard.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -137,9 +152,16 @@ TEMPLATES = [
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [str(APPS_DIR / 'templates')],
         'OPTIONS': {
+            # Compiled templates are kept in memory, local.py turns this off so
+            # template changes show up without a restart
             'loaders': [
-                'django.template.loaders.filesystem.Loader',
-                'django.template.loaders.app_directories.Loader',
+                (
+                    'django.template.loaders.cached.Loader',
+                    [
+                        'django.template.loaders.filesystem.Loader',
+                        'django.template.loaders.app_directories.Loader',
+                    ],
+                )
             ],
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -214,9 +236,63 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [],
     'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.AllowAny',),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'leaderboard.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ),
 }
 
 CORS_URLS_REGEX = r'^/api/.*$'
+
+# LEADERBOARD
+# ------------------------------------------------------------------------------
+# How long a calculated leaderboard is cached for, it is invalidated on every write
+LEADERBOARD_CACHE_TIMEOUT = env.int('LEADERBOARD_CACHE_TIMEOUT', default=60 * 60)
+# How long a worker may spend rebuilding the leaderboard before others join in
+LEADERBOARD_CACHE_LOCK_TIMEOUT = env.int('LEADERBOARD_CACHE_LOCK_TIMEOUT', default=30)
+# How often workers waiting on a rebuild check whether it has finished
+LEADERBOARD_CACHE_LOCK_POLL_INTERVAL = env.float(
+    'LEADERBOARD_CACHE_LOCK_POLL_INTERVAL', default=0.05
+)
+# The fraction of requests timed with Server-Timing headers and a log line, from 0
+# to 1
+LEADERBOARD_TIMING_SAMPLE_RATE = env.float('LEADERBOARD_TIMING_SAMPLE_RATE', default=0)
+# Queries slower than this many milliseconds are logged with their plan and added
+# to the slow_queries report, 0 turns this off
+LEADERBOARD_SLOW_QUERY_THRESHOLD = env.float(
+    'LEADERBOARD_SLOW_QUERY_THRESHOLD', default=200
+)
+# Explain slow queries with EXPLAIN ANALYZE on PostgreSQL, which runs them again
+LEADERBOARD_SLOW_QUERY_EXPLAIN_ANALYZE = env.bool(
+    'LEADERBOARD_SLOW_QUERY_EXPLAIN_ANALYZE', default=False
+)
+# How many of the slowest queries the slow_queries report keeps
+LEADERBOARD_SLOW_QUERY_REPORT_SIZE = env.int(
+    'LEADERBOARD_SLOW_QUERY_REPORT_SIZE', default=20
+)
+# How many seconds a running import can go without committing a batch before
+# --resume treats the process running it as dead
+LEADERBOARD_IMPORT_STALE_AFTER = env.int(
+    'LEADERBOARD_IMPORT_STALE_AFTER', default=15 * 60
+)
+# The addresses or networks that can scrape /metrics/, along with staff users and
+# requests with an "Authorization: Bearer" header holding LEADERBOARD_METRICS_TOKEN
+LEADERBOARD_METRICS_ALLOWED_IPS = env.list(
+    'LEADERBOARD_METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1']
+)
+LEADERBOARD_METRICS_TOKEN = env('LEADERBOARD_METRICS_TOKEN', default=None)
+# The Cache-Control directives of the endpoints that answer conditional requests
+# with the leaderboard version, by default clients revalidate with the ETag before
+# reusing a response
+LEADERBOARD_CACHE_CONTROL = {
+    'default': {'public': True, 'no_cache': True},
+    'rankings': {
+        'public': True,
+        'max_age': env.int('LEADERBOARD_RANKINGS_MAX_AGE', default=0),
+        'must_revalidate': True,
+    },
+    'leaderboard': {
+        'public': True,
+        'max_age': env.int('LEADERBOARD_PAGE_MAX_AGE', default=0),
+        'must_revalidate': True,
+    },
+}
@@ -6,14 +6,12 @@ from .base import env
 DEBUG = True
 ALLOWED_HOSTS = ['*']
 
-# CACHES
+# TEMPLATES
 # ------------------------------------------------------------------------------
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': '',
-    }
-}
+TEMPLATES[-1]['OPTIONS']['loaders'] = [  # type: ignore[index] # noqa F405
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 
 # EMAIL
 # ------------------------------------------------------------------------------
@@ -56,3 +54,8 @@ CORS_EXPOSE_HEADERS = env.list(
 SESSION_COOKIE_DOMAIN = env('SESSION_COOKIE_DOMAIN', default=None)
 SESSION_COOKIE_SAMESITE = env('SESSION_COOKIE_SAMESITE', default='Lax')
 CSRF_COOKIE_DOMAIN = env('CSRF_COOKIE_DOMAIN', default=None)
+
+# LEADERBOARD
+# ------------------------------------------------------------------------------
+# Time every request in development
+LEADERBOARD_TIMING_SAMPLE_RATE = env.float('LEADERBOARD_TIMING_SAMPLE_RATE', default=1)
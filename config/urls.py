@@ -4,13 +4,32 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views import defaults as default_views
 
-from leaderboard.views import HomeView, LeaderboardView
+from leaderboard.views import (
+    CompetitionLeaderboardDataView,
+    CompetitionLeaderboardView,
+    HomeView,
+    LeaderboardDataView,
+    LeaderboardView,
+    MetricsView,
+)
 
 urlpatterns = [
     # Django Admin, use {% url 'admin:index' %}
     path(settings.ADMIN_URL, admin.site.urls),
     path('', HomeView.as_view(), name='home'),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/data/', LeaderboardDataView.as_view(), name='leaderboard-data'),
+    path(
+        'competitions/<uuid:competition_id>/rankings/',
+        CompetitionLeaderboardView.as_view(),
+        name='competition-leaderboard',
+    ),
+    path(
+        'competitions/<uuid:competition_id>/rankings/data/',
+        CompetitionLeaderboardDataView.as_view(),
+        name='competition-leaderboard-data',
+    ),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ] + static(
     settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
 )  # type: ignore
@@ -0,0 +1,30 @@
+"""
+Gunicorn settings, read from the working directory when ``gunicorn`` starts
+
+The workers write their Prometheus metrics to files in ``PROMETHEUS_MULTIPROC_DIR``
+so ``/metrics/`` reports the totals of every worker, whichever one answers.
+"""
+
+import os
+import shutil
+import tempfile
+
+# This has to be set before prometheus_client is imported by the workers
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'photocrowd-metrics'),
+)
+
+
+def on_starting(server) -> None:
+    """Start from empty metrics as the counters of a previous run are finished"""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker) -> None:
+    """Stop counting the open database connections of a worker that has exited"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
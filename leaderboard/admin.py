@@ -1,13 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DefaultUserAdmin
 
-from .models import Competition, Submission, User
+from .models import Competition, ImportRun, Submission, User, UserRanking
 
 
 class UserAdmin(DefaultUserAdmin):
     model = User
     list_display = [
         'username',
+        'submission_count',
+        'top24_score',
         'is_staff',
         'is_active',
         'last_login',
@@ -22,8 +24,10 @@ class UserAdmin(DefaultUserAdmin):
             None,
             {'fields': ('username', 'password')},
         ),
+        ('Scores', {'fields': ['submission_count', 'top24_score']}),
         ('Permissions', {'fields': ['is_staff', 'is_superuser', 'is_active']}),
     ]
+    readonly_fields = ['submission_count', 'top24_score']
     add_fieldsets = [
         (
             'User Details',
@@ -66,6 +70,34 @@ class SubmissionAdmin(admin.ModelAdmin):
     ordering = ['name']
 
 
+class UserRankingAdmin(admin.ModelAdmin):
+    model = UserRanking
+    list_display = ['rank', 'user', 'total_score', 'submission_count']
+    list_select_related = ['user']
+    search_fields = ['user__username']
+    ordering = ['rank']
+    readonly_fields = ['user', 'total_score', 'submission_count', 'rank']
+
+
+class ImportRunAdmin(admin.ModelAdmin):
+    model = ImportRun
+    list_display = [
+        'created_at',
+        'file_name',
+        'status',
+        'records_processed',
+        'submissions_created',
+        'duplicates',
+        'failures',
+        'records_per_second',
+    ]
+    list_filter = ['status']
+    search_fields = ['file_name', 'file_hash']
+    ordering = ['-created_at']
+
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Competition, CompetitionAdmin)
 admin.site.register(Submission, SubmissionAdmin)
+admin.site.register(UserRanking, UserRankingAdmin)
+admin.site.register(ImportRun, ImportRunAdmin)
@@ -1,7 +1,8 @@
-from typing import Union
+from typing import Callable, List, Union
 from uuid import UUID
 
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.utils.decorators import method_decorator
 from rest_framework import exceptions as rest_exceptions
 from rest_framework import serializers
 from rest_framework.decorators import action
@@ -9,9 +10,66 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
-from leaderboard.models import Competition, Submission, User
-from leaderboard.pagination import HeaderLimitOffsetPagination, get_paginated_response
-from leaderboard.services import CompetitionService, SubmissionService, UserService
+from leaderboard.apis.values_serializers import (
+    CompetitionValuesSerializer,
+    RankingRowSerializer,
+    RankingValuesSerializer,
+    Row,
+    SubmissionValuesSerializer,
+    UserValuesSerializer,
+    attach_submissions,
+)
+from leaderboard.conditional import (
+    get_rankings_etag,
+    get_rankings_last_modified,
+    get_users_etag,
+    get_users_last_modified,
+    leaderboard_conditional,
+)
+from leaderboard.models import Competition, Submission, User, UserRanking
+from leaderboard.pagination import (
+    HeaderLimitOffsetPagination,
+    KeysetPagination,
+    RankingPagination,
+    get_paginated_response,
+)
+from leaderboard.rankings import RankingWindow
+from leaderboard.renderers import get_streaming_response
+from leaderboard.services import (
+    CompetitionService,
+    RankingService,
+    SubmissionService,
+    UserService,
+)
+from leaderboard.timing import span
+
+DEFAULT_SUBMISSIONS_LIMIT = 20
+"""How many submissions are nested in each user or competition by default"""
+
+MAX_SUBMISSIONS_LIMIT = 100
+"""The most submissions that can be nested in each user or competition, the rest
+can be paged through with the submissions endpoint"""
+
+
+def prefetch_submission_values(
+    parent_field: str, limit: int
+) -> Callable[[List[Row]], None]:
+    """
+    Build a prefetch for :func:`get_paginated_response` that attaches up to
+    ``limit`` submission rows to each ``.values()`` row of a page of parents
+    """
+
+    def prefetch(page: List[Row]) -> None:
+        submissions = SubmissionService.get_submissions_per_parent(
+            parent_field=parent_field,
+            parent_ids=[row['id'] for row in page],
+            limit=limit,
+        )
+        attach_submissions(
+            page, submissions.values(*SubmissionValuesSerializer.values), parent_field
+        )
+
+    return prefetch
 
 
 class BaseFilterSerializer(serializers.Serializer):
@@ -45,15 +103,36 @@ class APIErrorsMixin:
         return super().handle_exception(exception)  # type: ignore
 
 
-class UserFilterSerializer(BaseFilterSerializer):
+class SubmissionsLimitSerializer(serializers.Serializer):
+    """Serializer for the cap on the nested submissions of each result"""
+
+    submissions_limit = serializers.IntegerField(
+        required=False,
+        default=DEFAULT_SUBMISSIONS_LIMIT,
+        min_value=1,
+        max_value=MAX_SUBMISSIONS_LIMIT,
+    )
+
+
+class UserFilterSerializer(SubmissionsLimitSerializer, BaseFilterSerializer):
     username = serializers.CharField(required=False)
 
 
-class CompetitionFilterSerializer(BaseFilterSerializer):
+class CompetitionFilterSerializer(SubmissionsLimitSerializer, BaseFilterSerializer):
     name = serializers.CharField(required=False)
 
 
-class SubmissionFilterSerializer(BaseFilterSerializer):
+class StreamSerializer(serializers.Serializer):
+    """Serializer for asking for every row to be streamed instead of paginated"""
+
+    stream = serializers.BooleanField(required=False, default=False)
+
+
+class RankingsFilterSerializer(StreamSerializer):
+    window = serializers.ChoiceField(choices=RankingWindow.choices, required=False)
+
+
+class SubmissionFilterSerializer(StreamSerializer, BaseFilterSerializer):
     user_id = serializers.UUIDField(required=False)
     competition_id = serializers.UUIDField(required=False)
 
@@ -103,95 +182,173 @@ class CompetitionSerializer(serializers.ModelSerializer):
 
 
 class RankingSerializer(serializers.ModelSerializer):
-    id = serializers.UUIDField()
-    username = serializers.CharField()
-    total_score = serializers.IntegerField()
-    rank = serializers.IntegerField()
+    id = serializers.UUIDField(source='user_id')
+    username = serializers.CharField(source='user.username')
 
     class Meta:
-        model = User
+        model = UserRanking
         fields = ['id', 'username', 'total_score', 'rank']
 
 
 class UserViewSet(APIErrorsMixin, ViewSet):
     queryset = User.objects.all()
+    lookup_url_kwarg = 'user_id'
 
+    @method_decorator(
+        leaderboard_conditional(
+            'users',
+            etag_func=get_users_etag,
+            last_modified_func=get_users_last_modified,
+        )
+    )
     def list(self, request: Request) -> Response:
-        """List all :class:`User`\s"""
+        """
+        List all :class:`User`\s with up to ``?submissions_limit=`` of each of their
+        :class:`Submission`\s
+        """
         filters_serializer = UserFilterSerializer(data=request.query_params)
         filters_serializer.is_valid(raise_exception=True)
 
-        users = UserService.get_users(filters=filters_serializer.validated_data)
+        filters = filters_serializer.validated_data
+        submissions_limit = filters.pop('submissions_limit')
+
+        users = UserService.get_users(filters=filters)
 
         return get_paginated_response(
-            pagination_class=HeaderLimitOffsetPagination,
-            serializer_class=UserSerializer,
-            queryset=users,
+            pagination_class=KeysetPagination,
+            serializer_class=UserValuesSerializer,
+            queryset=users.values(*UserValuesSerializer.values),
             request=request,
             view=self,
+            prefetch=prefetch_submission_values('user', submissions_limit),
         )
 
     def retrieve(self, request: Request, user_id: Union[str, UUID]) -> Response:
         """
-        Retrieve a specific :class:`User` based on it's ID
+        Retrieve a specific :class:`User` based on it's ID with up to
+        ``?submissions_limit=`` of their :class:`Submission`\s
 
         :param user_id: The ID of the :class:`User` to retrieve
         """
+        limit_serializer = SubmissionsLimitSerializer(data=request.query_params)
+        limit_serializer.is_valid(raise_exception=True)
+
         user = UserService.get_user(user_id=user_id)
+        UserService.prefetch_submissions(
+            users=[user], limit=limit_serializer.validated_data['submissions_limit']
+        )
 
         serializer = UserSerializer(user)
 
-        return Response(serializer.data)
+        with span('serialize'):
+            data = serializer.data
+
+        return Response(data)
 
 
 class CompetitionViewSet(APIErrorsMixin, ViewSet):
     queryset = Competition.objects.all()
+    lookup_url_kwarg = 'competition_id'
 
+    @method_decorator(leaderboard_conditional('competitions'))
     def list(self, request: Request) -> Response:
-        """List all :class:`Competition`\s"""
+        """
+        List all :class:`Competition`\s with up to ``?submissions_limit=`` of each of
+        their :class:`Submission`\s
+        """
         filters_serializer = CompetitionFilterSerializer(data=request.query_params)
         filters_serializer.is_valid(raise_exception=True)
 
-        competitions = CompetitionService.get_competitions(
-            filters=filters_serializer.validated_data
-        )
+        filters = filters_serializer.validated_data
+        submissions_limit = filters.pop('submissions_limit')
+
+        competitions = CompetitionService.get_competitions(filters=filters)
 
         return get_paginated_response(
-            pagination_class=HeaderLimitOffsetPagination,
-            serializer_class=CompetitionSerializer,
-            queryset=competitions,
+            pagination_class=KeysetPagination,
+            serializer_class=CompetitionValuesSerializer,
+            queryset=competitions.values(*CompetitionValuesSerializer.values),
             request=request,
             view=self,
+            prefetch=prefetch_submission_values('competition', submissions_limit),
         )
 
     def retrieve(self, request: Request, competition_id: Union[str, UUID]) -> Response:
         """
-        Retrieve a specific :class:`Competition` based on it's ID
+        Retrieve a specific :class:`Competition` based on it's ID with up to
+        ``?submissions_limit=`` of its :class:`Submission`\s
 
         :param cpmpetition_id: The ID of the :class:`Competition` to retrieve
         """
+        limit_serializer = SubmissionsLimitSerializer(data=request.query_params)
+        limit_serializer.is_valid(raise_exception=True)
+
         competition = CompetitionService.get_competition(competition_id=competition_id)
+        CompetitionService.prefetch_submissions(
+            competitions=[competition],
+            limit=limit_serializer.validated_data['submissions_limit'],
+        )
 
         serializer = CompetitionSerializer(competition)
 
-        return Response(serializer.data)
+        with span('serialize'):
+            data = serializer.data
+
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    @method_decorator(leaderboard_conditional('rankings'))
+    def rankings(self, request: Request, competition_id: Union[str, UUID]) -> Response:
+        """
+        List the rankings of the :class:`User`\s who entered a specific
+        :class:`Competition`, ranked by their best submissions to it
+
+        :param competition_id: The ID of the :class:`Competition` to rank
+        """
+        rankings = RankingService.get_competition_rankings(
+            competition_id=competition_id
+        )
+        if not rankings:
+            # Only look the competition up to tell an empty one from a missing one
+            CompetitionService.get_competition(competition_id=competition_id)
+
+        return get_paginated_response(
+            pagination_class=HeaderLimitOffsetPagination,
+            serializer_class=RankingRowSerializer,
+            queryset=rankings,
+            request=request,
+            view=self,
+        )
 
 
 class SubmissionViewSet(APIErrorsMixin, ViewSet):
     queryset = Submission.objects.all()
+    lookup_url_kwarg = 'submission_id'
 
+    @method_decorator(leaderboard_conditional('submissions'))
     def list(self, request: Request) -> Response:
-        """List all :class:`Submission`\s"""
+        """
+        List all :class:`Submission`\s, or stream every one of them with
+        ``?stream=true``
+        """
         filters_serializer = SubmissionFilterSerializer(data=request.query_params)
         filters_serializer.is_valid(raise_exception=True)
 
-        submissions = SubmissionService.get_submissions(
-            filters=filters_serializer.validated_data
+        filters = filters_serializer.validated_data
+        stream = filters.pop('stream')
+
+        submissions = SubmissionService.get_submissions(filters=filters).values(
+            *SubmissionValuesSerializer.values
         )
 
+        if stream:
+            return get_streaming_response(
+                serializer_class=SubmissionValuesSerializer, queryset=submissions
+            )
+
         return get_paginated_response(
-            pagination_class=HeaderLimitOffsetPagination,
-            serializer_class=SubmissionSerializer,
+            pagination_class=KeysetPagination,
+            serializer_class=SubmissionValuesSerializer,
             queryset=submissions,
             request=request,
             view=self,
@@ -207,12 +364,60 @@ class SubmissionViewSet(APIErrorsMixin, ViewSet):
 
         serializer = SubmissionSerializer(submission)
 
-        return Response(serializer.data)
+        with span('serialize'):
+            data = serializer.data
+
+        return Response(data)
 
     @action(detail=False, methods=['get'])
+    @method_decorator(
+        leaderboard_conditional(
+            'rankings',
+            etag_func=get_rankings_etag,
+            last_modified_func=get_rankings_last_modified,
+        )
+    )
     def rankings(self, request: Request) -> Response:
-        rankings = UserService.get_user_rankings()
+        """
+        List the rankings of all :class:`User`\s with enough submissions
+
+        Supports limit/offset pagination, keyset pagination with ``?after_rank=``
+        and streaming the whole leaderboard with ``?stream=true``. Only the
+        submissions made this week, this month or in the last 30 days are ranked
+        with ``?window=week``, ``?window=month`` or ``?window=30d``.
+        """
+        filters_serializer = RankingsFilterSerializer(data=request.query_params)
+        filters_serializer.is_valid(raise_exception=True)
+
+        stream = filters_serializer.validated_data['stream']
+        window = filters_serializer.validated_data.get('window')
 
-        output_serializer = RankingSerializer(rankings, many=True)
+        if window is not None:
+            rows = UserService.get_user_rankings(window=window)
+            if stream:
+                return get_streaming_response(
+                    serializer_class=RankingRowSerializer, queryset=rows
+                )
 
-        return Response(output_serializer.data)
+            return get_paginated_response(
+                pagination_class=HeaderLimitOffsetPagination,
+                serializer_class=RankingRowSerializer,
+                queryset=rows,
+                request=request,
+                view=self,
+            )
+
+        rankings = RankingService.get_rankings().values(*RankingValuesSerializer.values)
+
+        if stream:
+            return get_streaming_response(
+                serializer_class=RankingValuesSerializer, queryset=rankings
+            )
+
+        return get_paginated_response(
+            pagination_class=RankingPagination,
+            serializer_class=RankingValuesSerializer,
+            queryset=rankings,
+            request=request,
+            view=self,
+        )
@@ -0,0 +1,162 @@
+"""
+Read only serializers that build responses straight from ``.values()`` rows
+
+:class:`rest_framework.serializers.ModelSerializer` runs every attribute of every
+row through its field machinery which dominates the cost of the list endpoints once
+their queries are fast. The serializers here produce exactly the same
+representations as their counterparts in :mod:`leaderboard.apis.rest_api` from
+plain dictionaries, so a queryset only has to be turned into ``.values(*values)``
+to use them.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+from rest_framework import serializers
+
+from leaderboard.rankings import Ranking
+
+Row = Dict[str, Any]
+
+_DATETIME_FIELD = serializers.DateTimeField()
+
+
+class ValuesSerializer(ABC):
+    """Base serializer for ``.values()`` rows with the interface DRF views expect"""
+
+    values: Tuple[str, ...] = ()
+    """The fields to select for each row"""
+
+    def __init__(self, instance: Union[Row, Iterable[Row]], many: bool = False):
+        self.instance = instance
+        self.many = many
+
+    @property
+    def data(self) -> Union[Row, List[Row]]:
+        if self.many:
+            return [self.to_representation(row) for row in self.instance]
+
+        return self.to_representation(self.instance)  # type: ignore
+
+    @abstractmethod
+    def to_representation(self, row: Row) -> Row:
+        """Build the representation of a single row"""
+
+
+class SubmissionValuesSerializer(ValuesSerializer):
+    """Mirrors :class:`leaderboard.apis.rest_api.SubmissionSerializer`"""
+
+    values = (
+        'id',
+        'name',
+        'score',
+        'user_id',
+        'user__username',
+        'competition_id',
+        'competition__name',
+    )
+
+    def to_representation(self, row: Row) -> Row:
+        return {
+            'id': str(row['id']),
+            'name': row['name'],
+            'user': {'id': str(row['user_id']), 'username': row['user__username']},
+            'competition': {
+                'id': str(row['competition_id']),
+                'name': row['competition__name'],
+            },
+        }
+
+
+class UserValuesSerializer(ValuesSerializer):
+    """
+    Mirrors :class:`leaderboard.apis.rest_api.UserSerializer`, the rows need a
+    ``submissions`` list of :class:`SubmissionValuesSerializer` rows attached
+    """
+
+    values = ('id', 'username', 'email', 'last_login', 'is_superuser')
+
+    def to_representation(self, row: Row) -> Row:
+        last_login = row['last_login']
+
+        return {
+            'id': str(row['id']),
+            'username': row['username'],
+            'email': row['email'],
+            'last_login': (
+                None
+                if last_login is None
+                else _DATETIME_FIELD.to_representation(last_login)
+            ),
+            'is_superuser': row['is_superuser'],
+            'submissions': SubmissionValuesSerializer(
+                row['submissions'], many=True
+            ).data,
+        }
+
+
+class CompetitionValuesSerializer(ValuesSerializer):
+    """
+    Mirrors :class:`leaderboard.apis.rest_api.CompetitionSerializer`, the rows need
+    a ``submissions`` list of :class:`SubmissionValuesSerializer` rows attached
+    """
+
+    values = ('id', 'name')
+
+    def to_representation(self, row: Row) -> Row:
+        return {
+            'id': str(row['id']),
+            'name': row['name'],
+            'submissions': SubmissionValuesSerializer(
+                row['submissions'], many=True
+            ).data,
+        }
+
+
+class RankingValuesSerializer(ValuesSerializer):
+    """Mirrors :class:`leaderboard.apis.rest_api.RankingSerializer`"""
+
+    values = ('user_id', 'user__username', 'total_score', 'rank')
+
+    def to_representation(self, row: Row) -> Row:
+        return {
+            'id': str(row['user_id']),
+            'username': row['user__username'],
+            'total_score': row['total_score'],
+            'rank': row['rank'],
+        }
+
+
+class RankingRowSerializer(ValuesSerializer):
+    """
+    Serializes :class:`leaderboard.rankings.Ranking` rows into the same
+    representation as :class:`RankingValuesSerializer`
+    """
+
+    def to_representation(self, row: Ranking) -> Row:  # type: ignore[override]
+        return {
+            'id': str(row.id),
+            'username': row.username,
+            'total_score': row.total_score,
+            'rank': row.rank,
+        }
+
+
+def attach_submissions(
+    rows: List[Row], submissions: Iterable[Row], parent_field: str
+) -> None:
+    """
+    Attach :class:`SubmissionValuesSerializer` rows to the rows of their parents
+
+    :param rows: The rows of the :class:`leaderboard.models.User`\\s or
+        :class:`leaderboard.models.Competition`\\s.
+    :param submissions: The rows of the submissions of every parent, in order.
+    :param parent_field: The field of the parent, either ``user`` or
+        ``competition``.
+    """
+    by_parent: Dict[Any, List[Row]] = {row['id']: [] for row in rows}
+    for submission in submissions:
+        by_parent[submission[f'{parent_field}_id']].append(submission)
+
+    for row in rows:
+        row['submissions'] = by_parent[row['id']]
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LeaderboardConfig(AppConfig):
     name = 'leaderboard'
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
@@ -0,0 +1,243 @@
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .metrics import CACHE_REQUESTS, RANKINGS_BUILD_DURATION
+
+LOGGER = logging.getLogger('photocrowd')
+
+LEADERBOARD_VERSION_KEY = 'leaderboard:version'
+"""The cache key of the counter that is bumped whenever the leaderboard changes"""
+
+LEADERBOARD_MODIFIED_KEY = 'leaderboard:modified'
+"""The cache key of the time the leaderboard version was last bumped"""
+
+COMPETITION_VERSION_KEY = 'leaderboard:competition:{}:version'
+"""The cache key of the counter bumped whenever a competition's leaderboard changes"""
+
+COMPETITIONS_VERSION_KEY = 'leaderboard:competitions:version'
+"""The cache key of the counter bumped whenever every competition's leaderboard
+changes"""
+
+USERS_VERSION_KEY = 'leaderboard:users:version'
+"""The cache key of the counter bumped whenever a :class:`User` changes in a way that
+only shows in the list of users, like logging in"""
+
+USERS_MODIFIED_KEY = 'leaderboard:users:modified'
+"""The cache key of the time the users version was last bumped"""
+
+_MISSING = object()
+
+
+def _get_counter(key: str) -> int:
+    """
+    Get a version counter, seeding it with the current time so a cleared or evicted
+    cache can not hand out a version that has been used before
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def _bump_counter(key: str) -> int:
+    """Increment a version counter, re-seeding it if it has been evicted"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter has not been seeded yet or was evicted
+        return _get_counter(key)
+
+
+def get_leaderboard_version() -> int:
+    """
+    Get the current version of the leaderboard
+
+    :return: The current leaderboard version.
+    """
+    return _get_counter(LEADERBOARD_VERSION_KEY)
+
+
+def bump_leaderboard_version() -> int:
+    """
+    Invalidate everything cached against the current leaderboard version
+
+    :return: The new leaderboard version.
+    """
+    version = _bump_counter(LEADERBOARD_VERSION_KEY)
+    cache.set(LEADERBOARD_MODIFIED_KEY, time.time(), timeout=None)
+
+    LOGGER.debug(f'Leaderboard version bumped to {version}')
+
+    return version
+
+
+def get_competition_version(competition_id: Any) -> str:
+    """
+    Get the current version of the leaderboard of a single :class:`Competition`
+
+    It changes when a submission to the competition is written, or when any user or
+    competition changes as their names are shown on every competition's
+    leaderboard, but not when other competitions receive submissions.
+
+    :param competition_id: The ID of the :class:`Competition`.
+    :return: The current version of the competition's leaderboard.
+    """
+    profiles = _get_counter(COMPETITIONS_VERSION_KEY)
+    competition = _get_counter(COMPETITION_VERSION_KEY.format(competition_id))
+
+    return f'{profiles}.{competition}'
+
+
+def bump_competition_version(competition_id: Any) -> None:
+    """
+    Invalidate everything cached against the current version of a
+    :class:`Competition`'s leaderboard
+
+    :param competition_id: The ID of the :class:`Competition`.
+    """
+    _bump_counter(COMPETITION_VERSION_KEY.format(competition_id))
+
+
+def bump_competitions_version() -> None:
+    """Invalidate everything cached against every :class:`Competition`'s leaderboard"""
+    _bump_counter(COMPETITIONS_VERSION_KEY)
+
+
+def get_users_version() -> int:
+    """
+    Get the current version of the parts of the list of users that are not on the
+    leaderboard
+
+    :return: The current users version.
+    """
+    return _get_counter(USERS_VERSION_KEY)
+
+
+def bump_users_version() -> int:
+    """
+    Invalidate every list of users cached against the current users version
+
+    :return: The new users version.
+    """
+    version = _bump_counter(USERS_VERSION_KEY)
+    cache.set(USERS_MODIFIED_KEY, time.time(), timeout=None)
+
+    return version
+
+
+def _get_modified(key: str) -> Optional[datetime]:
+    """Get a time stored by one of the bump functions"""
+    modified = cache.get(key)
+    if modified is None:
+        return None
+
+    return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+
+def get_leaderboard_modified() -> Optional[datetime]:
+    """
+    Get the time the leaderboard last changed
+
+    :return: The time of the last change or None if it is not known.
+    """
+    return _get_modified(LEADERBOARD_MODIFIED_KEY)
+
+
+def get_users_modified() -> Optional[datetime]:
+    """
+    Get the time the parts of the list of users that are not on the leaderboard last
+    changed
+
+    :return: The time of the last change or None if it is not known.
+    """
+    return _get_modified(USERS_MODIFIED_KEY)
+
+
+def get_versioned_key(name: str) -> str:
+    """
+    Build a cache key that is invalidated whenever the leaderboard version changes
+
+    :param name: The name of the cached value.
+    :return: The cache key.
+    """
+    return f'leaderboard:{get_leaderboard_version()}:{name}'
+
+
+def get_competition_key(competition_id: Any, name: str) -> str:
+    """
+    Build a cache key that is invalidated whenever the leaderboard of a
+    :class:`Competition` changes
+
+    :param competition_id: The ID of the :class:`Competition`.
+    :param name: The name of the cached value.
+    :return: The cache key.
+    """
+    version = get_competition_version(competition_id)
+
+    return f'leaderboard:competition:{competition_id}:{version}:{name}'
+
+
+def get_or_build(
+    key: str,
+    builder: Callable[[], Any],
+    timeout: Optional[int] = None,
+    name: str = 'other',
+) -> Any:
+    """
+    Get a value from the cache or build it if it is missing
+
+    Concurrent misses for the same key are coalesced: the first caller takes a lock
+    and builds the value while everyone else waits for it to appear in the cache
+    instead of building it themselves. If the builder does not finish within
+    ``LEADERBOARD_CACHE_LOCK_TIMEOUT`` seconds the waiters build the value anyway.
+
+    :param key: The cache key of the value.
+    :param builder: A callable that builds the value on a cache miss.
+    :param timeout: How long to cache the value for, defaults to
+        ``LEADERBOARD_CACHE_TIMEOUT``.
+    :param name: What the value is counted as in the cache hit and build time
+        metrics.
+    :return: The cached or newly built value.
+    """
+    if timeout is None:
+        timeout = settings.LEADERBOARD_CACHE_TIMEOUT
+
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        CACHE_REQUESTS.labels(name, 'hit').inc()
+        return value
+
+    CACHE_REQUESTS.labels(name, 'miss').inc()
+    lock_key = f'{key}:lock'
+    lock_timeout = settings.LEADERBOARD_CACHE_LOCK_TIMEOUT
+
+    locked = cache.add(lock_key, True, timeout=lock_timeout)
+    if not locked:
+        LOGGER.debug(f'Waiting for {key} to be built by another worker')
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(settings.LEADERBOARD_CACHE_LOCK_POLL_INTERVAL)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if cache.get(lock_key) is None:
+                # The other worker gave up without caching a value
+                break
+
+    try:
+        with RANKINGS_BUILD_DURATION.labels(name).time():
+            value = builder()
+        cache.set(key, value, timeout=timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+    return value
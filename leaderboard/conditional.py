@@ -0,0 +1,160 @@
+"""
+HTTP conditional request handling for responses built from the leaderboard
+
+Every response is tagged with the leaderboard version so clients that already have
+the current data get a ``304 Not Modified`` before any query is run or anything is
+serialised. Only a cache lookup is needed to answer them.
+"""
+
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .cache import (
+    get_leaderboard_modified,
+    get_leaderboard_version,
+    get_users_modified,
+    get_users_version,
+)
+from .rankings import get_window_bounds
+
+EtagFunc = Callable[..., str]
+LastModifiedFunc = Callable[..., Optional[datetime]]
+
+
+def get_leaderboard_etag(request: HttpRequest, *args: Any, **kwargs: Any) -> str:
+    """
+    Build the ETag of a response built from the current leaderboard version
+
+    The URL and the ``Accept`` header are part of the tag so each page and
+    representation of the data has its own tag.
+
+    :param request: The request being answered.
+    :return: The ETag, without quotes.
+    """
+    representation = f'{request.get_full_path()}|{request.META.get("HTTP_ACCEPT", "")}'
+    digest = hashlib.md5(representation.encode()).hexdigest()[:16]
+
+    return f'{get_leaderboard_version()}-{digest}'
+
+
+def get_leaderboard_last_modified(
+    request: HttpRequest, *args: Any, **kwargs: Any
+) -> Optional[datetime]:
+    """Get the time the leaderboard last changed for the ``Last-Modified`` header"""
+    return get_leaderboard_modified()
+
+
+def get_users_etag(request: HttpRequest, *args: Any, **kwargs: Any) -> str:
+    """
+    Build the ETag of a list of users, which also changes when a user logs in
+
+    :param request: The request being answered.
+    :return: The ETag, without quotes.
+    """
+    return f'{get_users_version()}.{get_leaderboard_etag(request)}'
+
+
+def get_users_last_modified(
+    request: HttpRequest, *args: Any, **kwargs: Any
+) -> Optional[datetime]:
+    """Get the time the leaderboard or a user's login last changed"""
+    modified = [get_leaderboard_modified(), get_users_modified()]
+
+    return max((time for time in modified if time is not None), default=None)
+
+
+def _get_window_bounds(request: HttpRequest) -> Optional[Tuple[datetime, datetime]]:
+    """Get the bounds of the ``?window=`` of a request, if it has a valid one"""
+    window = request.GET.get('window')
+    if not window:
+        return None
+
+    try:
+        return get_window_bounds(window)
+    except ValueError:
+        # The view rejects the request
+        return None
+
+
+def get_rankings_etag(request: HttpRequest, *args: Any, **kwargs: Any) -> str:
+    """
+    Build the ETag of the rankings, which also changes when the ``?window=`` they
+    are limited to moves on
+
+    :param request: The request being answered.
+    :return: The ETag, without quotes.
+    """
+    etag = get_leaderboard_etag(request)
+    bounds = _get_window_bounds(request)
+    if bounds is None:
+        return etag
+
+    return f'{etag}-{int(bounds[0].timestamp())}'
+
+
+def get_rankings_last_modified(
+    request: HttpRequest, *args: Any, **kwargs: Any
+) -> Optional[datetime]:
+    """Get the time the leaderboard last changed or the ``?window=`` last moved on"""
+    modified = get_leaderboard_modified()
+    bounds = _get_window_bounds(request)
+    if bounds is None or modified is None:
+        return modified
+
+    return max(modified, bounds[0])
+
+
+def get_cache_control(name: str) -> Dict[str, Any]:
+    """
+    Get the ``Cache-Control`` directives of an endpoint from the
+    ``LEADERBOARD_CACHE_CONTROL`` setting
+
+    :param name: The name of the endpoint.
+    :return: The directives as keyword arguments of
+        :func:`django.utils.cache.patch_cache_control`.
+    """
+    cache_control = settings.LEADERBOARD_CACHE_CONTROL
+
+    return cache_control.get(name, cache_control['default'])
+
+
+def leaderboard_conditional(
+    name: str,
+    etag_func: EtagFunc = get_leaderboard_etag,
+    last_modified_func: LastModifiedFunc = get_leaderboard_last_modified,
+) -> Callable:
+    """
+    Decorate a view so it answers conditional requests using the leaderboard
+    version and sends the ``Cache-Control`` header configured for ``name``
+
+    :param name: The name of the endpoint in ``LEADERBOARD_CACHE_CONTROL``.
+    :param etag_func: Builds the ETag of a request, for views that show more than
+        the leaderboard.
+    :param last_modified_func: Gets the time the response to a request last changed.
+    :return: The view decorator.
+    """
+
+    def decorator(view_func: Callable) -> Callable:
+        conditional_view = condition(
+            etag_func=etag_func,
+            last_modified_func=last_modified_func,
+        )(view_func)
+
+        @wraps(view_func)
+        def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, **get_cache_control(name))
+            patch_vary_headers(response, ['Accept'])
+
+            return response
+
+        return wrapper
+
+    return decorator
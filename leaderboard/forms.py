@@ -0,0 +1,80 @@
+from typing import Any, Dict
+
+from django import forms
+
+LEADERBOARD_PAGE_SIZE = 100
+"""The amount of rows rendered into the leaderboard page and the largest page"""
+
+
+class LeaderboardTableForm(forms.Form):
+    """
+    Form which validates the parameters DataTables sends when it pages the
+    leaderboard server side
+
+    DataTables names its parameters like ``search[value]`` and ``order[0][column]``
+    so the form is built with :meth:`from_query` which maps them onto its fields.
+    Only the rank and score columns can be ordered by and both give the same order.
+    """
+
+    ORDER_COLUMNS = {1: 'rank', 2: 'total_score'}
+
+    draw = forms.IntegerField(min_value=0, required=False, initial=0)
+    start = forms.IntegerField(min_value=0, required=False, initial=0)
+    length = forms.IntegerField(
+        min_value=1,
+        max_value=LEADERBOARD_PAGE_SIZE,
+        required=False,
+        initial=LEADERBOARD_PAGE_SIZE,
+    )
+    search = forms.CharField(max_length=150, required=False, strip=True)
+    order_column = forms.TypedChoiceField(
+        choices=[(column, column) for column in ORDER_COLUMNS],
+        coerce=int,
+        required=False,
+        empty_value=2,
+    )
+    order_dir = forms.ChoiceField(
+        choices=[('asc', 'asc'), ('desc', 'desc')], required=False
+    )
+
+    @classmethod
+    def from_query(cls, query: Dict[str, Any]) -> 'LeaderboardTableForm':
+        """
+        Build the form from the query parameters of a DataTables request
+
+        :param query: The query parameters, e.g. ``request.GET``.
+        :return: The unvalidated form.
+        """
+        return cls(
+            data={
+                'draw': query.get('draw'),
+                'start': query.get('start'),
+                'length': query.get('length'),
+                'search': query.get('search[value]'),
+                'order_column': query.get('order[0][column]'),
+                'order_dir': query.get('order[0][dir]'),
+            }
+        )
+
+    def clean(self) -> Dict[str, Any]:
+        cleaned_data = super().clean()
+        for name, field in self.fields.items():
+            if cleaned_data.get(name) in (None, '') and field.initial is not None:
+                cleaned_data[name] = field.initial
+
+        return cleaned_data
+
+    @property
+    def descending_rank(self) -> bool:
+        """
+        Whether the requested order lists the lowest ranks first
+
+        Ranks ascend as the score descends so the direction is flipped for the
+        score column.
+        """
+        column = self.ORDER_COLUMNS[self.cleaned_data['order_column']]
+        direction = self.cleaned_data['order_dir'] or 'desc'
+        if column == 'rank':
+            return direction == 'desc'
+
+        return direction == 'asc'
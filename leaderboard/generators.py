@@ -0,0 +1,252 @@
+"""
+Generation of synthetic users, competitions and submissions at production scale
+
+Users and competitions are written with ``bulk_create``. Submissions, which
+outnumber them by orders of magnitude, skip the model layer: their rows are built
+as tuples of database values and written with ``COPY`` on PostgreSQL or
+``executemany`` elsewhere, so millions of them load in seconds.
+"""
+
+import io
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Competition, Submission, User
+
+MIN_SCORE = 100
+"""The lowest score a :class:`Submission` can have"""
+
+MAX_SCORE = 10000
+"""The highest score a :class:`Submission` can have"""
+
+
+def _clamp_score(score: float) -> int:
+    return max(MIN_SCORE, min(MAX_SCORE, round(score)))
+
+
+SCORE_DISTRIBUTIONS: Dict[str, Callable[[random.Random], int]] = {
+    'uniform': lambda generator: generator.randint(MIN_SCORE, MAX_SCORE),
+    'normal': lambda generator: _clamp_score(generator.gauss(5000, 1500)),
+    # Most scores are low and a few are very high
+    'exponential': lambda generator: _clamp_score(
+        MIN_SCORE + generator.expovariate(1 / 1500)
+    ),
+}
+"""Functions that draw a random score from each distribution"""
+
+Row = Tuple[Any, ...]
+
+_SQLITE_CACHE_SIZE = -256 * 1024
+"""The SQLite page cache used while writing, negative sizes are in KiB"""
+
+_CHUNK_SIZE = 10000
+"""The amount of submissions whose users, competitions and times are drawn at once"""
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+"""The characters that have to be escaped in ``COPY``'s text format"""
+
+_SUBMISSION_COLUMNS = (
+    'id',
+    'created_at',
+    'updated_at',
+    'name',
+    'score',
+    'competition_id',
+    'user_id',
+)
+
+
+def create_users(count: int, prefix: str, batch_size: int) -> List[uuid.UUID]:
+    """
+    Create users with unusable passwords, skipping the password hashing that makes
+    creating them one at a time slow
+
+    :param count: The amount of users to create.
+    :param prefix: The prefix of the usernames, which must not be in use yet.
+    :param batch_size: The amount of users to insert per query.
+    :return: The IDs of the new users.
+    """
+    users = [
+        User(username=f'{prefix}.user{index}', password='!') for index in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=batch_size)
+
+    return [user.id for user in users]
+
+
+def create_competitions(count: int, prefix: str, batch_size: int) -> List[uuid.UUID]:
+    """
+    Create competitions
+
+    :param count: The amount of competitions to create.
+    :param prefix: The prefix of the names, which must not be in use yet.
+    :param batch_size: The amount of competitions to insert per query.
+    :return: The IDs of the new competitions.
+    """
+    competitions = [
+        Competition(name=f'{prefix} competition {index}') for index in range(count)
+    ]
+    Competition.objects.bulk_create(competitions, batch_size=batch_size)
+
+    return [competition.id for competition in competitions]
+
+
+def generate_submission_rows(
+    *,
+    count: int,
+    prefix: str,
+    user_ids: Sequence[uuid.UUID],
+    competition_ids: Sequence[uuid.UUID],
+    distribution: str = 'uniform',
+    skew: float = 0,
+    days: int = 0,
+    seed: int = 0,
+) -> Iterator[Row]:
+    """
+    Generate the rows of random submissions as database values, in the order of
+    ``_SUBMISSION_COLUMNS``
+
+    :param count: The amount of submissions to generate.
+    :param prefix: The prefix of the submission names, which must not be in use yet.
+    :param user_ids: The users to spread the submissions between.
+    :param competition_ids: The competitions to spread the submissions between.
+    :param distribution: The name of the distribution of the scores, one of
+        :data:`SCORE_DISTRIBUTIONS`.
+    :param skew: How unevenly the submissions are spread between users. The
+        ``n``\\th user makes submissions in proportion to ``1 / n ** skew``, so 0
+        spreads them evenly and 1 gives a long tail of users with few submissions.
+    :param days: Spread the submissions over this many days before now.
+    :param seed: The seed of the random generator, the same seed always generates
+        the same users, competitions and scores for each submission.
+    :return: An iterator of rows.
+    """
+    generator = random.Random(seed)
+    # The IDs must differ between runs with the same seed
+    id_generator = random.Random()
+    draw_score = SCORE_DISTRIBUTIONS[distribution]
+    cumulative_weights = list(
+        accumulate(1 / (position + 1) ** skew for position in range(len(user_ids)))
+    )
+
+    # Convert every value that is reused to its database form up front
+    if connection.features.has_native_uuid_field:
+        adapt_uuid: Callable[[uuid.UUID], Any] = lambda value: value
+    else:
+        adapt_uuid = attrgetter('hex')
+    user_values = [adapt_uuid(user_id) for user_id in user_ids]
+    competition_values = [
+        adapt_uuid(competition_id) for competition_id in competition_ids
+    ]
+
+    now = timezone.now()
+    # Submissions are spread over the minutes of the period
+    created_at_values = [
+        connection.ops.adapt_datetimefield_value(now - timedelta(minutes=minute))
+        for minute in range(max(days * 24 * 60, 1))
+    ]
+
+    for start in range(0, count, _CHUNK_SIZE):
+        size = min(_CHUNK_SIZE, count - start)
+        chosen_users = generator.choices(
+            user_values, cum_weights=cumulative_weights, k=size
+        )
+        chosen_competitions = generator.choices(competition_values, k=size)
+        chosen_created_at = generator.choices(created_at_values, k=size)
+
+        for offset in range(size):
+            created_at = chosen_created_at[offset]
+            yield (
+                adapt_uuid(uuid.UUID(int=id_generator.getrandbits(128), version=4)),
+                created_at,
+                created_at,
+                f'{prefix} submission {start + offset}',
+                draw_score(generator),
+                chosen_competitions[offset],
+                chosen_users[offset],
+            )
+
+
+def _format_copy_row(row: Row) -> str:
+    """
+    Format a row as a line of ``COPY``'s text format, escaping the characters that
+    separate values and lines
+    """
+    return '\t'.join(
+        '\\N' if value is None else str(value).translate(_COPY_ESCAPES) for value in row
+    )
+
+
+def _copy_rows(table: str, rows: List[Row]) -> None:
+    """Write rows to a PostgreSQL table with ``COPY`` in its text format"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(_format_copy_row(row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in _SUBMISSION_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {quote(table)} ({columns}) FROM STDIN', buffer)
+
+
+def _insert_rows(table: str, rows: List[Row]) -> None:
+    """Write rows to a table with a single ``executemany``"""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in _SUBMISSION_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(_SUBMISSION_COLUMNS))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote(table)} ({columns}) VALUES ({placeholders})', rows
+        )
+
+
+def write_submission_rows(rows: Iterator[Row], batch_size: int) -> int:
+    """
+    Write rows from :func:`generate_submission_rows` to the submission table
+
+    The model signals are not sent so the rankings have to be rebuilt afterwards.
+
+    :param rows: The rows to write.
+    :param batch_size: The amount of rows to write at a time.
+    :return: The amount of rows written.
+    """
+    write = _copy_rows if connection.vendor == 'postgresql' else _insert_rows
+    table = Submission._meta.db_table
+
+    written = 0
+    with _large_cache():
+        while batch := list(islice(rows, batch_size)):
+            write(table, batch)
+            written += len(batch)
+
+    return written
+
+
+@contextmanager
+def _large_cache() -> Iterator[None]:
+    """
+    Give SQLite a larger page cache while writing so the pages of the submission
+    indexes do not have to be read back for every batch
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        (cache_size,) = cursor.fetchone()
+        cursor.execute(f'PRAGMA cache_size = {_SQLITE_CACHE_SIZE}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {int(cache_size)}')
@@ -0,0 +1,526 @@
+"""
+Helpers for importing user submission data exported as JSON.
+
+The data is a list of users, each with a ``name`` and a list of ``submissions``
+that have a ``score`` and a ``name`` in the form ``<submission> in "<competition>"``.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+from uuid import UUID
+
+import django
+from django.db import connections, transaction
+
+from .models import Submission
+from .services import CompetitionService, SubmissionService, UserService, chunked
+
+LOGGER = logging.getLogger('photocrowd')
+
+GZIP_MAGIC = b'\x1f\x8b'
+"""The bytes every gzip file starts with"""
+
+JSON_WHITESPACE = ' \t\n\r'
+
+
+@dataclass
+class ImportSummary:
+    """Counts of what happened during an import"""
+
+    users: int = 0
+    """The amount of users that were processed"""
+    created: int = 0
+    """The amount of submissions that were created"""
+    duplicates: int = 0
+    """The amount of submissions that already existed"""
+    failed: int = 0
+    """The amount of users that could not be processed"""
+
+    def merge(self, other: 'ImportSummary') -> 'ImportSummary':
+        """
+        Add the counts of another summary to this one
+
+        :param other: The summary to add.
+        :return: This summary.
+        """
+        self.users += other.users
+        self.created += other.created
+        self.duplicates += other.duplicates
+        self.failed += other.failed
+
+        return self
+
+
+def parse_user_name(name: str) -> Tuple[str, str, str]:
+    """
+    Generate a username, first name and last name from a user's full name
+
+    :param name: The full name of the user.
+    :raise ValueError: If a first and last name can not be found in the name.
+    :return: The username, first name and last name of the user.
+    """
+    full_name = name.replace(' ', '.')
+    names = full_name.split('.')
+
+    if len(names) == 2:
+        first_name, last_name = names
+    elif len(names) == 4:
+        # TODO: This is a bit of a hack to deal with irregular data
+        first_name, last_name = names[1], names[2]
+    else:
+        raise ValueError(f'Unable to find a first and last name in {name}')
+
+    return full_name.lower(), first_name, last_name
+
+
+def parse_submission_name(name: str) -> Tuple[str, str]:
+    """
+    Split a submission's name into the submission name and competition name
+
+    :param name: The name of the submission in the form
+        ``<submission> in "<competition>"``.
+    :raise ValueError: If the name is not in the expected form.
+    :return: The submission name and competition name.
+    """
+    submission_name, competition_name = name.split(' in ')
+
+    return submission_name, competition_name.strip('"')
+
+
+def open_json_file(path: str) -> IO[str]:
+    """
+    Open a JSON file for reading, decompressing it if it is gzipped
+
+    :param path: The path to the JSON file.
+    :return: A text file object.
+    """
+    with open(path, 'rb') as json_file:
+        is_gzipped = json_file.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+    if is_gzipped:
+        return gzip.open(path, 'rt', encoding='utf-8')
+
+    return open(path, encoding='utf-8')
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Calculate the SHA-256 hash of a file without reading it all into memory
+
+    :param path: The path to the file.
+    :param chunk_size: The amount of bytes to read at a time.
+    :return: The hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as hashed_file:
+        while chunk := hashed_file.read(chunk_size):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def iter_json_array(
+    stream: IO[str],
+    chunk_size: int = 64 * 1024,
+    max_item_size: int = 1024 * 1024,
+) -> Iterator[Any]:
+    """
+    Incrementally parse a JSON array, yielding one item at a time
+
+    Only the item being parsed and one chunk of the stream are held in memory, so
+    arrays of any size can be processed.
+
+    :param stream: A text file object containing a JSON array.
+    :param chunk_size: The amount of characters to read from the stream at a time.
+    :param max_item_size: The amount of characters an item can span before it is
+        treated as invalid, so a malformed item does not read the rest of the stream
+        into memory.
+    :raise json.JSONDecodeError: If the stream is not a valid JSON array or an item
+        is longer than ``max_item_size``.
+    :return: An iterator of the items in the array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = stream.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        eof = not chunk
+        return not eof
+
+    def skip_whitespace() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in JSON_WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return ''
+
+    if skip_whitespace() != '[':
+        raise json.JSONDecodeError('Expecting \'[\'', buffer, position)
+    position += 1
+
+    if skip_whitespace() == ']':
+        return
+
+    while True:
+        skip_whitespace()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if len(buffer) - position <= max_item_size and fill():
+                    continue
+                raise
+            # A value running to the end of the buffer, such as a number, may
+            # continue in the next chunk
+            if end == len(buffer):
+                if end - position > max_item_size:
+                    raise json.JSONDecodeError(
+                        f'Item is longer than {max_item_size} characters',
+                        buffer,
+                        position,
+                    )
+                if fill():
+                    continue
+            break
+        position = end
+        yield item
+
+        separator = skip_whitespace()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise json.JSONDecodeError(
+                'Expecting \',\' delimiter', buffer, position - 1
+            )
+
+
+DuplicateCallback = Callable[[str, str, str], None]
+ErrorCallback = Callable[[Dict[str, Any], Exception], None]
+BatchCallback = Callable[[ImportSummary], None]
+
+
+class BulkImporter:
+    """
+    Imports user submission data in batches
+
+    Each batch is written in one transaction with a fixed amount of queries: the
+    users and competitions are looked up with ``IN`` queries, anything missing is
+    created with ``bulk_create`` and then the submissions are bulk created,
+    skipping any that already exist.
+    """
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = 1000,
+        fail_fast: bool = False,
+        on_duplicate: Optional[DuplicateCallback] = None,
+        on_error: Optional[ErrorCallback] = None,
+        on_batch: Optional[BatchCallback] = None,
+        competition_ids: Optional[Dict[str, UUID]] = None,
+    ) -> None:
+        """
+        :param batch_size: The amount of users to write per transaction and the
+            maximum amount of rows per query.
+        :param fail_fast: Whether to raise the first error instead of skipping the
+            user that caused it.
+        :param on_duplicate: Called with the username, competition name and
+            submission name of each submission that already exists.
+        :param on_error: Called with the data of each user that could not be
+            processed and the exception raised.
+        :param on_batch: Called with the summary of each batch inside the batch's
+            transaction, so anything it writes is committed along with the batch.
+        :param competition_ids: The IDs of :class:`Competition`\s that have already
+            been resolved, keyed by name.
+        """
+        self.batch_size = batch_size
+        self.fail_fast = fail_fast
+        self.on_duplicate = on_duplicate
+        self.on_error = on_error
+        self.on_batch = on_batch
+        self.competition_ids = competition_ids or {}
+
+    def import_records(self, records: Iterable[Dict[str, Any]]) -> ImportSummary:
+        """
+        Import user records in batches
+
+        :param records: The user records to import.
+        :return: A summary of the import.
+        """
+        summary = ImportSummary()
+
+        for batch in chunked(records, self.batch_size):
+            summary.merge(self.import_batch(batch))
+
+        return summary
+
+    def import_batch(self, records: List[Dict[str, Any]]) -> ImportSummary:
+        """
+        Import a single batch of user records in one transaction
+
+        :param records: The user records to import.
+        :return: A summary of the batch.
+        """
+        summary = ImportSummary(users=len(records))
+
+        users: Dict[str, Dict[str, Any]] = {}
+        rows: List[Tuple[str, str, str, int]] = []
+        for record in records:
+            try:
+                username, first_name, last_name = parse_user_name(record['name'])
+                user_rows = []
+                for submission in record.get('submissions', []):
+                    submission_name, competition_name = parse_submission_name(
+                        submission['name']
+                    )
+                    user_rows.append(
+                        (
+                            username,
+                            competition_name,
+                            submission_name,
+                            submission['score'],
+                        )
+                    )
+            except Exception as exc:
+                if self.fail_fast:
+                    raise
+                summary.failed += 1
+                if self.on_error:
+                    self.on_error(record, exc)
+                continue
+
+            users.setdefault(
+                username, {'first_name': first_name, 'last_name': last_name}
+            )
+            rows.extend(user_rows)
+
+        with transaction.atomic():
+            user_ids = UserService.bulk_get_or_create_users(
+                users=users, batch_size=self.batch_size
+            )
+            competition_names = {competition_name for _, competition_name, _, _ in rows}
+            competition_ids = {
+                name: self.competition_ids[name]
+                for name in competition_names
+                if name in self.competition_ids
+            }
+            missing_names = competition_names - competition_ids.keys()
+            if missing_names:
+                competition_ids.update(
+                    CompetitionService.bulk_get_or_create_competitions(
+                        names=missing_names, batch_size=self.batch_size
+                    )
+                )
+
+            submissions = [
+                Submission(
+                    user_id=user_ids[username],
+                    competition_id=competition_ids[competition_name],
+                    name=submission_name,
+                    score=score,
+                )
+                for username, competition_name, submission_name, score in rows
+            ]
+            summary.created, duplicates = SubmissionService.bulk_create_submissions(
+                submissions=submissions, batch_size=self.batch_size
+            )
+            summary.duplicates = len(duplicates)
+
+            if self.on_batch:
+                self.on_batch(summary)
+
+        if self.on_duplicate:
+            usernames = {user_id: username for username, user_id in user_ids.items()}
+            competition_names = {
+                competition_id: name for name, competition_id in competition_ids.items()
+            }
+            for duplicate in duplicates:
+                self.on_duplicate(
+                    usernames[duplicate.user_id],
+                    competition_names[duplicate.competition_id],
+                    duplicate.name,
+                )
+
+        LOGGER.debug(f'BulkImporter:import_batch finished with {summary}')
+
+        return summary
+
+
+def collect_competition_names(records: Iterable[Dict[str, Any]]) -> Set[str]:
+    """
+    Find the name of every competition in some user records
+
+    Submissions that can not be parsed are ignored, they are reported when the
+    records are imported.
+
+    :param records: The user records.
+    :return: A set of competition names.
+    """
+    names = set()
+    for record in records:
+        for submission in record.get('submissions', []):
+            try:
+                names.add(parse_submission_name(submission['name'])[1])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    return names
+
+
+def _initialise_worker() -> None:
+    """Prepare Django in a worker process, which opens its own connections"""
+    django.setup()
+
+
+def _import_batch_in_worker(
+    records: List[Dict[str, Any]],
+    batch_size: int,
+    fail_fast: bool,
+    competition_ids: Dict[str, UUID],
+) -> Tuple[ImportSummary, List[Tuple[str, str, str]], List[str]]:
+    """Import a batch in a worker process, returning anything to report"""
+    duplicates: List[Tuple[str, str, str]] = []
+    errors: List[str] = []
+    importer = BulkImporter(
+        batch_size=batch_size,
+        fail_fast=fail_fast,
+        on_duplicate=lambda *duplicate: duplicates.append(duplicate),
+        on_error=lambda _, exc: errors.append(str(exc)),
+        competition_ids=competition_ids,
+    )
+
+    return importer.import_batch(records), duplicates, errors
+
+
+class ParallelImporter:
+    """
+    Imports user submission data in batches across a pool of processes
+
+    Every :class:`Competition` is created up front by the parent process, so the
+    workers never race each other on the unique competition name, and each worker
+    then imports whole batches of users with its own database connection.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int,
+        batch_size: int = 1000,
+        fail_fast: bool = False,
+        on_duplicate: Optional[DuplicateCallback] = None,
+        on_error: Optional[Callable[[str], None]] = None,
+        on_batch: Optional[BatchCallback] = None,
+    ) -> None:
+        """
+        :param workers: The amount of worker processes to use.
+        :param batch_size: The amount of users each worker imports per transaction.
+        :param fail_fast: Whether to stop at the first error.
+        :param on_duplicate: Called with the username, competition name and
+            submission name of each submission that already exists.
+        :param on_error: Called with the message of each error.
+        :param on_batch: Called with the summary of each batch once it has been
+            committed. Batches can finish in any order but are always passed to
+            this in the order of the records.
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.fail_fast = fail_fast
+        self.on_duplicate = on_duplicate
+        self.on_error = on_error
+        self.on_batch = on_batch
+
+    def import_records(
+        self, records: Iterable[Dict[str, Any]], competition_names: Set[str]
+    ) -> ImportSummary:
+        """
+        Import user records across the worker processes
+
+        At most two batches per worker are waiting at any time so memory use does
+        not grow with the amount of records.
+
+        :param records: The user records to import.
+        :param competition_names: The names of every competition in the records.
+        :return: The merged summary of every worker.
+        """
+        competition_ids = CompetitionService.bulk_get_or_create_competitions(
+            names=competition_names, batch_size=self.batch_size
+        )
+        # The workers are forked so they must not inherit an open connection
+        connections.close_all()
+
+        summary = ImportSummary()
+        pending: Set[Future] = set()
+        sequence: Dict[Future, int] = {}
+        finished: Dict[int, ImportSummary] = {}
+        next_batch = 0
+
+        def collect(futures: Iterable[Future]) -> None:
+            nonlocal next_batch
+            for future in futures:
+                batch_summary, duplicates, errors = future.result()
+                summary.merge(batch_summary)
+                finished[sequence.pop(future)] = batch_summary
+                for duplicate in duplicates:
+                    if self.on_duplicate:
+                        self.on_duplicate(*duplicate)
+                for error in errors:
+                    if self.on_error:
+                        self.on_error(error)
+
+            while next_batch in finished:
+                batch_summary = finished.pop(next_batch)
+                if self.on_batch:
+                    self.on_batch(batch_summary)
+                next_batch += 1
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_initialise_worker
+        ) as executor:
+            try:
+                for index, batch in enumerate(chunked(records, self.batch_size)):
+                    if len(pending) >= self.workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    future = executor.submit(
+                        _import_batch_in_worker,
+                        batch,
+                        self.batch_size,
+                        self.fail_fast,
+                        competition_ids,
+                    )
+                    sequence[future] = index
+                    pending.add(future)
+                collect(wait(pending).done)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        LOGGER.debug(f'ParallelImporter:import_records finished with {summary}')
+
+        return summary
@@ -0,0 +1,115 @@
+import secrets
+import time
+from typing import Any, Optional
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+
+from leaderboard.generators import (
+    SCORE_DISTRIBUTIONS,
+    create_competitions,
+    create_users,
+    generate_submission_rows,
+    write_submission_rows,
+)
+from leaderboard.services import RankingService
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate random users, competitions and submissions to reproduce '
+        'production scale load'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--users', type=int, default=1000, help='The amount of users to create'
+        )
+        parser.add_argument(
+            '--competitions',
+            type=int,
+            default=100,
+            help='The amount of competitions to create',
+        )
+        parser.add_argument(
+            '--submissions',
+            type=int,
+            default=100000,
+            help='The amount of submissions to create',
+        )
+        parser.add_argument(
+            '--score-distribution',
+            choices=sorted(SCORE_DISTRIBUTIONS),
+            default='uniform',
+            help='How the scores of the submissions are distributed',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=0,
+            help='How unevenly submissions are spread between users, 0 spreads them '
+            'evenly and 1 gives a long tail of users with few submissions',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=0,
+            help='Spread the submissions over this many days before now',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='The seed of the random generator, to generate the same data again',
+        )
+        parser.add_argument(
+            '--prefix',
+            help='The prefix of the generated names, which must not be in use yet, '
+            'defaults to a random one',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='The amount of rows to write per query',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        if options['users'] < 1 or options['competitions'] < 1:
+            raise CommandError('At least one user and one competition are needed')
+
+        prefix = options['prefix'] or f'generated-{secrets.token_hex(4)}'
+        started = time.monotonic()
+
+        with transaction.atomic():
+            user_ids = create_users(options['users'], prefix, options['batch_size'])
+            competition_ids = create_competitions(
+                options['competitions'], prefix, options['batch_size']
+            )
+            rows = generate_submission_rows(
+                count=options['submissions'],
+                prefix=prefix,
+                user_ids=user_ids,
+                competition_ids=competition_ids,
+                distribution=options['score_distribution'],
+                skew=options['skew'],
+                days=options['days'],
+                seed=options['seed'],
+            )
+            created = write_submission_rows(rows, options['batch_size'])
+        generated = time.monotonic()
+
+        # The submissions bypass the signals that maintain the rankings
+        ranked = RankingService.rebuild_rankings()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {len(user_ids)} users, {len(competition_ids)} '
+                f'competitions and {created} submissions prefixed {prefix} in '
+                f'{generated - started:.1f}s '
+                f'({created / max(generated - started, 1e-9):,.0f} submissions/s), '
+                f'ranked {ranked} users in {time.monotonic() - generated:.1f}s'
+            )
+        )
+
+        return 'OK'
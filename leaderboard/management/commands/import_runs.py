@@ -0,0 +1,38 @@
+from typing import Any, Optional
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from leaderboard.services import ImportRunService
+
+
+class Command(BaseCommand):
+    help = 'Show the history of import_user_submissions runs'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='The amount of runs to show, newest first',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        import_runs = ImportRunService.get_import_runs()[: options['limit']]
+
+        self.stdout.write(
+            f'{"Started":<17} {"File":<30} {"Status":<10} {"Records":>9} '
+            f'{"Created":>9} {"Dupes":>7} {"Failed":>7} {"Seconds":>9} '
+            f'{"Records/s":>10} {"Subs/s":>10}'
+        )
+        for import_run in import_runs:
+            self.stdout.write(
+                f'{import_run.created_at:%Y-%m-%d %H:%M} '
+                f'{import_run.file_name[:30]:<30} {import_run.status:<10} '
+                f'{import_run.records_processed:>9} '
+                f'{import_run.submissions_created:>9} {import_run.duplicates:>7} '
+                f'{import_run.failures:>7} {import_run.duration:>9.1f} '
+                f'{import_run.records_per_second:>10.1f} '
+                f'{import_run.submissions_per_second:>10.1f}'
+            )
+
+        return None
@@ -1,91 +1,304 @@
 import json
-from typing import Any, Dict, List, Optional
+import os
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
 
 from django.core.management.base import BaseCommand, CommandError, CommandParser
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.utils import IntegrityError
 
-from leaderboard.services import CompetitionService, SubmissionService, UserService
+from leaderboard.importers import (
+    BulkImporter,
+    ImportSummary,
+    ParallelImporter,
+    collect_competition_names,
+    hash_file,
+    iter_json_array,
+    open_json_file,
+    parse_submission_name,
+    parse_user_name,
+)
+from leaderboard.models import ImportRun
+from leaderboard.services import (
+    CompetitionService,
+    ImportRunService,
+    RankingService,
+    SubmissionService,
+    UserService,
+    defer_rankings,
+)
 
 
 class Command(BaseCommand):
     help = 'Import user submission data from JSON'
 
+    import_run: ImportRun
+
     def add_arguments(self, parser: CommandParser) -> None:
         parser.add_argument(
             'json_data',
-            type=open,
-            help='The path to a JSON file containing user submission data',
+            help='The path to a JSON file, optionally gzipped, containing user '
+            'submission data',
         )
         parser.add_argument(
             '--fail-fast',
             action='store_true',
             help='Whether to stop processing the data at the first error',
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Whether to import the data in batches using bulk queries',
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Whether to parse the file one user at a time while importing in '
+            'batches, keeping memory use constant for any size of file',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='The amount of users to import per batch when using --bulk or '
+            '--stream',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='The amount of processes to import batches with, more than one '
+            'implies --bulk',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Whether to skip the records committed by the last unfinished '
+            'import of the same file',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Whether to --resume an import that has recently committed records '
+            'and may still be running',
+        )
 
     def handle(self, *args: Any, **options: Any) -> Optional[str]:
-        # Load the json file into a list of dicts
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError(
+                '--workers needs a database that supports concurrent writes, such '
+                'as PostgreSQL'
+            )
+
+        path = options['json_data']
         try:
-            data: List[Dict[str, Any]] = json.load(options['json_data'])
-        except json.JSONDecodeError:
-            self.stderr.write(self.style.ERROR('The provided json file is not valid'))
-            raise CommandError()
+            json_file = open_json_file(path)
+            file_hash = hash_file(path)
+        except OSError as exc:
+            raise CommandError(f'Unable to open {path}: {exc}')
+
+        try:
+            self.import_run = ImportRunService.start_import_run(
+                file_name=os.path.basename(path),
+                file_hash=file_hash,
+                resume=options['resume'],
+                force=options['force'],
+            )
+        except ValueError as exc:
+            json_file.close()
+            raise CommandError(f'{exc}, use --force to resume it anyway')
+
+        skip = self.import_run.first_record
+        if skip:
+            self.stdout.write(f'Resuming from record {skip}')
 
-        for user_data in data:
+        with json_file:
             try:
-                with transaction.atomic():
-                    # Generate the user's email, username using their name
-                    full_name = user_data['name'].replace(' ', '.')
-                    try:
-                        # Try to extract a first name and last name
-                        first_name, last_name = full_name.split('.')
-                    except ValueError:
-                        # TODO: This is a bit of a hack to deal with irregular data
-                        names = full_name.split('.')
-                        if len(names) == 4:
-                            first_name = names[1]
-                            last_name = names[2]
-
-                    # Get or create the user in the database
-                    user = UserService.get_or_create_user_by_username(
-                        username=full_name.lower(),
-                        defaults={
-                            'first_name': first_name,
-                            'last_name': last_name,
-                        },
-                    )
-
-                    for submission in user_data.get('submissions', []):
-                        with transaction.atomic():
-                            # Generate competition name and submission name
-                            submission_name, competition_name = submission[
-                                'name'
-                            ].split(' in ')
-
-                            # Get or create the Competition in the database
-                            competition = CompetitionService.get_or_create_competition(
-                                name=competition_name.strip('"')
+                if options['stream']:
+                    records = islice(iter_json_array(json_file), skip, None)
+                    if options['workers'] > 1:
+                        # Read the file once up front to find every competition
+                        with open_json_file(path) as names_file:
+                            competition_names = collect_competition_names(
+                                islice(iter_json_array(names_file), skip, None)
                             )
+                        self.parallel_import(records, competition_names, **options)
+                    else:
+                        self.bulk_import(records, **options)
+                else:
+                    # Load the json file into a list of dicts
+                    data: List[Dict[str, Any]] = json.load(json_file)[skip:]
+                    if options['workers'] > 1:
+                        self.parallel_import(
+                            data, collect_competition_names(data), **options
+                        )
+                    elif options['bulk']:
+                        self.bulk_import(data, **options)
+                    else:
+                        self.import_each(data, **options)
+            except json.JSONDecodeError:
+                self.finish_import_run(ImportRun.Status.FAILED)
+                self.stderr.write(
+                    self.style.ERROR('The provided json file is not valid')
+                )
+                raise CommandError()
+            except BaseException:
+                self.finish_import_run(ImportRun.Status.FAILED)
+                raise
 
-                            # Create the Submission in the database
-                            try:
-                                SubmissionService.create_submission(
-                                    user=user,
-                                    competition=competition,
-                                    name=submission_name,
-                                    score=submission['score'],
-                                )
-                            except IntegrityError:
-                                self.stderr.write(
-                                    self.style.WARNING(
-                                        f'A submission already exists from {user} for '
-                                        f'{competition} with name {submission_name}'
-                                    )
-                                )
-
-            except Exception as exc:
-                self.stderr.write(self.style.ERROR(f'Failed to process a user: {exc}'))
-                if options['fail_fast']:
-                    raise
+        self.finish_import_run(ImportRun.Status.COMPLETED)
 
         return 'OK'
+
+    def checkpoint(self, summary: ImportSummary) -> None:
+        """Record that the records counted by the summary have been committed"""
+        ImportRunService.checkpoint_import_run(
+            import_run=self.import_run,
+            records=summary.users,
+            submissions_created=summary.created,
+            duplicates=summary.duplicates,
+            failures=summary.failed,
+        )
+
+    def finish_import_run(self, status: str) -> None:
+        import_run = ImportRunService.finish_import_run(
+            import_run=self.import_run, status=status
+        )
+        self.stdout.write(
+            f'Import run {import_run.id} {import_run.status} after '
+            f'{import_run.duration:.1f}s at {import_run.records_per_second:.1f} '
+            f'records/s'
+        )
+
+    def write_duplicate(
+        self, username: str, competition_name: str, submission_name: str
+    ) -> None:
+        self.stderr.write(
+            self.style.WARNING(
+                f'A submission already exists from {username} for '
+                f'{competition_name} with name {submission_name}'
+            )
+        )
+
+    def write_error(self, exc: Union[Exception, str]) -> None:
+        self.stderr.write(self.style.ERROR(f'Failed to process a user: {exc}'))
+
+    def bulk_import(self, data: Iterable[Dict[str, Any]], **options: Any) -> None:
+        """Import the data in batches with a fixed amount of queries per batch"""
+        importer = BulkImporter(
+            batch_size=options['batch_size'],
+            fail_fast=options['fail_fast'],
+            on_duplicate=self.write_duplicate,
+            on_error=lambda _, exc: self.write_error(exc),
+            on_batch=self.checkpoint,
+        )
+
+        try:
+            summary = importer.import_records(data)
+        finally:
+            # Bulk inserts do not send the signals that maintain the rankings
+            RankingService.rebuild_rankings()
+
+        self.write_summary(summary)
+
+    def parallel_import(
+        self,
+        data: Iterable[Dict[str, Any]],
+        competition_names: Set[str],
+        **options: Any,
+    ) -> None:
+        """Import the data in batches spread across several processes"""
+        importer = ParallelImporter(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            fail_fast=options['fail_fast'],
+            on_duplicate=self.write_duplicate,
+            on_error=self.write_error,
+            on_batch=self.checkpoint,
+        )
+
+        try:
+            summary = importer.import_records(data, competition_names)
+        finally:
+            # Bulk inserts do not send the signals that maintain the rankings
+            RankingService.rebuild_rankings()
+
+        self.write_summary(summary)
+
+    def import_each(self, data: List[Dict[str, Any]], **options: Any) -> None:
+        """Import the data one user and one submission at a time"""
+        summary = ImportSummary()
+
+        try:
+            with defer_rankings():
+                for user_data in data:
+                    summary.merge(self.import_user(user_data, **options))
+        finally:
+            # The signals that maintain the rankings were deferred for every row
+            RankingService.rebuild_rankings()
+
+        self.write_summary(summary)
+
+    def import_user(self, user_data: Dict[str, Any], **options: Any) -> ImportSummary:
+        """Import a single user and their submissions in one transaction"""
+        user_summary = ImportSummary(users=1)
+        try:
+            with transaction.atomic():
+                # Generate the user's email, username using their name
+                username, first_name, last_name = parse_user_name(user_data['name'])
+
+                # Get or create the user in the database
+                user = UserService.get_or_create_user_by_username(
+                    username=username,
+                    defaults={
+                        'first_name': first_name,
+                        'last_name': last_name,
+                    },
+                )
+
+                for submission in user_data.get('submissions', []):
+                    with transaction.atomic():
+                        # Generate competition name and submission name
+                        submission_name, competition_name = parse_submission_name(
+                            submission['name']
+                        )
+
+                        # Get or create the Competition in the database
+                        competition = CompetitionService.get_or_create_competition(
+                            name=competition_name
+                        )
+
+                        # Create the Submission in the database
+                        try:
+                            SubmissionService.create_submission(
+                                user=user,
+                                competition=competition,
+                                name=submission_name,
+                                score=submission['score'],
+                            )
+                            user_summary.created += 1
+                        except IntegrityError:
+                            user_summary.duplicates += 1
+                            self.write_duplicate(
+                                str(user), str(competition), submission_name
+                            )
+
+                # Checkpoint in the same transaction as the user's submissions
+                self.checkpoint(user_summary)
+
+        except Exception as exc:
+            self.write_error(exc)
+            if options['fail_fast']:
+                raise
+            user_summary = ImportSummary(users=1, failed=1)
+            self.checkpoint(user_summary)
+
+        return user_summary
+
+    def write_summary(self, summary: ImportSummary) -> None:
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Processed {summary.users} users: {summary.created} submissions '
+                f'created, {summary.duplicates} duplicates, {summary.failed} failed'
+            )
+        )
@@ -0,0 +1,19 @@
+from typing import Any, Optional
+
+from django.core.management.base import BaseCommand
+
+from leaderboard.services import RankingService
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculate the score of every user and the leaderboard from every '
+        'submission in the database'
+    )
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        ranked = RankingService.rebuild_rankings()
+
+        self.stdout.write(self.style.SUCCESS(f'Ranked {ranked} users'))
+
+        return 'OK'
@@ -0,0 +1,57 @@
+from typing import Any, Optional
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from leaderboard.slow_queries import clear_report, get_report, is_report_shared
+
+
+class Command(BaseCommand):
+    help = (
+        'Show the queries that took the most time in total above the slow query '
+        'threshold, with their plans'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='The amount of queries to show, the most time spent first',
+        )
+        parser.add_argument(
+            '--no-plans', action='store_true', help='Leave the query plans out'
+        )
+        parser.add_argument(
+            '--clear', action='store_true', help='Empty the report after showing it'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        if not is_report_shared():
+            raise CommandError(
+                'The slow query report is kept in the default cache, which only '
+                'lives in the memory of each process so this command can not see '
+                'what the web workers recorded. Set CACHE_URL to a shared cache.'
+            )
+
+        queries = get_report()[: options['limit']]
+        if not queries:
+            self.stdout.write('No slow queries have been recorded')
+
+        for position, query in enumerate(queries, start=1):
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f'#{position} {query["caller"]}: {query["count"]} slow runs, '
+                    f'{query["total_ms"]:.1f}ms in total, '
+                    f'{query["duration_ms"]:.1f}ms at most'
+                )
+            )
+            self.stdout.write(query['sql'])
+            self.stdout.write(f'Slowest parameters: {query["params"]}')
+            if not options['no_plans']:
+                self.stdout.write(query['plan'] or 'No plan')
+            self.stdout.write('')
+
+        if options['clear']:
+            clear_report()
+
+        return None
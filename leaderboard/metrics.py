@@ -0,0 +1,153 @@
+"""
+Prometheus metrics of the leaderboard
+
+The metrics are served in the Prometheus text format by ``/metrics/``. When the
+``PROMETHEUS_MULTIPROC_DIR`` environment variable names a directory, each process
+writes its metrics to files there. Every gunicorn worker and management command then
+contributes to the same totals, whichever worker answers the scrape.
+``gunicorn.conf.py`` sets this up for the web workers. Commands like
+``import_user_submissions`` must be run with the same variable to be counted.
+
+Only the addresses in ``LEADERBOARD_METRICS_ALLOWED_IPS``, staff users and scrapers
+sending ``LEADERBOARD_METRICS_TOKEN`` as a bearer token can read the metrics.
+"""
+
+import hmac
+import ipaddress
+import os
+import time
+from typing import Callable
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_DURATION = Histogram(
+    'leaderboard_request_duration_seconds',
+    'The time taken to respond to requests',
+    ['view', 'method', 'status'],
+)
+
+CACHE_REQUESTS = Counter(
+    'leaderboard_cache_requests',
+    'Lookups of cached rankings',
+    ['rankings', 'result'],
+)
+
+RANKINGS_BUILD_DURATION = Histogram(
+    'leaderboard_rankings_build_duration_seconds',
+    'The time taken to calculate rankings',
+    ['rankings'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+IMPORTED_RECORDS = Counter(
+    'leaderboard_imported_records',
+    'Records committed by import_user_submissions, its rate is the records '
+    'imported per second',
+)
+
+IMPORTED_SUBMISSIONS = Counter(
+    'leaderboard_imported_submissions',
+    'Submissions created by import_user_submissions',
+)
+
+IMPORT_RUNS = Counter(
+    'leaderboard_import_runs',
+    'Finished runs of import_user_submissions',
+    ['status'],
+)
+
+DB_CONNECTIONS_OPENED = Counter(
+    'leaderboard_db_connections_opened',
+    'Database connections opened',
+    ['alias'],
+)
+
+DB_CONNECTIONS_OPEN = Gauge(
+    'leaderboard_db_connections_open',
+    'Database connections kept open between requests',
+    ['alias'],
+    multiprocess_mode='livesum',
+)
+
+
+def update_open_connections() -> None:
+    """Record which of this process' database connections are open"""
+    for connection in connections.all():
+        DB_CONNECTIONS_OPEN.labels(connection.alias).set(
+            int(connection.connection is not None)
+        )
+
+
+def generate_metrics() -> bytes:
+    """
+    Render the metrics of every process in the Prometheus text format
+
+    :return: The rendered metrics.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry)
+
+
+def can_view_metrics(request: HttpRequest) -> bool:
+    """
+    Check whether a request may read the metrics
+
+    :param request: The request for the metrics.
+    :return: Whether the request comes from an allowed address, a staff user or
+        carries the metrics token.
+    """
+    token = settings.LEADERBOARD_METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and hmac.compare_digest(authorization, f'Bearer {token}'):
+        return True
+
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+
+    return any(
+        address in ipaddress.ip_network(network)
+        for network in settings.LEADERBOARD_METRICS_ALLOWED_IPS
+    )
+
+
+class MetricsMiddleware:
+    """Record the time taken to respond to each request, labelled with its view"""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        # The view name keeps the amount of labels small, e.g. "user-list"
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        REQUEST_DURATION.labels(view, request.method, response.status_code).observe(
+            duration
+        )
+
+        return response
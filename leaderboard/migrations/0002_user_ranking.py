@@ -0,0 +1,93 @@
+# Generated by Django 3.1.13 on 2026-10-16 22:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def populate_rankings(apps, schema_editor):
+    # The ranking rules as they were when this migration was written, a user's
+    # best 24 scores once they have made 3 submissions
+    Submission = apps.get_model('leaderboard', 'Submission')
+    UserRanking = apps.get_model('leaderboard', 'UserRanking')
+    quote = schema_editor.connection.ops.quote_name
+    sql = f"""
+        WITH numbered AS (
+            SELECT
+                {quote('user_id')} AS user_id,
+                {quote('score')} AS score,
+                ROW_NUMBER() OVER (
+                    PARTITION BY {quote('user_id')} ORDER BY {quote('score')} DESC
+                ) AS position,
+                COUNT(*) OVER (PARTITION BY {quote('user_id')}) AS submission_count
+            FROM {quote(Submission._meta.db_table)}
+        ),
+        totals AS (
+            SELECT
+                user_id,
+                SUM(score) AS total_score,
+                MAX(submission_count) AS submission_count
+            FROM numbered
+            WHERE position <= 24
+            GROUP BY user_id
+            HAVING MAX(submission_count) >= 3
+        )
+        SELECT
+            user_id,
+            total_score,
+            submission_count,
+            RANK() OVER (ORDER BY total_score DESC) AS rank
+        FROM totals
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+
+    UserRanking.objects.bulk_create(
+        [
+            UserRanking(
+                user_id=user_id,
+                total_score=total_score,
+                submission_count=submission_count,
+                rank=rank,
+            )
+            for user_id, total_score, submission_count, rank in rows
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRanking',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('total_score', models.IntegerField(help_text='The sum of the scores of the best submissions of the user')),
+                ('submission_count', models.IntegerField(help_text='The amount of submissions the user has made')),
+                ('rank', models.PositiveIntegerField(help_text='The position of the user')),
+                ('user', models.OneToOneField(help_text='The user this ranking belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='ranking', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Ranking',
+                'verbose_name_plural': 'User Rankings',
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userranking',
+            index=models.Index(fields=['rank'], name='userranking_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userranking',
+            index=models.Index(fields=['total_score'], name='userranking_total_score_idx'),
+        ),
+        migrations.RunPython(populate_rankings, migrations.RunPython.noop),
+    ]
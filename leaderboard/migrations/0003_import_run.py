@@ -0,0 +1,38 @@
+# Generated by Django 3.1.13 on 2026-10-16 22:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0002_user_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('file_name', models.CharField(help_text='The name of the file that was imported', max_length=255)),
+                ('file_hash', models.CharField(db_index=True, help_text='The SHA-256 hash of the file that was imported', max_length=64)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', help_text='The status of the run', max_length=16)),
+                ('first_record', models.PositiveIntegerField(default=0, help_text='The index of the record in the file this run started at')),
+                ('records_processed', models.PositiveIntegerField(default=0, help_text='The amount of records in the file that are committed')),
+                ('submissions_created', models.PositiveIntegerField(default=0, help_text='The amount of submissions created by this run')),
+                ('duplicates', models.PositiveIntegerField(default=0, help_text='The amount of submissions that already existed')),
+                ('failures', models.PositiveIntegerField(default=0, help_text='The amount of records that could not be imported')),
+                ('finished_at', models.DateTimeField(blank=True, help_text='The time and date the run finished', null=True)),
+                ('resumed_from', models.ForeignKey(blank=True, help_text='The interrupted run this run carried on from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumed_by', to='leaderboard.importrun')),
+            ],
+            options={
+                'verbose_name': 'Import Run',
+                'verbose_name_plural': 'Import Runs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.1.13 on 2026-10-16 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0003_import_run'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', '-score'], name='submission_user_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['competition', '-score'], name='submission_comp_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['score'], name='submission_score_idx'),
+        ),
+        # Functional index for case insensitive username lookups, which Django 3.1
+        # can not declare on the model
+        migrations.RunSQL(
+            'CREATE INDEX user_username_lower_idx ON leaderboard_user (LOWER(username));',
+            'DROP INDEX user_username_lower_idx;',
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.1.13 on 2026-10-16 23:00
+
+from django.db import migrations, models
+
+
+def populate_user_scores(apps, schema_editor):
+    # The aggregates as they were defined when this migration was written, the
+    # amount of submissions and the sum of the best 24 scores
+    User = apps.get_model('leaderboard', 'User')
+    Submission = apps.get_model('leaderboard', 'Submission')
+    quote = schema_editor.connection.ops.quote_name
+    user_table = quote(User._meta.db_table)
+    submission_table = quote(Submission._meta.db_table)
+    sql = f"""
+        UPDATE {user_table} SET
+            {quote('submission_count')} = (
+                SELECT COUNT(*)
+                FROM {submission_table} s
+                WHERE s.{quote('user_id')} = {user_table}.{quote('id')}
+            ),
+            {quote('top24_score')} = COALESCE((
+                SELECT SUM(best.{quote('score')})
+                FROM (
+                    SELECT s.{quote('score')}
+                    FROM {submission_table} s
+                    WHERE s.{quote('user_id')} = {user_table}.{quote('id')}
+                    ORDER BY s.{quote('score')} DESC
+                    LIMIT 24
+                ) best
+            ), 0)
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        # Removing the fields when migrating backwards rebuilds the table on SQLite
+        # too, so the LOWER(username) index is re-created before 0004 drops it
+        migrations.RunSQL(
+            migrations.RunSQL.noop,
+            'CREATE INDEX IF NOT EXISTS user_username_lower_idx '
+            'ON leaderboard_user (LOWER(username));',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='submission_count',
+            field=models.PositiveIntegerField(default=0, help_text='The amount of submissions the user has made'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='top24_score',
+            field=models.IntegerField(default=0, help_text='The sum of the scores of the best 24 submissions'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-top24_score', 'submission_count'], name='user_top24_score_idx'),
+        ),
+        # SQLite rebuilds the table to add the fields, which drops the LOWER(username)
+        # index from 0004 because Django does not know about it
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS user_username_lower_idx '
+            'ON leaderboard_user (LOWER(username));',
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunPython(populate_user_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.13 on 2026-10-16 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0005_user_score_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['created_at', 'user', 'score'], name='submission_created_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@ import uuid
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 
 class BaseModel(models.Model):
@@ -35,12 +36,31 @@ class User(BaseModel, AbstractUser):
     # )
     """The submissions this User has made to competitions"""
 
+    submission_count = models.PositiveIntegerField(
+        default=0, help_text='The amount of submissions the user has made'
+    )
+    """The amount of :class:`Submission`\s this User has made, kept up to date with
+    :attr:`top24_score` whenever one of their submissions is written"""
+    top24_score = models.IntegerField(
+        default=0, help_text='The sum of the scores of the best 24 submissions'
+    )
+    """The sum of the scores of this User's best 24 :class:`Submission`\s"""
+
     def __str__(self) -> str:
         return self.username
 
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            # Users in score order, filtered on their submission count for eligibility
+            models.Index(
+                fields=['-top24_score', 'submission_count'],
+                name='user_top24_score_idx',
+            ),
+        ]
+        # An index on LOWER(username) for case insensitive lookups is created by
+        # the 0004_hot_path_indexes migration
 
 
 class Competition(BaseModel):
@@ -101,3 +121,149 @@ class Submission(BaseModel):
         verbose_name_plural = 'Submissions'
         unique_together = ['name', 'competition']
         ordering = ['score']
+        indexes = [
+            # Each user's best submissions, used to rank them
+            models.Index(fields=['user', '-score'], name='submission_user_score_idx'),
+            # Each competition's best submissions
+            models.Index(
+                fields=['competition', '-score'], name='submission_comp_score_idx'
+            ),
+            # The default ordering of submissions
+            models.Index(fields=['score'], name='submission_score_idx'),
+            # The submissions of a ranking window, covering the columns it ranks by
+            models.Index(
+                fields=['created_at', 'user', 'score'],
+                name='submission_created_idx',
+            ),
+        ]
+
+
+class UserRanking(BaseModel):
+    """
+    Model that stores the leaderboard position of a :class:`User`
+
+    Rows are maintained incrementally whenever a :class:`Submission` is written so
+    the leaderboard can be read without recalculating every :class:`User`'s score.
+    Only :class:`User`\s that are eligible for a ranking have a row.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='ranking',
+        help_text='The user this ranking belongs to',
+    )
+    """The :class:`User` this ranking belongs to"""
+    total_score = models.IntegerField(
+        help_text='The sum of the scores of the best submissions of the user'
+    )
+    """The sum of the scores of the :class:`User`'s best submissions"""
+    submission_count = models.IntegerField(
+        help_text='The amount of submissions the user has made'
+    )
+    """The amount of submissions the :class:`User` has made"""
+    rank = models.PositiveIntegerField(help_text='The position of the user')
+    """The position of the :class:`User` on the leaderboard, ties share a rank"""
+
+    def __str__(self) -> str:
+        return f'{self.user} - {self.rank}'
+
+    class Meta:
+        verbose_name = 'User Ranking'
+        verbose_name_plural = 'User Rankings'
+        ordering = ['rank']
+        indexes = [
+            models.Index(fields=['rank'], name='userranking_rank_idx'),
+            models.Index(fields=['total_score'], name='userranking_total_score_idx'),
+        ]
+
+
+class ImportRun(BaseModel):
+    """
+    Model that records a run of the ``import_user_submissions`` command
+
+    The run doubles as a checkpoint: ``records_processed`` is only increased in the
+    same transaction as the records it counts, so an interrupted run can be resumed
+    from exactly where it stopped.
+    """
+
+    class Status(models.TextChoices):
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    file_name = models.CharField(
+        max_length=255, help_text='The name of the file that was imported'
+    )
+    """The name of the file that was imported"""
+    file_hash = models.CharField(
+        max_length=64,
+        db_index=True,
+        help_text='The SHA-256 hash of the file that was imported',
+    )
+    """The SHA-256 hash of the file, used to find the run to resume"""
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.RUNNING,
+        help_text='The status of the run',
+    )
+    """Whether the run is still running, has completed or has failed"""
+    resumed_from = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='resumed_by',
+        help_text='The interrupted run this run carried on from',
+    )
+    """The interrupted :class:`ImportRun` this run carried on from"""
+    first_record = models.PositiveIntegerField(
+        default=0, help_text='The index of the record in the file this run started at'
+    )
+    """The index of the record in the file this run started at"""
+    records_processed = models.PositiveIntegerField(
+        default=0, help_text='The amount of records in the file that are committed'
+    )
+    """The index of the first record in the file that has not been committed"""
+    submissions_created = models.PositiveIntegerField(
+        default=0, help_text='The amount of submissions created by this run'
+    )
+    """The amount of submissions created by this run"""
+    duplicates = models.PositiveIntegerField(
+        default=0, help_text='The amount of submissions that already existed'
+    )
+    """The amount of submissions that already existed"""
+    failures = models.PositiveIntegerField(
+        default=0, help_text='The amount of records that could not be imported'
+    )
+    """The amount of records that could not be imported"""
+    finished_at = models.DateTimeField(
+        null=True, blank=True, help_text='The time and date the run finished'
+    )
+    """The time and date the run finished"""
+
+    @property
+    def duration(self) -> float:
+        """The amount of seconds the run took, or has taken so far"""
+        finished_at = self.finished_at or timezone.now()
+        return (finished_at - self.created_at).total_seconds()
+
+    @property
+    def records_per_second(self) -> float:
+        """The amount of records committed per second by this run"""
+        records = self.records_processed - self.first_record
+        return records / self.duration if self.duration else 0.0
+
+    @property
+    def submissions_per_second(self) -> float:
+        """The amount of submissions created per second"""
+        return self.submissions_created / self.duration if self.duration else 0.0
+
+    def __str__(self) -> str:
+        return f'{self.file_name} - {self.created_at:%Y-%m-%d %H:%M}'
+
+    class Meta:
+        verbose_name = 'Import Run'
+        verbose_name_plural = 'Import Runs'
+        ordering = ['-created_at']
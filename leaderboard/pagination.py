@@ -1,21 +1,55 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from leaderboard.timing import span
+
+
+def get_value(instance, field):
+    """
+    Get a field of a model instance or ``.values()`` row, following ``__`` through
+    related objects
+    """
+    if isinstance(instance, dict):
+        return instance[field]
+
+    for name in field.split('__'):
+        instance = getattr(instance, name)
+
+    return instance
 
 
 def get_paginated_response(
-    *, pagination_class, serializer_class, queryset, request, view
+    *, pagination_class, serializer_class, queryset, request, view, prefetch=None
 ):
     paginator = pagination_class()
 
     page = paginator.paginate_queryset(queryset, request, view=view)
 
     if page is not None:
-        serializer = serializer_class(page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        # Related objects are only fetched for the rows of the current page
+        if prefetch is not None:
+            prefetch(page)
+        with span('serialize'):
+            data = serializer_class(page, many=True).data
+        return paginator.get_paginated_response(data)
 
-    serializer = serializer_class(queryset, many=True)
+    if prefetch is not None:
+        queryset = list(queryset)
+        prefetch(queryset)
+    with span('serialize'):
+        data = serializer_class(queryset, many=True).data
 
-    return Response(data=serializer.data)
+    return Response(data=data)
 
 
 class HeaderLimitOffsetPagination(LimitOffsetPagination):
@@ -23,6 +57,9 @@ class HeaderLimitOffsetPagination(LimitOffsetPagination):
     max_limit = 40
 
     def get_paginated_response(self, data):
+        return Response(data, headers=self.get_headers())
+
+    def get_headers(self):
         next_url = self.get_next_link()
         previous_url = self.get_previous_link()
         link_template = '<{url}>; rel="{rel}"'
@@ -37,4 +74,256 @@ class HeaderLimitOffsetPagination(LimitOffsetPagination):
         headers = {'Link': ', '.join(links)} if links else {}
         headers['X-Total-Count'] = self.count
 
-        return Response(data, headers=headers)
+        return headers
+
+
+class RankingPagination(HeaderLimitOffsetPagination):
+    """
+    Pagination for :class:`leaderboard.models.UserRanking` querysets
+
+    As well as limit/offset it supports keyset pagination using ``?after_rank=``,
+    which reads only the rows of the requested page from the rank index however
+    deep into the leaderboard the client is. Users sharing the last rank on a page
+    are always returned together so no one is skipped by the next page.
+    """
+
+    after_rank_query_param = 'after_rank'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.after_rank = self.get_after_rank(request)
+        if self.after_rank is None:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = 0
+        self.count = self.get_count(queryset)
+
+        page = list(queryset.filter(rank__gt=self.after_rank)[: self.limit])
+        self.has_next = len(page) == self.limit
+        if self.has_next:
+            last = page[-1]
+            page += list(
+                queryset.filter(
+                    rank=get_value(last, 'rank'),
+                    user__username__gt=get_value(last, 'user__username'),
+                )
+            )
+        self.page = page
+
+        return page
+
+    def get_after_rank(self, request):
+        value = request.query_params.get(self.after_rank_query_param)
+        if value is None:
+            return None
+
+        try:
+            after_rank = int(value)
+        except ValueError:
+            after_rank = -1
+
+        if after_rank < 0:
+            raise ValidationError(
+                {self.after_rank_query_param: 'A positive integer is required.'}
+            )
+
+        return after_rank
+
+    def get_next_link(self):
+        if self.after_rank is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.offset_query_param
+        )
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        return replace_query_param(
+            url, self.after_rank_query_param, get_value(self.page[-1], 'rank')
+        )
+
+    def get_previous_link(self):
+        if self.after_rank is None:
+            return super().get_previous_link()
+
+        return None
+
+
+class KeysetPagination(HeaderLimitOffsetPagination):
+    """
+    Cursor based pagination keyed on the ordering of the queryset plus ``id``
+
+    Each page is read with a ``WHERE`` on the last row of the previous page instead
+    of an ``OFFSET`` so every page costs the same however deep the client goes.
+    The opaque cursors of the next and previous pages are sent in the ``Link``
+    header. Counting every row is opt-in with ``?count=true`` or, on PostgreSQL,
+    ``?count=estimate`` for the planner's estimate. Passing ``?offset=`` falls back
+    to limit/offset pagination.
+    """
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.offset_query_param not in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = self.get_ordering(queryset)
+        values, self.reverse = self.decode_cursor(request)
+        self.count, self.count_header = self.get_counts(queryset, request)
+
+        ordering = [
+            f'-{field}' if descending != self.reverse else field
+            for field, descending in self.ordering
+        ]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values))
+
+        page = list(queryset[: self.limit + 1])
+        has_more = len(page) > self.limit
+        page = page[: self.limit]
+
+        if self.reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = page
+
+        return page
+
+    def get_ordering(self, queryset):
+        """
+        Get the fields the queryset is ordered by and whether each is descending,
+        finishing with ``id`` so every row has a unique position
+        """
+        ordering = []
+        for item in queryset.query.order_by or queryset.model._meta.ordering:
+            if isinstance(item, str):
+                name, descending = item.lstrip('-'), item.startswith('-')
+            elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+                name, descending = item.expression.name, item.descending
+            else:
+                raise ImproperlyConfigured(f'Unable to paginate by {item}')
+
+            # Compare foreign keys by their column rather than the related object
+            ordering.append((queryset.model._meta.get_field(name).attname, descending))
+
+        if 'id' not in [field for field, _ in ordering]:
+            ordering.append(('id', False))
+
+        return ordering
+
+    def get_keyset_filter(self, values):
+        """Build the filter for the rows after, or before, the cursor's row"""
+        (first_field, first_descending), *_ = self.ordering
+        after = 'lt' if first_descending != self.reverse else 'gt'
+        keyset = Q()
+        for index, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != self.reverse else 'gt'
+            condition = Q(**{f'{field}__{lookup}': values[index]})
+            for (previous_field, _), value in zip(self.ordering[:index], values):
+                condition &= Q(**{previous_field: value})
+            keyset |= condition
+
+        # The leading range lets the database seek to the cursor on an index
+        return Q(**{f'{first_field}__{after}e': values[0]}) & keyset
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = cursor['v'], bool(cursor['r'])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            values, reverse = None, False
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'})
+
+        return values, reverse
+
+    def encode_cursor(self, instance, reverse):
+        cursor = {
+            'v': [get_value(instance, field) for field, _ in self.ordering],
+            'r': reverse,
+        }
+        encoded = json.dumps(cursor, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+        return base64.urlsafe_b64encode(encoded.encode()).decode()
+
+    def get_counts(self, queryset, request):
+        """Get the total count and the header to send it in, if it was asked for"""
+        value = request.query_params.get(self.count_query_param, '').lower()
+        if value in ('', 'false', '0'):
+            return None, None
+        if value == 'estimate':
+            return self.get_estimated_count(queryset), 'X-Total-Count-Estimate'
+        if value in ('true', '1'):
+            return self.get_count(queryset), 'X-Total-Count'
+
+        raise ValidationError(
+            {self.count_query_param: 'Must be one of true, false or estimate.'}
+        )
+
+    def get_estimated_count(self, queryset):
+        """
+        Get the amount of rows the PostgreSQL planner expects the queryset to return
+        without running it, other databases count the rows
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return self.get_count(queryset)
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def get_link(self, instance, reverse):
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.offset_query_param
+        )
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(instance, reverse)
+        )
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+
+        return self.get_link(self.page[0], reverse=True)
+
+    def get_headers(self):
+        headers = super().get_headers()
+        if self.cursor_mode:
+            del headers['X-Total-Count']
+            if self.count_header is not None:
+                headers[self.count_header] = self.count
+
+        return headers
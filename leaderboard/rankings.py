@@ -0,0 +1,239 @@
+"""
+Ranking engine that calculates the leaderboard entirely inside the database.
+
+A :class:`User`'s ranking score is the sum of their best
+:data:`RANKED_SUBMISSION_LIMIT` submissions and only users that have made at least
+:data:`MINIMUM_SUBMISSIONS` submissions are ranked. Both rules are applied with
+window functions so a single query returns the finished leaderboard, which works on
+SQLite (3.25+) and PostgreSQL.
+
+Each :class:`User` also carries the aggregates the ranking is built from,
+``submission_count`` and ``top24_score``, which can be recalculated for every
+:class:`User` at once with :func:`recalculate_user_scores`.
+
+The same query ranks the entrants of a single competition with
+:func:`calculate_competition_rankings`, and only counts the submissions of a
+:class:`RankingWindow` such as this week when given the times it is between.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional, Tuple, Union
+from uuid import UUID
+
+from django.db import connection, models
+from django.utils import timezone
+
+from .models import Submission, User
+
+RANKED_SUBMISSION_LIMIT = 24
+"""The amount of a :class:`User`'s best submissions that count towards their score"""
+
+MINIMUM_SUBMISSIONS = 3
+"""The amount of submissions a :class:`User` needs to make before being ranked"""
+
+COMPETITION_MINIMUM_SUBMISSIONS = 1
+"""The amount of submissions to a :class:`Competition` a :class:`User` needs to make
+before being ranked in it"""
+
+
+class RankingWindow(models.TextChoices):
+    """The periods the leaderboard can be limited to"""
+
+    WEEK = 'week', 'This week'
+    MONTH = 'month', 'This month'
+    LAST_30_DAYS = '30d', 'Last 30 days'
+
+
+class Ranking(NamedTuple):
+    """A single row of the leaderboard"""
+
+    id: UUID
+    """The ID of the ranked :class:`User`"""
+    username: str
+    """The username of the ranked :class:`User`"""
+    first_name: str
+    """The first name of the ranked :class:`User`"""
+    last_name: str
+    """The last name of the ranked :class:`User`"""
+    total_score: int
+    """The sum of the :class:`User`'s best submission scores"""
+    submission_count: int
+    """The amount of submissions the :class:`User` has made"""
+    rank: int
+    """The position of the :class:`User` on the leaderboard, ties share a rank"""
+
+    def get_full_name(self) -> str:
+        """Mirror :meth:`User.get_full_name` so rows can be used in templates"""
+        return f'{self.first_name} {self.last_name}'.strip()
+
+
+def _get_rankings_sql(competition: bool = False, window: bool = False) -> str:
+    """
+    Build the ranking query using the table and column names of the models
+
+    :param competition: Whether to only rank the submissions of one competition,
+        whose ID is the first parameter of the query.
+    :param window: Whether to only rank the submissions made between two times,
+        which are the next parameters of the query.
+    """
+    quote = connection.ops.quote_name
+    conditions = []
+    if competition:
+        conditions.append(f"{quote('competition_id')} = %s")
+    if window:
+        # Bounding both ends lets every database estimate the range as narrow and
+        # scan the created_at index instead of the whole table
+        conditions.append(f"{quote('created_at')} >= %s")
+        conditions.append(f"{quote('created_at')} < %s")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    return f"""
+        WITH numbered AS (
+            SELECT
+                {quote('user_id')} AS user_id,
+                {quote('score')} AS score,
+                ROW_NUMBER() OVER (
+                    PARTITION BY {quote('user_id')} ORDER BY {quote('score')} DESC
+                ) AS position,
+                COUNT(*) OVER (PARTITION BY {quote('user_id')}) AS submission_count
+            FROM {quote(Submission._meta.db_table)}
+            {where}
+        ),
+        totals AS (
+            SELECT
+                user_id,
+                SUM(score) AS total_score,
+                MAX(submission_count) AS submission_count
+            FROM numbered
+            WHERE position <= %s
+            GROUP BY user_id
+            HAVING MAX(submission_count) >= %s
+        )
+        SELECT
+            u.{quote('id')},
+            u.{quote('username')},
+            u.{quote('first_name')},
+            u.{quote('last_name')},
+            totals.total_score,
+            totals.submission_count,
+            RANK() OVER (ORDER BY totals.total_score DESC) AS rank
+        FROM totals
+        INNER JOIN {quote(User._meta.db_table)} u ON u.{quote('id')} = totals.user_id
+        ORDER BY rank, u.{quote('username')}
+    """
+
+
+def get_window_bounds(
+    window: str, now: Optional[datetime] = None
+) -> Tuple[datetime, datetime]:
+    """
+    Get the times a :class:`RankingWindow` starts and ends at
+
+    Rolling windows move on the hour so the leaderboard they give, and the cache key
+    it is stored under, only change once an hour.
+
+    :param window: The :class:`RankingWindow`.
+    :param now: The time to find the window of, defaults to now.
+    :raise ValueError: If the window is not a :class:`RankingWindow`.
+    :return: The start of the window and the end of the window, which is excluded.
+    """
+    now = now or timezone.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if window == RankingWindow.WEEK:
+        start = midnight - timedelta(days=now.weekday())
+        return start, start + timedelta(days=7)
+    if window == RankingWindow.MONTH:
+        start = midnight.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    if window == RankingWindow.LAST_30_DAYS:
+        end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        return end - timedelta(days=30, hours=1), end
+
+    raise ValueError(f'Unknown ranking window {window!r}')
+
+
+def calculate_rankings(
+    window: Optional[Tuple[datetime, datetime]] = None,
+) -> List[Ranking]:
+    """
+    Calculate the leaderboard in a single query
+
+    :param window: Only count the submissions made from the first time up to the
+        second, which are found with a range scan of the ``created_at`` index.
+    :return: A list of :class:`Ranking`\\s ordered by rank.
+    """
+    to_uuid = User._meta.pk.to_python
+    params = [RANKED_SUBMISSION_LIMIT, MINIMUM_SUBMISSIONS]
+    if window is not None:
+        params[:0] = [connection.ops.adapt_datetimefield_value(time) for time in window]
+
+    with connection.cursor() as cursor:
+        cursor.execute(_get_rankings_sql(window=window is not None), params)
+        return [Ranking(to_uuid(row[0]), *row[1:]) for row in cursor.fetchall()]
+
+
+def calculate_competition_rankings(competition_id: Union[UUID, str]) -> List[Ranking]:
+    """
+    Calculate the leaderboard of a single :class:`Competition` in a single query
+
+    Users are ranked by the sum of their best :data:`RANKED_SUBMISSION_LIMIT`
+    submissions to the competition and need
+    :data:`COMPETITION_MINIMUM_SUBMISSIONS` to be ranked. Only the competition's
+    rows of the ``(competition, -score)`` index are read.
+
+    :param competition_id: The ID of the :class:`Competition` to rank.
+    :return: A list of :class:`Ranking`\\s ordered by rank.
+    """
+    to_uuid = User._meta.pk.to_python
+    competition_field = Submission._meta.get_field('competition')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _get_rankings_sql(competition=True),
+            [
+                competition_field.get_db_prep_value(competition_id, connection),
+                RANKED_SUBMISSION_LIMIT,
+                COMPETITION_MINIMUM_SUBMISSIONS,
+            ],
+        )
+        return [Ranking(to_uuid(row[0]), *row[1:]) for row in cursor.fetchall()]
+
+
+def _get_user_scores_sql() -> str:
+    """Build the query that recalculates the score aggregates of every user"""
+    quote = connection.ops.quote_name
+    user_table = quote(User._meta.db_table)
+    submission_table = quote(Submission._meta.db_table)
+
+    # Each correlated subquery is a range scan of the (user, -score) index
+    return f"""
+        UPDATE {user_table} SET
+            {quote('submission_count')} = (
+                SELECT COUNT(*)
+                FROM {submission_table} s
+                WHERE s.{quote('user_id')} = {user_table}.{quote('id')}
+            ),
+            {quote('top24_score')} = COALESCE((
+                SELECT SUM(best.{quote('score')})
+                FROM (
+                    SELECT s.{quote('score')}
+                    FROM {submission_table} s
+                    WHERE s.{quote('user_id')} = {user_table}.{quote('id')}
+                    ORDER BY s.{quote('score')} DESC
+                    LIMIT %s
+                ) best
+            ), 0)
+    """
+
+
+def recalculate_user_scores() -> int:
+    """
+    Recalculate the ``submission_count`` and ``top24_score`` of every :class:`User`
+    in a single query
+
+    :return: The amount of :class:`User`\\s that were updated.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_get_user_scores_sql(), [RANKED_SUBMISSION_LIMIT])
+        return cursor.rowcount
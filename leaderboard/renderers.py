@@ -0,0 +1,121 @@
+"""
+JSON rendering backed by orjson
+
+:class:`ORJSONRenderer` renders exactly the same bytes as DRF's ``JSONRenderer`` for
+the leaderboard's responses while encoding UUIDs and datetimes natively, and
+:func:`get_streaming_response` writes a list response incrementally so the whole
+body never has to be held in memory.
+"""
+
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+import orjson
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from leaderboard.timing import span
+
+OPTIONS = orjson.OPT_UTC_Z
+"""Render UTC datetimes with a ``Z`` suffix like DRF's ``DateTimeField`` does"""
+
+_ENCODER = JSONEncoder()
+
+_LINE_SEPARATOR = '\u2028'.encode()
+_PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+def _default(obj: Any) -> Any:
+    """Fall back to DRF's encoder for types orjson does not support, like Decimal"""
+    return _ENCODER.default(obj)
+
+
+def dumps(data: Any, indent: bool = False) -> bytes:
+    """
+    Encode data as JSON
+
+    :param data: The data to encode.
+    :param indent: Whether to indent the output by two spaces.
+    :return: The encoded JSON.
+    """
+    options = OPTIONS | orjson.OPT_INDENT_2 if indent else OPTIONS
+    body = orjson.dumps(data, default=_default, option=options)
+
+    # Escape the line separators that are invalid in JavaScript like DRF does
+    if _LINE_SEPARATOR in body or _PARAGRAPH_SEPARATOR in body:
+        body = body.replace(_LINE_SEPARATOR, b'\\u2028').replace(
+            _PARAGRAPH_SEPARATOR, b'\\u2029'
+        )
+
+    return body
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Renderer which serializes to JSON using orjson"""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: Optional[str] = None,
+        renderer_context: Optional[Dict[str, Any]] = None,
+    ) -> bytes:
+        if data is None:
+            return b''
+
+        # Any indent asked for, e.g. "application/json; indent=4", gets two spaces
+        indent = bool(accepted_media_type and 'indent=' in accepted_media_type)
+
+        with span('serialize'):
+            return dumps(data, indent=indent)
+
+
+def stream_json_array(
+    rows: Iterable[Any], to_representation: Callable[[Any], Any], chunk_size: int
+) -> Iterator[bytes]:
+    """
+    Encode rows as a JSON array a chunk at a time
+
+    :param rows: The rows to encode.
+    :param to_representation: A callable that turns a row into the data to encode.
+    :param chunk_size: The amount of rows to encode in each chunk.
+    :return: An iterator of the chunks of the JSON array.
+    """
+    iterator = iter(rows)
+    yield b'['
+    separator = b''
+    while chunk := list(islice(iterator, chunk_size)):
+        yield separator + b','.join(dumps(to_representation(row)) for row in chunk)
+        separator = b','
+    yield b']'
+
+
+def get_streaming_response(
+    *, serializer_class, queryset, chunk_size: int = 2000
+) -> StreamingHttpResponse:
+    """
+    Stream every row of a ``.values()`` queryset as a JSON array
+
+    The rows are read with a server side cursor where the database supports it so
+    memory use does not grow with the size of the response. Rows that are already
+    in memory, like a cached leaderboard, can be passed instead of a queryset.
+
+    :param serializer_class: The
+        :class:`leaderboard.apis.values_serializers.ValuesSerializer` of the rows.
+    :param queryset: The queryset or list of rows to stream.
+    :param chunk_size: The amount of rows read and encoded at a time.
+    :return: The streaming response.
+    """
+    serializer = serializer_class(None)
+    if isinstance(queryset, QuerySet):
+        rows = queryset.iterator(chunk_size=chunk_size)
+    else:
+        rows = queryset
+    body = stream_json_array(rows, serializer.to_representation, chunk_size)
+
+    return StreamingHttpResponse(body, content_type=ORJSONRenderer.media_type)
@@ -1,17 +1,171 @@
 import logging
-from typing import Any, Dict, Optional, Sequence, Union
+import operator
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import partial, reduce
+from itertools import islice
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from uuid import UUID
 
-from django.db.models import Count, QuerySet
-from django.db.models.expressions import OuterRef, Subquery
-from django.db.models.query import Prefetch
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import (
+    F,
+    Prefetch,
+    Q,
+    QuerySet,
+    Value,
+    Window,
+    prefetch_related_objects,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower, Rank, RowNumber
+from django.utils import timezone
 
+from .cache import (
+    bump_competition_version,
+    bump_competitions_version,
+    bump_leaderboard_version,
+    bump_users_version,
+    get_competition_key,
+    get_or_build,
+    get_versioned_key,
+)
 from .filters import CompetitionFilter, SubmissionFilter, UserFilter
-from .models import Competition, Submission, User
+from .metrics import (
+    IMPORT_RUNS,
+    IMPORTED_RECORDS,
+    IMPORTED_SUBMISSIONS,
+    RANKINGS_BUILD_DURATION,
+)
+from .models import Competition, ImportRun, Submission, User, UserRanking
+from .rankings import (
+    MINIMUM_SUBMISSIONS,
+    RANKED_SUBMISSION_LIMIT,
+    Ranking,
+    calculate_competition_rankings,
+    calculate_rankings,
+    get_window_bounds,
+    recalculate_user_scores,
+)
+from .timing import instrument_service
 
 LOGGER = logging.getLogger('photocrowd')
 
+T = TypeVar('T')
 
+_rankings_deferred: ContextVar[bool] = ContextVar('rankings_deferred', default=False)
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split an iterable into lists of at most ``size`` items
+
+    :param iterable: The iterable to split.
+    :param size: The maximum size of each list.
+    :return: An iterator of lists.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def lock_rankings() -> None:
+    """
+    Stop other transactions from changing the :class:`UserRanking` table until the
+    current transaction ends
+
+    Moving a :class:`User` shifts the ranks of others based on the scores it reads,
+    so two changes made at the same time could both miss each other's. Plain reads
+    of the table are not blocked. SQLite already only allows a single writer.
+    """
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(UserRanking._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+
+
+@contextmanager
+def defer_rankings() -> Iterator[None]:
+    """
+    Stop the signals from re-ranking a :class:`User` after every change made inside
+    the block
+
+    Re-ranking one :class:`User` moves everyone ranked between their old and new
+    score, which is too slow to repeat for every row of a large write. The caller
+    has to run :meth:`RankingService.rebuild_rankings` once it is done instead.
+    """
+    token = _rankings_deferred.set(True)
+    try:
+        yield
+    finally:
+        _rankings_deferred.reset(token)
+
+
+def rankings_deferred() -> bool:
+    """Whether the rankings are to be rebuilt once the current write is done"""
+    return _rankings_deferred.get()
+
+
+def invalidate_leaderboard() -> None:
+    """
+    Invalidate any cached leaderboard data
+
+    The version is bumped straight away and again once the current transaction
+    commits, so a read that raced the write can not leave uncommitted data cached
+    against the new version.
+    """
+    bump_leaderboard_version()
+    transaction.on_commit(bump_leaderboard_version)
+
+
+def invalidate_users_list() -> None:
+    """
+    Invalidate any cached list of :class:`User`\s after a change that is not shown on
+    the leaderboard
+
+    Like :func:`invalidate_leaderboard` the version is bumped straight away and
+    again once the current transaction commits.
+    """
+    bump_users_version()
+    transaction.on_commit(bump_users_version)
+
+
+def invalidate_competition_leaderboard(
+    competition_id: Optional[Union[UUID, str]] = None,
+) -> None:
+    """
+    Invalidate the cached leaderboard of a :class:`Competition`, or of every
+    :class:`Competition` if no ID is given
+
+    Like :func:`invalidate_leaderboard` the version is bumped straight away and
+    again once the current transaction commits.
+
+    :param competition_id: The ID of the :class:`Competition` that changed.
+    """
+    if competition_id is None:
+        bump = bump_competitions_version
+    else:
+        bump = partial(bump_competition_version, competition_id)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+@instrument_service
 class UserService:
     """Service for interacting with the :class:`User` model"""
 
@@ -41,6 +195,30 @@ class UserService:
 
         return User.objects.get(id=user_id)
 
+    @staticmethod
+    def prefetch_submissions(
+        *, users: Sequence[User], limit: Optional[int] = None
+    ) -> None:
+        """
+        Prefetch the :class:`Submission`\s of a page of :class:`User`\s along with
+        their :class:`Competition`\s in a single query
+
+        :param users: The :class:`User`\s to prefetch the :class:`Submission`\s of.
+        :param limit: The maximum amount of :class:`Submission`\s to prefetch for
+            each :class:`User`, or None to prefetch all of them.
+        """
+        LOGGER.debug('UserService:prefetch_submissions called')
+
+        submissions = SubmissionService.get_submissions_per_parent(
+            parent_field='user', parent_ids=[user.id for user in users], limit=limit
+        )
+
+        # The reverse prefetch attaches each Submission to its User
+        prefetch_related_objects(
+            users,
+            Prefetch('submissions', queryset=submissions.select_related('competition')),
+        )
+
     @staticmethod
     def get_or_create_user_by_username(
         *, username: str, defaults: Dict[str, Any]
@@ -64,6 +242,78 @@ class UserService:
         except User.DoesNotExist:
             return UserService.create_user(username=username, **defaults)
 
+    @staticmethod
+    def bulk_get_or_create_users(
+        *, users: Dict[str, Dict[str, Any]], batch_size: int = 1000
+    ) -> Dict[str, UUID]:
+        """
+        Get or create many :class:`User`\s using as few queries as possible
+
+        Existing :class:`User`\s are found with case insensitive ``IN`` lookups and
+        the rest are created with ``bulk_create``, so the amount of queries grows
+        with the amount of batches rather than the amount of :class:`User`\s.
+
+        :param users: A dictionary of usernames to any data to use to create the
+            :class:`User` if it does not exist.
+        :param batch_size: The maximum amount of :class:`User`\s per query.
+        :return: A dictionary of lowercase usernames to the ID of their :class:`User`.
+        """
+        LOGGER.debug(f'UserService:bulk_get_or_create_users called with {len(users)}')
+
+        def get_user_ids(usernames: Iterable[str]) -> Dict[str, UUID]:
+            user_ids: Dict[str, UUID] = {}
+            for batch in chunked(usernames, batch_size):
+                user_ids.update(
+                    User.objects.annotate(username_lower=Lower('username'))
+                    .filter(username_lower__in=[username.lower() for username in batch])
+                    .values_list('username_lower', 'id')
+                )
+            return user_ids
+
+        user_ids = get_user_ids(users)
+
+        new_users = []
+        for username, defaults in users.items():
+            if username.lower() in user_ids:
+                continue
+            user = User(username=username, **defaults)
+            user.set_unusable_password()
+            new_users.append(user)
+
+        if new_users:
+            User.objects.bulk_create(
+                new_users, batch_size=batch_size, ignore_conflicts=True
+            )
+            # Conflicting rows keep their original ID so read the IDs back
+            user_ids.update(get_user_ids(user.username for user in new_users))
+
+        return user_ids
+
+    @staticmethod
+    def refresh_user_scores(*, user_id: Union[UUID, str]) -> Tuple[int, int]:
+        """
+        Recalculate the ``submission_count`` and ``top24_score`` of a :class:`User`
+        from their :class:`Submission`\s
+
+        :param user_id: The ID of the :class:`User` to recalculate.
+        :return: The new submission count and top 24 score of the :class:`User`.
+        """
+        LOGGER.debug(f'UserService:refresh_user_scores called with {user_id}')
+
+        submissions = Submission.objects.filter(user_id=user_id)
+        submission_count = submissions.count()
+        top24_score = sum(
+            submissions.order_by('-score').values_list('score', flat=True)[
+                :RANKED_SUBMISSION_LIMIT
+            ]
+        )
+
+        User.objects.filter(id=user_id).update(
+            submission_count=submission_count, top24_score=top24_score
+        )
+
+        return submission_count, top24_score
+
     @staticmethod
     def get_user_by_username(*, username: str) -> User:
         """
@@ -78,7 +328,11 @@ class UserService:
         """
         LOGGER.debug(f'UserService:get_user_by_username called with {username}')
 
-        return User.objects.get(username__iexact=username)
+        # Compare with LOWER() rather than __iexact so the functional index on
+        # LOWER(username) is used by every database
+        return User.objects.annotate(username_lower=Lower('username')).get(
+            username_lower=Lower(Value(username))
+        )
 
     @staticmethod
     def get_users(*, filters: Optional[Dict[str, Any]] = None) -> QuerySet:
@@ -91,10 +345,8 @@ class UserService:
         LOGGER.debug('UserService:get_users called')
         filters = filters or {}
 
-        qs = (
-            User.objects.all()
-            .prefetch_related('submissions', 'submissions__competition')
-            .order_by('username')
+        qs = User.objects.all().order_by(
+            'username'
         )  # order_by will be ignored if passed in filter
 
         return UserFilter(filters, qs).qs
@@ -104,54 +356,42 @@ class UserService:
         pass
 
     @staticmethod
-    def get_user_rankings() -> Sequence[User]:
+    def get_user_rankings(*, window: Optional[str] = None) -> Sequence[Ranking]:
         """
         Get all ranking scores for :class:`User`\s that have submitted at least three
         submissions
-        """
-        # Subquery to get the highest 24 submissions per user
-        sub_query = Subquery(
-            Submission.objects.filter(user_id=OuterRef('user_id'))
-            .order_by('-score')[:24]
-            .values_list('id', flat=True)
-        )
 
-        #  Fetch the top 24 submissions per user and store it in top_submissions
-        prefetch = Prefetch(
-            'submissions',
-            queryset=Submission.objects.filter(id__in=sub_query),
-            to_attr='top_submissions',
-        )
+        The rankings are read from the :class:`UserRanking` table which is kept up to
+        date by :class:`RankingService` whenever a :class:`Submission` is written.
+        The rankings of a window only count the submissions made within it and are
+        calculated from the ``created_at`` index instead. Either result is cached
+        until the next write bumps the leaderboard version.
 
-        # Query users that have at least submissions and prefetch their top 24
-        users = list(
-            User.objects.annotate(submission_count=Count('submissions'))
-            .filter(submission_count__gte=3)
-            .prefetch_related(prefetch)
-        )
+        :param window: The :class:`leaderboard.rankings.RankingWindow` to rank, or
+            None for all time.
+        :raise ValueError: If the window is not a
+            :class:`leaderboard.rankings.RankingWindow`.
+        :return: A list of :class:`leaderboard.rankings.Ranking` rows ordered by rank.
+        """
+        LOGGER.debug(f'UserService:get_user_rankings called with {window}')
 
-        # Loop through and combine the scores of each users top_submissions
-        for user in users:
-            user_score = 0
-            for submission in user.top_submissions:  # type: ignore
-                user_score += submission.score
+        if window is None:
+            return get_or_build(
+                get_versioned_key('rankings'),
+                RankingService.get_ranking_rows,
+                name='rankings',
+            )
 
-            setattr(user, 'total_score', user_score)
+        start, end = get_window_bounds(window)
 
-        # Use total_score to rank the users in order
-        users = sorted(
-            users, key=lambda user: user.total_score, reverse=True  # type: ignore
+        return get_or_build(
+            get_versioned_key(f'rankings:{window}:{start.isoformat()}'),
+            partial(calculate_rankings, window=(start, end)),
+            name=f'rankings:{window}',
         )
 
-        # Generate a rank for each user
-        rank = 1
-        for user in users:
-            setattr(user, 'rank', rank)
-            rank += 1
-
-        return users
-
 
+@instrument_service
 class CompetitionService:
     """Service for interacting with the :class:`Competition` model"""
 
@@ -181,6 +421,33 @@ class CompetitionService:
 
         return Competition.objects.get(id=competition_id)
 
+    @staticmethod
+    def prefetch_submissions(
+        *, competitions: Sequence[Competition], limit: Optional[int] = None
+    ) -> None:
+        """
+        Prefetch the :class:`Submission`\s of a page of :class:`Competition`\s along
+        with their :class:`User`\s in a single query
+
+        :param competitions: The :class:`Competition`\s to prefetch the
+            :class:`Submission`\s of.
+        :param limit: The maximum amount of :class:`Submission`\s to prefetch for
+            each :class:`Competition`, or None to prefetch all of them.
+        """
+        LOGGER.debug('CompetitionService:prefetch_submissions called')
+
+        submissions = SubmissionService.get_submissions_per_parent(
+            parent_field='competition',
+            parent_ids=[competition.id for competition in competitions],
+            limit=limit,
+        )
+
+        # The reverse prefetch attaches each Submission to its Competition
+        prefetch_related_objects(
+            competitions,
+            Prefetch('submissions', queryset=submissions.select_related('user')),
+        )
+
     @staticmethod
     def get_competition_by_name(*, name: str) -> Competition:
         """
@@ -210,6 +477,44 @@ class CompetitionService:
         except Competition.DoesNotExist:
             return CompetitionService.create_competition(name=name)
 
+    @staticmethod
+    def bulk_get_or_create_competitions(
+        *, names: Iterable[str], batch_size: int = 1000
+    ) -> Dict[str, UUID]:
+        """
+        Get or create many :class:`Competition`\s using as few queries as possible
+
+        :param names: The names of the :class:`Competition`\s.
+        :param batch_size: The maximum amount of :class:`Competition`\s per query.
+        :return: A dictionary of names to the ID of their :class:`Competition`.
+        """
+        names = set(names)
+        LOGGER.debug(
+            f'CompetitionService:bulk_get_or_create_competitions called with '
+            f'{len(names)}'
+        )
+
+        def get_competition_ids(batch_names: Iterable[str]) -> Dict[str, UUID]:
+            competition_ids: Dict[str, UUID] = {}
+            for batch in chunked(batch_names, batch_size):
+                competition_ids.update(
+                    Competition.objects.filter(name__in=batch).values_list('name', 'id')
+                )
+            return competition_ids
+
+        competition_ids = get_competition_ids(names)
+
+        missing = names - competition_ids.keys()
+        if missing:
+            Competition.objects.bulk_create(
+                [Competition(name=name) for name in missing],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+            competition_ids.update(get_competition_ids(missing))
+
+        return competition_ids
+
     @staticmethod
     def get_competitions(*, filters: Optional[Dict[str, Any]] = None) -> QuerySet:
         """
@@ -221,15 +526,14 @@ class CompetitionService:
         LOGGER.debug('CompetitionService:get_competitions called')
         filters = filters or {}
 
-        qs = (
-            Competition.objects.all()
-            .prefetch_related('submissions', 'submissions__user')
-            .order_by('name')
+        qs = Competition.objects.all().order_by(
+            'name'
         )  # order_by will be ignored if passed in filter
 
         return CompetitionFilter(filters, qs).qs
 
 
+@instrument_service
 class SubmissionService:
     """Service for interacting with the :class:`Submission` model"""
 
@@ -267,6 +571,63 @@ class SubmissionService:
             user=user, competition=competition, name=name, score=score
         )
 
+    @staticmethod
+    def bulk_create_submissions(
+        *, submissions: Sequence[Submission], batch_size: int = 1000
+    ) -> Tuple[int, List[Submission]]:
+        """
+        Create many :class:`Submission`\s using as few queries as possible
+
+        :class:`Submission`\s that share a name and :class:`Competition` with an
+        existing :class:`Submission`, or an earlier one in ``submissions``, are not
+        created and are returned as duplicates instead.
+
+        Model signals are not sent so :meth:`RankingService.rebuild_rankings` should
+        be called once all of the :class:`Submission`\s have been created.
+
+        :param submissions: The unsaved :class:`Submission`\s to create.
+        :param batch_size: The maximum amount of :class:`Submission`\s per query.
+        :return: The amount of :class:`Submission`\s created and a list of the
+            duplicates that were skipped.
+        """
+        LOGGER.debug(
+            f'SubmissionService:bulk_create_submissions called with {len(submissions)}'
+        )
+
+        existing = set()
+        for batch in chunked(submissions, batch_size):
+            keys = {
+                (submission.name, submission.competition_id) for submission in batch
+            }
+            existing.update(
+                keys.intersection(
+                    Submission.objects.filter(
+                        name__in={name for name, _ in keys},
+                        competition_id__in={
+                            competition_id for _, competition_id in keys
+                        },
+                    )
+                    .order_by()
+                    .values_list('name', 'competition_id')
+                )
+            )
+
+        new_submissions = []
+        duplicates = []
+        for submission in submissions:
+            key = (submission.name, submission.competition_id)
+            if key in existing:
+                duplicates.append(submission)
+            else:
+                existing.add(key)
+                new_submissions.append(submission)
+
+        Submission.objects.bulk_create(
+            new_submissions, batch_size=batch_size, ignore_conflicts=True
+        )
+
+        return len(new_submissions), duplicates
+
     @staticmethod
     def get_submissions(*, filters: Optional[Dict[str, Any]] = None) -> QuerySet:
         """
@@ -280,12 +641,67 @@ class SubmissionService:
 
         qs = (
             Submission.objects.all()
-            .prefetch_related('user', 'competition')
+            .select_related('user', 'competition')
             .order_by('score')
         )  # order_by will be ignored if passed in filter
 
         return SubmissionFilter(filters, qs).qs
 
+    @staticmethod
+    def get_submissions_per_parent(
+        *, parent_field: str, parent_ids: Sequence[UUID], limit: Optional[int] = None
+    ) -> QuerySet:
+        """
+        Get the :class:`Submission`\s of a set of :class:`User`\s or
+        :class:`Competition`\s, keeping at most ``limit`` of each in score order
+
+        The limit is applied in the database with a window function so only the
+        rows that will be used are ever read into memory.
+
+        :param parent_field: The field of the parent, either ``user`` or
+            ``competition``.
+        :param parent_ids: The IDs of the parents to get the :class:`Submission`\s
+            of.
+        :param limit: The maximum amount of :class:`Submission`\s of each parent,
+            or None for all of them.
+        :return: A :class:`django.db.models.QuerySet` of :class:`Submission`\s.
+        """
+        LOGGER.debug(
+            f'SubmissionService:get_submissions_per_parent called with {parent_field}'
+        )
+
+        parent_column = f'{parent_field}_id'
+        qs = Submission.objects.filter(**{f'{parent_column}__in': parent_ids}).order_by(
+            'score', 'id'
+        )
+        if limit is None:
+            return qs
+        if not parent_ids:
+            # An empty IN list can not be compiled into the subquery below
+            return qs.none()
+
+        # Window functions can not be filtered on directly so number the rows of
+        # each parent in a subquery and keep the IDs of the first few
+        numbered = (
+            qs.annotate(
+                parent_position=Window(
+                    RowNumber(),
+                    partition_by=[F(parent_column)],
+                    order_by=[F('score').asc(), F('id').asc()],
+                )
+            )
+            .order_by()
+            .values('id', 'parent_position')
+        )
+        sql, params = numbered.query.sql_with_params()
+
+        return qs.filter(
+            id__in=RawSQL(
+                f'SELECT id FROM ({sql}) numbered WHERE parent_position <= %s',
+                (*params, limit),
+            )
+        )
+
     @staticmethod
     def get_submission(*, submission_id: Union[str, UUID]) -> Submission:
         """
@@ -298,4 +714,408 @@ class SubmissionService:
         """
         LOGGER.debug(f'SubmissionService:get_submission called with {submission_id}')
 
-        return Submission.objects.get(id=submission_id)
+        return Submission.objects.select_related('user', 'competition').get(
+            id=submission_id
+        )
+
+
+@instrument_service
+class RankingService:
+    """Service for maintaining the :class:`UserRanking` table"""
+
+    @staticmethod
+    def get_rankings(*, search: Optional[str] = None) -> QuerySet:
+        """
+        Get all :class:`UserRanking`\s ordered by rank
+
+        :param search: Only include :class:`User`\s whose username or name contains
+            this text.
+        :return: A :class:`django.db.models.QuerySet` of :class:`UserRanking`\s.
+        """
+        LOGGER.debug('RankingService:get_rankings called')
+
+        qs = UserRanking.objects.select_related('user').order_by(
+            'rank', 'user__username'
+        )
+        if search:
+            fields = ['username', 'first_name', 'last_name']
+            qs = qs.filter(
+                reduce(
+                    operator.or_,
+                    [Q(**{f'user__{field}__icontains': search}) for field in fields],
+                )
+            )
+
+        return qs
+
+    @staticmethod
+    def get_ranking_rows(
+        *,
+        search: Optional[str] = None,
+        descending: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Ranking]:
+        """
+        Get a page of the leaderboard as :class:`leaderboard.rankings.Ranking` rows
+
+        Only the columns of the rows are selected and the page is read in rank
+        order from the rank index.
+
+        :param search: Only include :class:`User`\s whose username or name contains
+            this text.
+        :param descending: Whether to start from the lowest rank.
+        :param offset: The amount of rows to skip.
+        :param limit: The maximum amount of rows, or None for all of them.
+        :return: A list of :class:`leaderboard.rankings.Ranking` rows.
+        """
+        LOGGER.debug('RankingService:get_ranking_rows called')
+
+        qs = RankingService.get_rankings(search=search)
+        if descending:
+            qs = qs.order_by('-rank', '-user__username')
+        rows = qs.values_list(
+            'user_id',
+            'user__username',
+            'user__first_name',
+            'user__last_name',
+            'total_score',
+            'submission_count',
+            'rank',
+        )
+        end = None if limit is None else offset + limit
+
+        return [Ranking(*row) for row in rows[offset:end]]
+
+    @staticmethod
+    def count_rankings(*, search: Optional[str] = None) -> int:
+        """
+        Count the :class:`User`\s on the leaderboard
+
+        The total is cached until the next write bumps the leaderboard version.
+
+        :param search: Only count :class:`User`\s whose username or name contains
+            this text.
+        :return: The amount of ranked :class:`User`\s.
+        """
+        LOGGER.debug('RankingService:count_rankings called')
+
+        if search:
+            return RankingService.get_rankings(search=search).count()
+
+        return get_or_build(
+            get_versioned_key('rankings:count'),
+            UserRanking.objects.count,
+            name='rankings:count',
+        )
+
+    @staticmethod
+    def get_competition_rankings(
+        *, competition_id: Union[UUID, str]
+    ) -> Sequence[Ranking]:
+        """
+        Get the leaderboard of a single :class:`Competition`
+
+        Each competition's leaderboard is cached separately and is only rebuilt when
+        a submission is made to that competition, or a user or competition changes.
+
+        :param competition_id: The ID of the :class:`Competition`.
+        :return: A list of :class:`leaderboard.rankings.Ranking`\\s ordered by rank.
+        """
+        LOGGER.debug('RankingService:get_competition_rankings called')
+
+        return get_or_build(
+            get_competition_key(competition_id, 'rankings'),
+            partial(calculate_competition_rankings, competition_id),
+            name='competition',
+        )
+
+    @staticmethod
+    def search_ranking_rows(
+        rows: Sequence[Ranking], *, search: Optional[str] = None
+    ) -> Sequence[Ranking]:
+        """
+        Filter :class:`leaderboard.rankings.Ranking` rows like
+        :meth:`get_rankings` filters the stored rankings
+
+        :param rows: The rows to filter.
+        :param search: Only include :class:`User`\\s whose username or name contains
+            this text.
+        :return: The matching rows, in the same order.
+        """
+        if not search:
+            return rows
+
+        search = search.casefold()
+
+        return [
+            row
+            for row in rows
+            if any(
+                search in value.casefold()
+                for value in (row.username, row.first_name, row.last_name)
+            )
+        ]
+
+    @staticmethod
+    @transaction.atomic
+    def refresh_user_ranking(*, user_id: Union[UUID, str]) -> Optional[UserRanking]:
+        """
+        Recalculate the ranking of a single :class:`User` and move the
+        :class:`UserRanking`\s of any other :class:`User`\s it overtakes or falls
+        behind
+
+        Only the rows whose rank actually changes are updated so the cost does not
+        depend on the size of the leaderboard.
+
+        :param user_id: The ID of the :class:`User` to recalculate.
+        :return: The updated :class:`UserRanking` or None if the :class:`User` is not
+            eligible for a ranking.
+        """
+        LOGGER.debug(f'RankingService:refresh_user_ranking called with {user_id}')
+
+        lock_rankings()
+
+        submission_count, top24_score = UserService.refresh_user_scores(user_id=user_id)
+        total_score: Optional[int] = None
+        if submission_count >= MINIMUM_SUBMISSIONS:
+            total_score = top24_score
+
+        ranking = (
+            UserRanking.objects.select_for_update().filter(user_id=user_id).first()
+        )
+        previous_score = ranking.total_score if ranking else None
+
+        # A user's rank is one more than the amount of users with a higher score, so
+        # only the users scoring between the previous and new score need to move
+        others = UserRanking.objects.exclude(user_id=user_id)
+        if previous_score is None and total_score is not None:
+            others.filter(total_score__lt=total_score).update(rank=F('rank') + 1)
+        elif previous_score is not None and total_score is None:
+            others.filter(total_score__lt=previous_score).update(rank=F('rank') - 1)
+        elif previous_score is not None and total_score is not None:
+            if total_score > previous_score:
+                others.filter(
+                    total_score__gte=previous_score, total_score__lt=total_score
+                ).update(rank=F('rank') + 1)
+            elif total_score < previous_score:
+                others.filter(
+                    total_score__gte=total_score, total_score__lt=previous_score
+                ).update(rank=F('rank') - 1)
+
+        invalidate_leaderboard()
+
+        if total_score is None:
+            if ranking:
+                ranking.delete()
+            return None
+
+        if ranking is None:
+            ranking = UserRanking(user_id=user_id)
+
+        ranking.total_score = total_score
+        ranking.submission_count = submission_count
+        ranking.rank = others.filter(total_score__gt=total_score).count() + 1
+        ranking.save()
+
+        return ranking
+
+    @staticmethod
+    @transaction.atomic
+    def remove_user_ranking(*, user_id: Union[UUID, str]) -> None:
+        """
+        Remove the :class:`UserRanking` of a :class:`User` and move up every
+        :class:`User` that was ranked below them
+
+        :param user_id: The ID of the :class:`User` to remove from the leaderboard.
+        """
+        LOGGER.debug(f'RankingService:remove_user_ranking called with {user_id}')
+
+        lock_rankings()
+
+        ranking = (
+            UserRanking.objects.select_for_update().filter(user_id=user_id).first()
+        )
+        if ranking is None:
+            return
+
+        UserRanking.objects.exclude(user_id=user_id).filter(
+            total_score__lt=ranking.total_score
+        ).update(rank=F('rank') - 1)
+        ranking.delete()
+
+        invalidate_leaderboard()
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild_rankings() -> int:
+        """
+        Recalculate the score aggregates of every :class:`User` and the whole
+        :class:`UserRanking` table from the :class:`Submission`\s in the database
+
+        This should be used after writes that bypass the model signals, such as
+        ``bulk_create``.
+
+        :return: The amount of :class:`User`\s that were ranked.
+        """
+        LOGGER.info('RankingService:rebuild_rankings called')
+
+        lock_rankings()
+        started = time.perf_counter()
+        recalculate_user_scores()
+
+        # Rank straight from the aggregates on the user table
+        ranked_users = (
+            User.objects.filter(submission_count__gte=MINIMUM_SUBMISSIONS)
+            .annotate(rank=Window(Rank(), order_by=F('top24_score').desc()))
+            .values_list('id', 'top24_score', 'submission_count', 'rank')
+        )
+
+        UserRanking.objects.all().delete()
+        rankings = UserRanking.objects.bulk_create(
+            [
+                UserRanking(
+                    user_id=user_id,
+                    total_score=total_score,
+                    submission_count=submission_count,
+                    rank=rank,
+                )
+                for user_id, total_score, submission_count, rank in ranked_users
+            ]
+        )
+
+        invalidate_leaderboard()
+        invalidate_competition_leaderboard()
+
+        RANKINGS_BUILD_DURATION.labels('rebuild').observe(time.perf_counter() - started)
+
+        return len(rankings)
+
+
+class ImportRunService:
+    """Service for interacting with the :class:`ImportRun` model"""
+
+    @staticmethod
+    @transaction.atomic
+    def start_import_run(
+        *, file_name: str, file_hash: str, resume: bool = False, force: bool = False
+    ) -> ImportRun:
+        """
+        Start a new :class:`ImportRun`
+
+        A running :class:`ImportRun` is only resumed once it has not committed a
+        batch for ``LEADERBOARD_IMPORT_STALE_AFTER`` seconds, as the process running
+        it may still be alive.
+
+        :param file_name: The name of the file being imported.
+        :param file_hash: The SHA-256 hash of the file being imported.
+        :param resume: Whether to carry on from the latest :class:`ImportRun` of the
+            same file, if it did not complete.
+        :param force: Whether to resume a running :class:`ImportRun` even if it has
+            recently committed a batch.
+        :raise ValueError: If the :class:`ImportRun` to resume is still running.
+        :return: The new :class:`ImportRun`.
+        """
+        LOGGER.info(f'ImportRunService:start_import_run called with {file_name}')
+
+        previous_run = None
+        if resume:
+            # Only the latest run can be resumed, as the older ones have either been
+            # resumed already or were followed by a run that started over
+            previous_run = (
+                ImportRun.objects.select_for_update()
+                .filter(file_hash=file_hash)
+                .order_by('-created_at')
+                .first()
+            )
+
+        if previous_run is None or previous_run.status == ImportRun.Status.COMPLETED:
+            return ImportRun.objects.create(file_name=file_name, file_hash=file_hash)
+
+        if previous_run.status == ImportRun.Status.RUNNING:
+            stale_after = timedelta(seconds=settings.LEADERBOARD_IMPORT_STALE_AFTER)
+            if not force and previous_run.updated_at > timezone.now() - stale_after:
+                raise ValueError(
+                    f'Import run {previous_run.id} was updated at '
+                    f'{previous_run.updated_at} and may still be running'
+                )
+            # The process running it must have been killed
+            ImportRunService.finish_import_run(
+                import_run=previous_run, status=ImportRun.Status.FAILED
+            )
+
+        return ImportRun.objects.create(
+            file_name=file_name,
+            file_hash=file_hash,
+            resumed_from=previous_run,
+            first_record=previous_run.records_processed,
+            records_processed=previous_run.records_processed,
+        )
+
+    @staticmethod
+    def checkpoint_import_run(
+        *,
+        import_run: ImportRun,
+        records: int,
+        submissions_created: int = 0,
+        duplicates: int = 0,
+        failures: int = 0,
+    ) -> None:
+        """
+        Record that more records of an :class:`ImportRun` have been committed
+
+        This should be called in the same transaction that writes the records.
+
+        :param import_run: The :class:`ImportRun` to update.
+        :param records: The amount of records committed.
+        :param submissions_created: The amount of submissions created.
+        :param duplicates: The amount of submissions that already existed.
+        :param failures: The amount of records that could not be imported.
+        """
+        ImportRun.objects.filter(id=import_run.id).update(
+            records_processed=F('records_processed') + records,
+            submissions_created=F('submissions_created') + submissions_created,
+            duplicates=F('duplicates') + duplicates,
+            failures=F('failures') + failures,
+            updated_at=timezone.now(),
+        )
+
+        def count() -> None:
+            IMPORTED_RECORDS.inc(records)
+            IMPORTED_SUBMISSIONS.inc(submissions_created)
+
+        # Records rolled back with their transaction are not counted
+        transaction.on_commit(count)
+
+    @staticmethod
+    def finish_import_run(*, import_run: ImportRun, status: str) -> ImportRun:
+        """
+        Mark an :class:`ImportRun` as finished
+
+        :param import_run: The :class:`ImportRun` that has finished.
+        :param status: The final :class:`ImportRun.Status` of the run.
+        :return: The updated :class:`ImportRun`.
+        """
+        LOGGER.info(
+            f'ImportRunService:finish_import_run called with {import_run.id} {status}'
+        )
+
+        import_run.refresh_from_db()
+        import_run.status = status
+        import_run.finished_at = timezone.now()
+        import_run.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+        IMPORT_RUNS.labels(status).inc()
+
+        return import_run
+
+    @staticmethod
+    def get_import_runs() -> QuerySet:
+        """
+        Get all :class:`ImportRun`\s, newest first
+
+        :return: A :class:`django.db.models.QuerySet` of :class:`ImportRun`\s.
+        """
+        LOGGER.debug('ImportRunService:get_import_runs called')
+
+        return ImportRun.objects.order_by('-created_at')
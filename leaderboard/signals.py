@@ -0,0 +1,135 @@
+from typing import Any
+
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import slow_queries
+from .metrics import DB_CONNECTIONS_OPENED, update_open_connections
+from .models import Competition, Submission, User
+from .services import (
+    RankingService,
+    invalidate_competition_leaderboard,
+    invalidate_leaderboard,
+    invalidate_users_list,
+    rankings_deferred,
+)
+
+
+@receiver(pre_save, sender=Submission)
+def remember_previous_user(sender: Any, instance: Submission, **kwargs: Any) -> None:
+    """
+    Remember which :class:`User` and :class:`Competition` a :class:`Submission`
+    belonged to before it is updated so both can be re-ranked if it has been moved
+    """
+    if instance._state.adding:
+        return
+
+    previous = (
+        Submission.objects.filter(id=instance.id)
+        .values_list('user_id', 'competition_id')
+        .first()
+    )
+    if previous is not None:
+        (
+            instance._previous_user_id,  # type: ignore
+            instance._previous_competition_id,  # type: ignore
+        ) = previous
+
+
+@receiver(post_save, sender=Submission)
+def refresh_ranking_on_save(sender: Any, instance: Submission, **kwargs: Any) -> None:
+    """
+    Re-rank the :class:`User` whose :class:`Submission` was created or updated and
+    invalidate the leaderboard of its :class:`Competition`
+
+    Nothing is done while the rankings are deferred, as they are all rebuilt at the
+    end of the write.
+    """
+    if rankings_deferred():
+        return
+
+    previous_user_id = getattr(instance, '_previous_user_id', None)
+    if previous_user_id is not None and previous_user_id != instance.user_id:
+        RankingService.refresh_user_ranking(user_id=previous_user_id)
+
+    RankingService.refresh_user_ranking(user_id=instance.user_id)
+
+    previous_competition_id = getattr(instance, '_previous_competition_id', None)
+    if previous_competition_id not in (None, instance.competition_id):
+        invalidate_competition_leaderboard(previous_competition_id)
+
+    invalidate_competition_leaderboard(instance.competition_id)
+
+
+@receiver(post_delete, sender=Submission)
+def refresh_ranking_on_delete(sender: Any, instance: Submission, **kwargs: Any) -> None:
+    """Re-rank the :class:`User` whose :class:`Submission` was deleted"""
+    if rankings_deferred():
+        return
+
+    RankingService.refresh_user_ranking(user_id=instance.user_id)
+    invalidate_competition_leaderboard(instance.competition_id)
+
+
+@receiver(pre_delete, sender=User)
+def remove_ranking_on_delete(sender: Any, instance: User, **kwargs: Any) -> None:
+    """
+    Remove a :class:`User` from the leaderboard before they are deleted
+
+    This has to happen before the deletion cascades so that the :class:`User`\s
+    ranked below them can be moved up.
+    """
+    if rankings_deferred():
+        return
+
+    RankingService.remove_user_ranking(user_id=instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Competition)
+def invalidate_on_save(sender: Any, instance: Any, **kwargs: Any) -> None:
+    """
+    Invalidate the cached leaderboard when a :class:`User` or :class:`Competition`
+    that is shown in it changes
+
+    Logins only update ``last_login`` which is not part of the leaderboard, so they
+    only invalidate the list of users.
+    """
+    if kwargs.get('update_fields') == frozenset(['last_login']):
+        invalidate_users_list()
+        return
+
+    invalidate_leaderboard()
+    invalidate_competition_leaderboard()
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Competition)
+def invalidate_on_delete(sender: Any, instance: Any, **kwargs: Any) -> None:
+    """
+    Invalidate the cached leaderboard when a :class:`User` or :class:`Competition`
+    is deleted
+    """
+    invalidate_leaderboard()
+    invalidate_competition_leaderboard()
+
+
+@receiver(connection_created)
+def time_queries(sender: Any, connection: Any, **kwargs: Any) -> None:
+    """
+    Log the slow queries run on every new database connection and count the
+    connections opened
+    """
+    slow_queries.install(connection)
+    DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
+
+
+@receiver(request_finished)
+def count_open_connections(sender: Any, **kwargs: Any) -> None:
+    """
+    Record the database connections kept open after a request, once Django has
+    closed the ones past their ``CONN_MAX_AGE``
+    """
+    update_open_connections()
@@ -0,0 +1,261 @@
+"""
+Logging of slow database queries with their query plans
+
+Every query is timed by :func:`record_slow_query`, a database execute wrapper
+installed on each connection. A query that takes longer than
+``LEADERBOARD_SLOW_QUERY_THRESHOLD`` milliseconds is logged with:
+
+- its SQL and parameters
+- the service method that issued it
+- the plan the database chose for it
+
+It is also added to a report of the slowest queries, which is kept in the default
+cache so every worker process contributes to it. The report is shown with the
+``slow_queries`` management command, which refuses to run when the cache only lives
+in the memory of each process as it could never see the workers' reports.
+
+On PostgreSQL the plan can come from ``EXPLAIN ANALYZE`` by setting
+``LEADERBOARD_SLOW_QUERY_EXPLAIN_ANALYZE``. That runs the slow query a second time,
+so only ``SELECT`` queries are explained.
+"""
+
+import hashlib
+import inspect
+import logging
+import re
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+LOGGER = logging.getLogger('photocrowd')
+
+SLOW_QUERIES_KEY = 'leaderboard:slow_queries'
+"""The cache key of the slow query report"""
+
+SLOW_QUERY_WINDOW = 24 * 60 * 60
+"""How many seconds a query stays in the report after it was last slow"""
+
+MAX_PARAMS_LENGTH = 1000
+"""The longest representation of a query's parameters that is kept"""
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+}
+"""The cache backends that are not shared between processes"""
+
+_recording: ContextVar[bool] = ContextVar('recording', default=False)
+
+_PLACEHOLDER_LISTS = re.compile(r'%s(?:\s*,\s*%s)+')
+
+_service_methods: Dict[Any, str] = {}
+
+
+def get_fingerprint(sql: str) -> str:
+    """
+    Identify the queries that only differ in their parameters, including the
+    amount of them in an ``IN`` list
+
+    :param sql: The SQL of the query with ``%s`` placeholders.
+    :return: The fingerprint.
+    """
+    normalized = _PLACEHOLDER_LISTS.sub('%s, ...', sql)
+
+    return hashlib.md5(normalized.encode()).hexdigest()
+
+
+def get_caller() -> str:
+    """
+    Find the service method that issued the current query
+
+    :return: The name of the innermost service method on the stack, e.g.
+        ``UserService.get_user_by_username``, or the module and function of the
+        innermost leaderboard code for queries issued outside of the services, like
+        a queryset that is evaluated by a view.
+    """
+    if not _service_methods:
+        from . import services
+
+        for service in vars(services).values():
+            if isinstance(service, type) and service.__name__.endswith('Service'):
+                for name, attribute in vars(service).items():
+                    if isinstance(attribute, staticmethod):
+                        # Decorators like transaction.atomic share their code
+                        # between every function they wrap
+                        function = inspect.unwrap(attribute.__func__)
+                        _service_methods[function.__code__] = (
+                            f'{service.__name__}.{name}'
+                        )
+
+    caller = 'unknown'
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code in _service_methods:
+            return _service_methods[frame.f_code]
+
+        module = frame.f_globals.get('__name__', '')
+        in_leaderboard = module.startswith('leaderboard.') and module != __name__
+        if caller == 'unknown' and in_leaderboard:
+            caller = f'{module}.{frame.f_code.co_name}'
+        frame = frame.f_back
+
+    return caller
+
+
+def explain(connection: BaseDatabaseWrapper, sql: str, params: Any) -> Optional[str]:
+    """
+    Get the plan of a ``SELECT`` query
+
+    :param connection: The connection the query was run on.
+    :param sql: The SQL of the query.
+    :param params: The parameters of the query.
+    :return: The plan, or ``None`` if the query can not be explained.
+    """
+    if not sql.lstrip().upper().startswith('SELECT') or connection.needs_rollback:
+        return None
+
+    analyze = settings.LEADERBOARD_SLOW_QUERY_EXPLAIN_ANALYZE
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'postgresql' and analyze:
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) '
+    else:
+        prefix = 'EXPLAIN '
+
+    try:
+        # A savepoint stops a failed EXPLAIN from breaking the transaction
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+    except DatabaseError:
+        LOGGER.exception('Could not explain a slow query')
+        return None
+
+    if connection.vendor == 'sqlite':
+        # The last column of SQLite's plan describes each step
+        return '\n'.join(str(row[-1]) for row in rows)
+
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+
+def is_report_shared() -> bool:
+    """
+    Check whether the report is kept somewhere every process can add to
+
+    :return: Whether the default cache is shared between processes.
+    """
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def add_to_report(entry: Dict[str, Any]) -> None:
+    """
+    Add a slow query to the report, keeping the queries that took the most time in
+    total within :data:`SLOW_QUERY_WINDOW`
+
+    Workers updating the report at the same time can lose each other's updates,
+    which only makes the counts approximate.
+
+    :param entry: The slow query.
+    """
+    report: Dict[str, Dict[str, Any]] = cache.get(SLOW_QUERIES_KEY) or {}
+
+    fingerprint = entry['fingerprint']
+    previous = report.get(fingerprint)
+    if previous is None:
+        report[fingerprint] = {**entry, 'count': 1, 'total_ms': entry['duration_ms']}
+    else:
+        previous['count'] += 1
+        previous['total_ms'] = round(previous['total_ms'] + entry['duration_ms'], 2)
+        previous['last_seen'] = entry['last_seen']
+        if entry['duration_ms'] >= previous['duration_ms']:
+            # Keep the parameters and plan of the slowest run
+            previous.update(
+                {key: entry[key] for key in ['duration_ms', 'params', 'plan', 'caller']}
+            )
+
+    oldest = entry['last_seen'] - SLOW_QUERY_WINDOW
+    queries = sorted(
+        (query for query in report.values() if query['last_seen'] >= oldest),
+        key=lambda query: query['total_ms'],
+        reverse=True,
+    )[: settings.LEADERBOARD_SLOW_QUERY_REPORT_SIZE]
+    cache.set(
+        SLOW_QUERIES_KEY,
+        {query['fingerprint']: query for query in queries},
+        timeout=SLOW_QUERY_WINDOW,
+    )
+
+
+def get_report() -> List[Dict[str, Any]]:
+    """
+    Get the slow query report
+
+    :return: The slow queries, the most time spent in total first.
+    """
+    report = cache.get(SLOW_QUERIES_KEY) or {}
+
+    return sorted(report.values(), key=lambda query: query['total_ms'], reverse=True)
+
+
+def clear_report() -> None:
+    """Empty the slow query report"""
+    cache.delete(SLOW_QUERIES_KEY)
+
+
+def record_slow_query(
+    execute: Callable, sql: str, params: Any, many: bool, context: Dict[str, Any]
+) -> Any:
+    """
+    A database execute wrapper that logs and reports the queries slower than
+    ``LEADERBOARD_SLOW_QUERY_THRESHOLD`` milliseconds
+    """
+    threshold = settings.LEADERBOARD_SLOW_QUERY_THRESHOLD
+    if threshold <= 0 or _recording.get():
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = (time.perf_counter() - started) * 1000
+    if duration < threshold:
+        return result
+
+    # The queries made to explain and report this one must not be recorded too
+    token = _recording.set(True)
+    try:
+        entry = {
+            'fingerprint': get_fingerprint(sql),
+            'sql': sql,
+            'params': repr(params)[:MAX_PARAMS_LENGTH],
+            'caller': get_caller(),
+            'duration_ms': round(duration, 2),
+            'plan': None if many else explain(context['connection'], sql, params),
+            'last_seen': time.time(),
+        }
+        LOGGER.warning(
+            f'Slow query from {entry["caller"]} took {entry["duration_ms"]}ms: '
+            f'{sql} with {entry["params"]}\n{entry["plan"] or "No plan"}',
+            extra={'slow_query': entry},
+        )
+        add_to_report(entry)
+    finally:
+        _recording.reset(token)
+
+    return result
+
+
+def install(connection: BaseDatabaseWrapper) -> None:
+    """
+    Time every query run on a connection
+
+    :param connection: The connection to time.
+    """
+    if record_slow_query not in connection.execute_wrappers:
+        # Other wrappers are pushed and popped from the end around blocks of code
+        connection.execute_wrappers.insert(0, record_slow_query)
@@ -11,7 +11,7 @@ FAKER = Faker()
 class UserFactory(django.DjangoModelFactory):
     """Factory for generating :class:`User`\s for testing"""
 
-    username = factory.LazyAttribute(lambda _: FAKER.user_name())
+    username = factory.Sequence(lambda n: f'{FAKER.user_name()}{n}')
     password = factory.LazyFunction(lambda: make_password(FAKER.word()))
 
     @classmethod
@@ -28,7 +28,7 @@ class UserFactory(django.DjangoModelFactory):
 class CompetitionFactory(django.DjangoModelFactory):
     """Factory for generating :class:`Competition`/s for testing"""
 
-    name = factory.LazyAttribute(lambda _: FAKER.user_name())
+    name = factory.Sequence(lambda n: f'{FAKER.user_name()}{n}')
 
     class Meta:
         model = Competition
@@ -39,7 +39,7 @@ class SubmissionFactory(django.DjangoModelFactory):
 
     competition = factory.SubFactory(CompetitionFactory)
     user = factory.SubFactory(UserFactory)
-    name = factory.LazyAttribute(lambda _: FAKER.word())
+    name = factory.Sequence(lambda n: f'{FAKER.word()}{n}')
     score = factory.LazyAttribute(lambda _: FAKER.pyint(100, 10000))
 
     class Meta:
@@ -0,0 +1,87 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from leaderboard.cache import (
+    bump_leaderboard_version,
+    get_leaderboard_version,
+    get_or_build,
+)
+from leaderboard.services import UserService
+from leaderboard.tests.factories import SubmissionFactory, UserFactory
+
+
+class LeaderboardVersionTestCase(TestCase):
+    def test_bump_leaderboard_version(self) -> None:
+        """Test bumping the version increments it"""
+        version = get_leaderboard_version()
+        self.assertEqual(bump_leaderboard_version(), version + 1)
+
+    def test_bump_leaderboard_version_after_clear(self) -> None:
+        """Test the version is re-seeded if the cache is cleared"""
+        cache.clear()
+        self.assertIsInstance(bump_leaderboard_version(), int)
+
+
+class GetOrBuildTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_value_built_once(self) -> None:
+        """Test a cached value is not rebuilt"""
+        builder = mock.Mock(return_value='value')
+
+        self.assertEqual(get_or_build('key', builder), 'value')
+        self.assertEqual(get_or_build('key', builder), 'value')
+        builder.assert_called_once()
+
+    @override_settings(LEADERBOARD_CACHE_LOCK_POLL_INTERVAL=0.01)
+    def test_concurrent_misses_coalesced(self) -> None:
+        """Test only one caller builds a value while others wait for it"""
+        building = threading.Event()
+        release = threading.Event()
+        builder_calls = []
+
+        def slow_builder() -> str:
+            builder_calls.append(1)
+            building.set()
+            release.wait(5)
+            return 'value'
+
+        thread = threading.Thread(target=get_or_build, args=('key', slow_builder))
+        thread.start()
+        building.wait(5)
+
+        waiter_builder = mock.Mock(return_value='other')
+        waiter = threading.Timer(0.05, release.set)
+        waiter.start()
+
+        self.assertEqual(get_or_build('key', waiter_builder), 'value')
+        thread.join()
+        waiter_builder.assert_not_called()
+        self.assertEqual(len(builder_calls), 1)
+
+
+class CachedUserRankingsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = UserFactory()
+        SubmissionFactory.create_batch(size=3, user=self.user)
+
+    def test_rankings_served_from_cache(self) -> None:
+        """Test reading the rankings twice only queries the database once"""
+        UserService.get_user_rankings()
+
+        with self.assertNumQueries(0):
+            rankings = UserService.get_user_rankings()
+
+        self.assertEqual(rankings[0].id, self.user.id)
+
+    def test_rankings_invalidated_on_write(self) -> None:
+        """Test a new submission invalidates the cached rankings"""
+        UserService.get_user_rankings()
+        new_user = UserFactory()
+        SubmissionFactory.create_batch(size=3, user=new_user, score=10000)
+
+        self.assertEqual(UserService.get_user_rankings()[0].id, new_user.id)
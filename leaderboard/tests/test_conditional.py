@@ -0,0 +1,127 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from leaderboard.rankings import get_window_bounds
+from leaderboard.tests.factories import SubmissionFactory, UserFactory
+
+
+class ConditionalRequestTestCase(TestCase):
+    urls = [
+        '/api/submissions/rankings/',
+        '/api/submissions/',
+        '/api/users/',
+        '/api/competitions/',
+        '/leaderboard/',
+        '/leaderboard/data/',
+    ]
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = APIClient()
+        self.user = UserFactory()
+        SubmissionFactory.create_batch(size=3, user=self.user)
+
+    def test_etag_not_modified(self) -> None:
+        """Test a matching ETag is answered without querying the leaderboard"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(
+                    [query for query in queries if 'SELECT' in query['sql']]
+                )
+
+    def test_etag_changes_on_write(self) -> None:
+        """Test a new submission changes the ETag"""
+        etag = self.client.get(self.urls[0])['ETag']
+
+        SubmissionFactory(user=self.user)
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_unchanged_on_login(self) -> None:
+        """Test logging in does not invalidate the leaderboard"""
+        etag = self.client.get(self.urls[0])['ETag']
+
+        update_last_login(None, self.user)
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_users_etag_changes_on_login(self) -> None:
+        """Test logging in changes the ETag of the users list, which shows it"""
+        etag = self.client.get(self.urls[2])['ETag']
+
+        update_last_login(None, self.user)
+        response = self.client.get(self.urls[2], HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIsNotNone(response.json()[0]['last_login'])
+
+    def test_window_etag_changes_when_window_moves(self) -> None:
+        """Test the ETag of windowed rankings changes once the window moves on"""
+        url = f'{self.urls[0]}?window=week'
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        next_week = timezone.now() + timedelta(days=7)
+        with mock.patch(
+            'leaderboard.conditional.get_window_bounds',
+            lambda window: get_window_bounds(window, now=next_week),
+        ):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 200)
+
+    def test_etag_differs_per_page(self) -> None:
+        """Test each page of a list has its own ETag"""
+        first = self.client.get(self.urls[1], {'limit': 1})
+        second = self.client.get(self.urls[1], {'limit': 2})
+
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_if_modified_since(self) -> None:
+        """Test a request made since the last change is not modified"""
+        response = self.client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=http_date(1 << 32)
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_control(self) -> None:
+        """Test the Cache-Control header is configured per endpoint"""
+        with self.settings(
+            LEADERBOARD_CACHE_CONTROL={
+                'default': {'no_cache': True},
+                'rankings': {'max_age': 30},
+            }
+        ):
+            rankings = self.client.get(self.urls[0])
+            submissions = self.client.get(self.urls[1])
+
+        self.assertEqual(rankings['Cache-Control'], 'max-age=30')
+        self.assertEqual(submissions['Cache-Control'], 'no-cache')
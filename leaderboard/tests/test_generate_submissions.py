@@ -0,0 +1,113 @@
+from collections import Counter
+from io import StringIO
+from uuid import UUID
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from leaderboard.generators import (
+    MAX_SCORE,
+    MIN_SCORE,
+    _format_copy_row,
+    generate_submission_rows,
+)
+from leaderboard.models import Competition, Submission, User, UserRanking
+from leaderboard.services import UserService
+from leaderboard.tests.factories import CompetitionFactory, UserFactory
+
+
+class GenerateSubmissionsTestCase(TestCase):
+    def call_command(self, *args: str) -> str:
+        stdout = StringIO()
+        call_command(
+            'generate_submissions',
+            '--users',
+            '5',
+            '--competitions',
+            '3',
+            '--submissions',
+            '50',
+            '--batch-size',
+            '7',
+            *args,
+            stdout=stdout,
+        )
+
+        return stdout.getvalue()
+
+    def test_generate(self) -> None:
+        """Test generating users, competitions and ranked submissions"""
+        stdout = self.call_command('--prefix', 'test', '--days', '7')
+
+        self.assertEqual(User.objects.filter(username__startswith='test.').count(), 5)
+        self.assertEqual(Competition.objects.count(), 3)
+        self.assertEqual(Submission.objects.count(), 50)
+        self.assertIn('50 submissions prefixed test', stdout)
+        for submission in Submission.objects.all():
+            self.assertTrue(MIN_SCORE <= submission.score <= MAX_SCORE)
+
+        # The rankings are rebuilt from the generated submissions
+        self.assertEqual(UserRanking.objects.count(), 5)
+        rankings = UserService.get_user_rankings()
+        self.assertEqual(rankings[0].rank, 1)
+
+    def test_generate_twice(self) -> None:
+        """Test the default prefixes do not collide"""
+        self.call_command()
+        self.call_command()
+
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Submission.objects.count(), 100)
+
+    def test_no_users(self) -> None:
+        """Test submissions need a user and a competition"""
+        with self.assertRaises(CommandError):
+            call_command('generate_submissions', '--users', '0', stdout=StringIO())
+
+    def test_seed(self) -> None:
+        """Test the same seed generates the same submissions"""
+        user_ids = [user.id for user in UserFactory.create_batch(size=3)]
+        competition_ids = [CompetitionFactory().id]
+
+        def generate(seed: int) -> list:
+            rows = generate_submission_rows(
+                count=20,
+                prefix='test',
+                user_ids=user_ids,
+                competition_ids=competition_ids,
+                distribution='normal',
+                seed=seed,
+            )
+            # The IDs and times differ between runs
+            return [(row[4], row[5], row[6]) for row in rows]
+
+        self.assertEqual(generate(1), generate(1))
+        self.assertNotEqual(generate(1), generate(2))
+
+    def test_skew(self) -> None:
+        """Test a skew gives the first users the most submissions"""
+        user_ids = [user.id for user in UserFactory.create_batch(size=10)]
+        competition_ids = [CompetitionFactory().id]
+
+        rows = generate_submission_rows(
+            count=1000,
+            prefix='test',
+            user_ids=user_ids,
+            competition_ids=competition_ids,
+            skew=2,
+        )
+        counts = Counter(UUID(str(row[6])) for row in rows)
+        counts_per_user = [counts[user_id] for user_id in user_ids]
+
+        self.assertEqual(sum(counts_per_user), 1000)
+        self.assertGreater(counts_per_user[0], 500)
+        # The users making the most submissions are the first ones, in order
+        self.assertEqual(counts_per_user[:4], sorted(counts_per_user, reverse=True)[:4])
+        self.assertGreater(sum(counts_per_user[:5]), 5 * sum(counts_per_user[5:]))
+
+    def test_format_copy_row(self) -> None:
+        """Test values are escaped for COPY's text format"""
+        self.assertEqual(
+            _format_copy_row(('tab\there', 'new\nline\r', 'back\\slash', None, 1)),
+            'tab\\there\tnew\\nline\\r\tback\\\\slash\t\\N\t1',
+        )
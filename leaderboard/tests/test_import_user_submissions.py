@@ -0,0 +1,359 @@
+import gzip
+import json
+import tempfile
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from typing import Any, Callable, List, Optional, Tuple
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from leaderboard.importers import (
+    ImportSummary,
+    ParallelImporter,
+    collect_competition_names,
+    hash_file,
+    iter_json_array,
+)
+from leaderboard.models import Competition, ImportRun, Submission, User, UserRanking
+from leaderboard.services import RankingService
+from leaderboard.tests.factories import CompetitionFactory, SubmissionFactory
+
+DATA = [
+    {
+        'name': 'Jason Russell',
+        'submissions': [
+            {'score': 7819, 'name': 'party in "Democrat"'},
+            {'score': 3424, 'name': 'condition in "mother"'},
+            {'score': 5122, 'name': 'guess in "long"'},
+            {'score': 5122, 'name': 'guess in "long"'},
+        ],
+    },
+    {
+        'name': 'Mrs Jane Smith MD',
+        'submissions': [
+            {'score': 8387, 'name': 'plan in "Democrat"'},
+            {'score': 100, 'name': 'party in "nice"'},
+        ],
+    },
+    {'name': 'Unparseable Three Names', 'submissions': []},
+]
+
+
+class ImportUserSubmissionsTestCase(TestCase):
+    def call_command(
+        self,
+        *args: str,
+        compress: bool = False,
+        interrupted_at: int = 0,
+        still_running: bool = False,
+    ) -> str:
+        with tempfile.NamedTemporaryFile('wb', suffix='.json') as json_file:
+            content = json.dumps(DATA).encode()
+            json_file.write(gzip.compress(content) if compress else content)
+            json_file.flush()
+            if interrupted_at:
+                interrupted_run = ImportRun.objects.create(
+                    file_name='scores.json',
+                    file_hash=hash_file(json_file.name),
+                    records_processed=interrupted_at,
+                )
+                if not still_running:
+                    ImportRun.objects.filter(id=interrupted_run.id).update(
+                        updated_at=timezone.now() - timedelta(hours=1)
+                    )
+            stderr = StringIO()
+            call_command(
+                'import_user_submissions',
+                json_file.name,
+                *args,
+                stdout=StringIO(),
+                stderr=stderr,
+            )
+
+        return stderr.getvalue()
+
+    def test_import(self) -> None:
+        """Test importing submissions one at a time"""
+        stderr = self.call_command()
+
+        self.assertEqual(Submission.objects.count(), 5)
+        self.assertEqual(Competition.objects.count(), 4)
+        self.assertEqual(UserRanking.objects.get().user.username, 'jason.russell')
+        self.assertIn('with name guess', stderr)
+        self.assertIn('Failed to process a user', stderr)
+
+    def test_import_rebuilds_rankings_once(self) -> None:
+        """Test the rankings are rebuilt after the import instead of for every row"""
+        with mock.patch(
+            'leaderboard.services.RankingService.refresh_user_ranking'
+        ) as refresh_user_ranking, mock.patch(
+            'leaderboard.services.RankingService.rebuild_rankings',
+            wraps=RankingService.rebuild_rankings,
+        ) as rebuild_rankings:
+            self.call_command()
+
+        refresh_user_ranking.assert_not_called()
+        rebuild_rankings.assert_called_once_with()
+        self.assertEqual(UserRanking.objects.get().user.username, 'jason.russell')
+
+    def test_bulk_import(self) -> None:
+        """Test importing submissions in batches gives the same result"""
+        CompetitionFactory(name='long')
+        stderr = self.call_command('--bulk', '--batch-size', '2')
+
+        self.assertEqual(Submission.objects.count(), 5)
+        self.assertEqual(Competition.objects.count(), 4)
+        self.assertEqual(
+            set(User.objects.values_list('username', 'first_name', 'last_name')),
+            {
+                ('jason.russell', 'Jason', 'Russell'),
+                ('mrs.jane.smith.md', 'Jane', 'Smith'),
+            },
+        )
+        self.assertEqual(UserRanking.objects.get().user.username, 'jason.russell')
+        self.assertIn('with name guess', stderr)
+        self.assertIn('Failed to process a user', stderr)
+
+    def test_bulk_import_existing_submissions(self) -> None:
+        """Test submissions that already exist are reported as duplicates"""
+        self.call_command('--bulk')
+        stderr = self.call_command('--bulk')
+
+        self.assertEqual(Submission.objects.count(), 5)
+        self.assertEqual(stderr.count('A submission already exists'), 6)
+
+    def test_bulk_import_query_count(self) -> None:
+        """Test the amount of queries does not depend on the amount of submissions"""
+        SubmissionFactory()
+
+        with self.assertNumQueries(22):
+            self.call_command('--bulk')
+
+    def test_stream_import(self) -> None:
+        """Test streaming a gzipped file gives the same result"""
+        stderr = self.call_command('--stream', '--batch-size', '1', compress=True)
+
+        self.assertEqual(Submission.objects.count(), 5)
+        self.assertEqual(Competition.objects.count(), 4)
+        self.assertEqual(UserRanking.objects.get().user.username, 'jason.russell')
+        self.assertIn('with name guess', stderr)
+
+    def test_stream_invalid_json(self) -> None:
+        """Test streaming a file that is not a JSON array fails"""
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as json_file:
+            json_file.write('{"name": "Jason Russell"}')
+            json_file.flush()
+
+            with self.assertRaises(CommandError):
+                call_command(
+                    'import_user_submissions',
+                    json_file.name,
+                    '--stream',
+                    stdout=StringIO(),
+                    stderr=StringIO(),
+                )
+
+    def test_stream_malformed_item_not_buffered(self) -> None:
+        """Test a malformed item fails without reading the rest of the stream"""
+        stream = StringIO('[{"name": "Jason Russell", "submissions": ' + ' ' * 10000)
+        items = iter_json_array(stream, chunk_size=100, max_item_size=1000)
+
+        with self.assertRaises(json.JSONDecodeError):
+            next(items)
+        self.assertLess(stream.tell(), 2000)
+
+    def test_stream_item_size_limit(self) -> None:
+        """Test items longer than the limit fail while shorter ones are parsed"""
+        content = json.dumps([{'name': 'x' * 500}, 1234567890])
+
+        self.assertEqual(
+            len(list(iter_json_array(StringIO(content), chunk_size=10))), 2
+        )
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(StringIO(content), chunk_size=10, max_item_size=100))
+        with self.assertRaises(json.JSONDecodeError):
+            number = StringIO('[' + '1' * 500 + ']')
+            list(iter_json_array(number, chunk_size=10, max_item_size=100))
+
+    def test_workers_not_supported_by_sqlite(self) -> None:
+        """Test importing with several processes is refused on SQLite"""
+        with self.assertRaises(CommandError):
+            self.call_command('--workers', '2')
+
+    def test_import_run_recorded(self) -> None:
+        """Test each import records a completed run with its counts"""
+        self.call_command('--bulk')
+
+        import_run = ImportRun.objects.get()
+        self.assertEqual(import_run.status, ImportRun.Status.COMPLETED)
+        self.assertEqual(import_run.records_processed, 3)
+        self.assertEqual(import_run.submissions_created, 5)
+        self.assertEqual(import_run.duplicates, 1)
+        self.assertEqual(import_run.failures, 1)
+        self.assertIsNotNone(import_run.finished_at)
+
+    def test_resume(self) -> None:
+        """Test resuming skips the records committed by the interrupted run"""
+        for args in [('--bulk',), ('--stream',), ()]:
+            with self.subTest(args=args):
+                stderr = self.call_command('--resume', *args, interrupted_at=1)
+
+                self.assertFalse(User.objects.filter(username='jason.russell').exists())
+                self.assertTrue(
+                    User.objects.filter(username='mrs.jane.smith.md').exists()
+                )
+                self.assertIn('Failed to process a user', stderr)
+
+                import_run = ImportRun.objects.latest('created_at')
+                self.assertEqual(import_run.first_record, 1)
+                self.assertEqual(import_run.records_processed, 3)
+                self.assertEqual(
+                    import_run.resumed_from.status, ImportRun.Status.FAILED
+                )
+
+                User.objects.all().delete()
+                ImportRun.objects.all().delete()
+
+    def test_resume_after_resumed_run_completed(self) -> None:
+        """Test a run is not resumed again once a run resuming it has completed"""
+        self.call_command('--resume', interrupted_at=1)
+        interrupted_run = ImportRun.objects.earliest('created_at')
+
+        self.call_command('--bulk', '--resume')
+
+        import_run = ImportRun.objects.latest('created_at')
+        self.assertEqual(import_run.first_record, 0)
+        self.assertIsNone(import_run.resumed_from)
+        self.assertEqual(import_run.status, ImportRun.Status.COMPLETED)
+        self.assertEqual(interrupted_run.resumed_by.count(), 1)
+
+    def test_resume_running_import(self) -> None:
+        """Test a run that recently committed records is only resumed with --force"""
+        with self.assertRaises(CommandError):
+            self.call_command('--resume', interrupted_at=1, still_running=True)
+        self.assertEqual(ImportRun.objects.get().status, ImportRun.Status.RUNNING)
+        ImportRun.objects.all().delete()
+
+        self.call_command('--resume', '--force', interrupted_at=1, still_running=True)
+
+        import_run = ImportRun.objects.latest('created_at')
+        self.assertEqual(import_run.first_record, 1)
+        self.assertEqual(import_run.resumed_from.status, ImportRun.Status.FAILED)
+
+    def test_resume_without_interrupted_run(self) -> None:
+        """Test resuming starts from the beginning if no run was interrupted"""
+        self.call_command('--bulk', '--resume')
+
+        self.assertEqual(ImportRun.objects.get().first_record, 0)
+        self.assertEqual(Submission.objects.count(), 5)
+
+
+class ReversingExecutor:
+    """
+    Run the work of a process pool in this process, finishing every pair of
+    submitted tasks in reverse order like workers that overtake each other
+    """
+
+    def __init__(self, max_workers: int, initializer: Callable[[], None]) -> None:
+        initializer()
+        self.unfinished: List[Tuple[Future, Callable, Tuple[Any, ...]]] = []
+
+    def __enter__(self) -> 'ReversingExecutor':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.finish()
+
+    def submit(self, function: Callable, *args: Any) -> Future:
+        future: Future = Future()
+        self.unfinished.append((future, function, args))
+        if len(self.unfinished) == 2:
+            self.finish()
+
+        return future
+
+    def finish(self) -> None:
+        while self.unfinished:
+            future, function, args = self.unfinished.pop()
+            try:
+                future.set_result(function(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+
+class ParallelImporterTestCase(TestCase):
+    records = DATA + [
+        {
+            'name': 'Alan Partridge',
+            'submissions': [{'score': 2000, 'name': 'debate in "Democrat"'}],
+        }
+    ]
+
+    def import_records(
+        self, on_batch: Optional[Callable[[ImportSummary], None]] = None
+    ) -> Tuple[ImportSummary, List[Tuple[str, str, str]], List[str]]:
+        duplicates: List[Tuple[str, str, str]] = []
+        errors: List[str] = []
+        importer = ParallelImporter(
+            workers=1,
+            batch_size=1,
+            on_duplicate=lambda *duplicate: duplicates.append(duplicate),
+            on_error=errors.append,
+            on_batch=on_batch,
+        )
+        with mock.patch('leaderboard.importers.ProcessPoolExecutor', ReversingExecutor):
+            summary = importer.import_records(
+                self.records, collect_competition_names(self.records)
+            )
+
+        return summary, duplicates, errors
+
+    def test_collect_competition_names(self) -> None:
+        """Test every competition is found, ignoring unparseable submissions"""
+        records = self.records + [
+            {'name': 'Bad Submissions', 'submissions': [{'name': 'no competition'}]},
+            {'name': 'Missing Name', 'submissions': [{'score': 1}]},
+        ]
+
+        self.assertEqual(
+            collect_competition_names(records), {'Democrat', 'mother', 'long', 'nice'}
+        )
+
+    def test_import_records(self) -> None:
+        """Test the summaries of every batch are merged and reported"""
+        summary, duplicates, errors = self.import_records()
+
+        self.assertEqual(
+            summary, ImportSummary(users=4, created=6, duplicates=1, failed=1)
+        )
+        self.assertEqual(duplicates, [('jason.russell', 'long', 'guess')])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(Submission.objects.count(), 6)
+        self.assertEqual(Competition.objects.count(), 4)
+        self.assertEqual(User.objects.count(), 3)
+
+    def test_batches_reported_in_order(self) -> None:
+        """Test batches finishing out of order are reported in the record order"""
+        batches: List[ImportSummary] = []
+        self.import_records(on_batch=batches.append)
+
+        self.assertEqual(
+            batches,
+            [
+                ImportSummary(users=1, created=3, duplicates=1),
+                ImportSummary(users=1, created=2),
+                ImportSummary(users=1, failed=1),
+                ImportSummary(users=1, created=1),
+            ],
+        )
+
+    def test_merge(self) -> None:
+        """Test merging summaries adds up every count"""
+        summary = ImportSummary(users=1, created=2, duplicates=3, failed=4)
+
+        self.assertIs(summary.merge(ImportSummary(1, 1, 1, 1)), summary)
+        self.assertEqual(summary, ImportSummary(2, 3, 4, 5))
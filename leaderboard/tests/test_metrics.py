@@ -0,0 +1,164 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from prometheus_client import REGISTRY
+
+from leaderboard.metrics import can_view_metrics, generate_metrics
+from leaderboard.services import ImportRunService, RankingService, UserService
+from leaderboard.tests.factories import SubmissionFactory, UserFactory
+
+
+def get_sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        SubmissionFactory.create_batch(size=3, user=UserFactory())
+
+    def test_endpoint(self) -> None:
+        """Test the metrics are served in the Prometheus text format"""
+        self.client.get('/api/submissions/rankings/')
+
+        response = self.client.get('/metrics/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            b'leaderboard_request_duration_seconds_count{method="GET",'
+            b'status="200",view="api:submission-rankings"}',
+            response.content,
+        )
+
+    def test_endpoint_restricted(self) -> None:
+        """Test only allowed addresses, staff and the token can read the metrics"""
+        remote = {'REMOTE_ADDR': '203.0.113.7'}
+
+        self.assertEqual(self.client.get('/metrics/', **remote).status_code, 403)
+
+        with self.settings(LEADERBOARD_METRICS_ALLOWED_IPS=['203.0.113.0/24']):
+            self.assertEqual(self.client.get('/metrics/', **remote).status_code, 200)
+
+        with self.settings(LEADERBOARD_METRICS_TOKEN='secret'):
+            for authorization, status_code in [
+                ('Bearer secret', 200),
+                ('Bearer wrong', 403),
+            ]:
+                response = self.client.get(
+                    '/metrics/', HTTP_AUTHORIZATION=authorization, **remote
+                )
+                self.assertEqual(response.status_code, status_code)
+
+        request = RequestFactory().get('/metrics/', **remote)
+        request.user = UserFactory(is_staff=True)
+        self.assertTrue(can_view_metrics(request))
+
+    def test_request_duration(self) -> None:
+        """Test requests are timed per view"""
+        labels = {'view': 'api:user-list', 'method': 'GET', 'status': '200'}
+        before = get_sample('leaderboard_request_duration_seconds_count', **labels)
+
+        self.client.get('/api/users/')
+
+        self.assertEqual(
+            get_sample('leaderboard_request_duration_seconds_count', **labels),
+            before + 1,
+        )
+
+    def test_cache_requests(self) -> None:
+        """Test cached rankings count their hits, misses and build times"""
+        hits = get_sample(
+            'leaderboard_cache_requests_total', rankings='rankings', result='hit'
+        )
+        misses = get_sample(
+            'leaderboard_cache_requests_total', rankings='rankings', result='miss'
+        )
+        builds = get_sample(
+            'leaderboard_rankings_build_duration_seconds_count', rankings='rankings'
+        )
+
+        UserService.get_user_rankings()
+        UserService.get_user_rankings()
+
+        self.assertEqual(
+            get_sample(
+                'leaderboard_cache_requests_total', rankings='rankings', result='hit'
+            ),
+            hits + 1,
+        )
+        self.assertEqual(
+            get_sample(
+                'leaderboard_cache_requests_total', rankings='rankings', result='miss'
+            ),
+            misses + 1,
+        )
+        self.assertEqual(
+            get_sample(
+                'leaderboard_rankings_build_duration_seconds_count',
+                rankings='rankings',
+            ),
+            builds + 1,
+        )
+
+    def test_rebuild_duration(self) -> None:
+        """Test rebuilding the rankings is timed"""
+        before = get_sample(
+            'leaderboard_rankings_build_duration_seconds_count', rankings='rebuild'
+        )
+
+        RankingService.rebuild_rankings()
+
+        self.assertEqual(
+            get_sample(
+                'leaderboard_rankings_build_duration_seconds_count',
+                rankings='rebuild',
+            ),
+            before + 1,
+        )
+
+    def test_open_connections(self) -> None:
+        """Test the connections left open after a request are recorded"""
+        self.client.get('/api/users/')
+
+        self.assertEqual(
+            get_sample('leaderboard_db_connections_open', alias='default'), 1
+        )
+
+    def test_multiprocess(self) -> None:
+        """Test the metrics are read from the directory shared by every process"""
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                metrics = generate_metrics()
+
+        # Nothing has been written to the empty directory, so the metrics kept in
+        # this process are not reported
+        self.assertNotIn(b'leaderboard_cache_requests', metrics)
+
+
+class ImportMetricsTestCase(TransactionTestCase):
+    def test_import(self) -> None:
+        """Test only committed import records are counted"""
+        records = get_sample('leaderboard_imported_records_total')
+        runs = get_sample('leaderboard_import_runs_total', status='completed')
+
+        import_run = ImportRunService.start_import_run(
+            file_name='scores.json', file_hash='hash'
+        )
+        with transaction.atomic():
+            ImportRunService.checkpoint_import_run(
+                import_run=import_run, records=5, submissions_created=4
+            )
+        with self.assertRaises(ValueError), transaction.atomic():
+            ImportRunService.checkpoint_import_run(import_run=import_run, records=2)
+            raise ValueError('Rolled back')
+        ImportRunService.finish_import_run(import_run=import_run, status='completed')
+
+        self.assertEqual(get_sample('leaderboard_imported_records_total'), records + 5)
+        self.assertEqual(
+            get_sample('leaderboard_import_runs_total', status='completed'), runs + 1
+        )
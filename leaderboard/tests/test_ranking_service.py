@@ -0,0 +1,317 @@
+import threading
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import Optional, Tuple
+from unittest import mock, skipUnless
+from uuid import UUID
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from leaderboard.models import Submission, User, UserRanking
+from leaderboard.rankings import RankingWindow, calculate_rankings, get_window_bounds
+from leaderboard.services import RankingService, SubmissionService, UserService
+from leaderboard.tests.factories import (
+    CompetitionFactory,
+    SubmissionFactory,
+    UserFactory,
+)
+
+
+class RefreshUserRankingTestCase(TestCase):
+    def setUp(self) -> None:
+        self.users = UserFactory.create_batch(size=5)
+        for index, user in enumerate(self.users):
+            SubmissionFactory.create_batch(size=3, user=user, score=1000 * (index + 1))
+
+    def assertRankingsMatchCalculated(self) -> None:
+        stored = [
+            (ranking.user_id, ranking.total_score, ranking.rank)
+            for ranking in RankingService.get_rankings()
+        ]
+        calculated = [
+            (ranking.id, ranking.total_score, ranking.rank)
+            for ranking in calculate_rankings()
+        ]
+        self.assertEqual(sorted(stored), sorted(calculated))
+
+    def test_rankings_maintained_on_create(self) -> None:
+        """Test creating submissions keeps the stored rankings up to date"""
+        self.assertRankingsMatchCalculated()
+        self.assertEqual(
+            UserRanking.objects.get(user=self.users[-1]).rank, 1  # type: ignore
+        )
+
+        for name in ['first', 'second']:
+            SubmissionService.create_submission(
+                user=self.users[0],
+                competition=CompetitionFactory(),
+                name=name,
+                score=10000,
+            )
+
+        self.assertRankingsMatchCalculated()
+        self.assertEqual(UserRanking.objects.get(user=self.users[0]).rank, 1)
+
+    def test_rankings_maintained_on_score_change(self) -> None:
+        """Test changing a score moves the users between the old and new score"""
+        submission = Submission.objects.filter(user=self.users[-1]).first()
+        submission.score = 100
+        submission.save()
+
+        self.assertRankingsMatchCalculated()
+
+    def test_rankings_maintained_on_delete(self) -> None:
+        """Test a user losing eligibility moves everyone below them up"""
+        Submission.objects.filter(user=self.users[-1]).first().delete()
+
+        self.assertFalse(UserRanking.objects.filter(user=self.users[-1]).exists())
+        self.assertRankingsMatchCalculated()
+
+    def test_rankings_maintained_on_user_delete(self) -> None:
+        """Test deleting a user removes them from the leaderboard"""
+        self.users[-1].delete()
+
+        self.assertRankingsMatchCalculated()
+        self.assertEqual(RankingService.get_rankings().first().rank, 1)
+
+    def test_rebuild_rankings(self) -> None:
+        """Test rebuilding the rankings after writes that bypass signals"""
+        Submission.objects.bulk_create(
+            [
+                Submission(
+                    user=self.users[0],
+                    competition=CompetitionFactory(),
+                    name='bulk',
+                    score=10000,
+                )
+            ]
+        )
+
+        self.assertEqual(RankingService.rebuild_rankings(), 5)
+        self.assertRankingsMatchCalculated()
+
+    def test_user_scores_maintained(self) -> None:
+        """Test writing submissions keeps the user's score aggregates up to date"""
+        user = self.users[0]
+        user.refresh_from_db()
+        self.assertEqual((user.submission_count, user.top24_score), (3, 3000))
+
+        Submission.objects.filter(user=user).first().delete()
+
+        user.refresh_from_db()
+        self.assertEqual((user.submission_count, user.top24_score), (2, 2000))
+
+    def test_rebuild_rankings_recalculates_user_scores(self) -> None:
+        """Test rebuilding the rankings recalculates every user's aggregates"""
+        competition = CompetitionFactory()
+        Submission.objects.bulk_create(
+            [
+                Submission(
+                    user=self.users[0],
+                    competition=competition,
+                    name=f'bulk-{index}',
+                    score=10000,
+                )
+                for index in range(30)
+            ]
+        )
+
+        RankingService.rebuild_rankings()
+
+        user = User.objects.get(id=self.users[0].id)
+        self.assertEqual(user.submission_count, 33)
+        self.assertEqual(user.top24_score, 240000)
+        self.assertEqual(UserRanking.objects.get(user=user).rank, 1)
+        self.assertRankingsMatchCalculated()
+
+
+@skipUnless(
+    connection.vendor == 'postgresql', 'SQLite does not allow concurrent writers'
+)
+class ConcurrentRefreshTestCase(TransactionTestCase):
+    def setUp(self) -> None:
+        self.users = UserFactory.create_batch(size=4)
+        for index, user in enumerate(self.users):
+            SubmissionFactory.create_batch(size=3, user=user, score=1000 * (index + 1))
+
+    def test_interleaved_refreshes(self) -> None:
+        """Test two refreshes at the same time can not miss each other's changes"""
+        first, second = self.users[0], self.users[1]
+        # Both overtake every other user, so each refresh moves the other one
+        Submission.objects.filter(user=first).update(score=10000)
+        Submission.objects.filter(user=second).update(score=20000)
+
+        refresh_user_scores = UserService.refresh_user_scores
+        first_started = threading.Event()
+        first_continue = threading.Event()
+        second_finished = threading.Event()
+
+        def pause_first(*, user_id: UUID) -> Tuple[int, int]:
+            if user_id == first.id:
+                first_started.set()
+                first_continue.wait(timeout=10)
+            return refresh_user_scores(user_id=user_id)
+
+        def refresh(user_id: UUID, finished: Optional[threading.Event] = None) -> None:
+            try:
+                RankingService.refresh_user_ranking(user_id=user_id)
+            finally:
+                connection.close()
+                if finished is not None:
+                    finished.set()
+
+        with mock.patch.object(UserService, 'refresh_user_scores', pause_first):
+            threads = [threading.Thread(target=refresh, args=(first.id,))]
+            threads[0].start()
+            self.assertTrue(first_started.wait(timeout=10))
+
+            threads.append(
+                threading.Thread(target=refresh, args=(second.id, second_finished))
+            )
+            threads[1].start()
+            # The second refresh waits for the first to commit
+            self.assertFalse(second_finished.wait(timeout=0.5))
+
+            first_continue.set()
+            for thread in threads:
+                thread.join(timeout=10)
+
+        self.assertTrue(second_finished.is_set())
+        rankings = {
+            ranking.user_id: ranking.rank for ranking in UserRanking.objects.all()
+        }
+        calculated = {ranking.id: ranking.rank for ranking in calculate_rankings()}
+        self.assertEqual(rankings, calculated)
+
+
+class CompetitionRankingsTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.competition, self.other_competition = CompetitionFactory.create_batch(
+            size=2
+        )
+        self.users = UserFactory.create_batch(size=3)
+        for index, user in enumerate(self.users):
+            SubmissionFactory.create_batch(
+                size=index + 1, user=user, competition=self.competition, score=1000
+            )
+        SubmissionFactory(
+            user=self.users[0], competition=self.other_competition, score=50000
+        )
+
+    def test_competition_rankings(self) -> None:
+        """Test users are ranked by their best submissions to the competition"""
+        rankings = RankingService.get_competition_rankings(
+            competition_id=self.competition.id
+        )
+
+        self.assertEqual(
+            [(row.id, row.total_score, row.rank) for row in rankings],
+            [
+                (self.users[2].id, 3000, 1),
+                (self.users[1].id, 2000, 2),
+                (self.users[0].id, 1000, 3),
+            ],
+        )
+
+    def test_competition_rankings_cached_per_competition(self) -> None:
+        """
+        Test submissions to another competition do not invalidate a competition's
+        cached rankings but its own submissions do
+        """
+        RankingService.get_competition_rankings(competition_id=self.competition.id)
+
+        SubmissionFactory(user=self.users[1], competition=self.other_competition)
+        with self.assertNumQueries(0):
+            RankingService.get_competition_rankings(competition_id=self.competition.id)
+
+        SubmissionFactory(user=self.users[0], competition=self.competition, score=9000)
+        rankings = RankingService.get_competition_rankings(
+            competition_id=self.competition.id
+        )
+        self.assertEqual(rankings[0].id, self.users[0].id)
+
+    def test_competition_rankings_invalidated_on_user_change(self) -> None:
+        """Test renaming a user invalidates every competition's cached rankings"""
+        RankingService.get_competition_rankings(competition_id=self.competition.id)
+
+        self.users[2].first_name = 'Renamed'
+        self.users[2].save()
+
+        rankings = RankingService.get_competition_rankings(
+            competition_id=self.competition.id
+        )
+        self.assertEqual(rankings[0].first_name, 'Renamed')
+
+    def test_moved_submission_invalidates_both_competitions(self) -> None:
+        """Test moving a submission re-ranks the competition it was moved from"""
+        RankingService.get_competition_rankings(competition_id=self.competition.id)
+
+        submission = Submission.objects.filter(
+            user=self.users[0], competition=self.competition
+        ).get()
+        submission.competition = self.other_competition
+        submission.save()
+
+        rankings = RankingService.get_competition_rankings(
+            competition_id=self.competition.id
+        )
+        self.assertNotIn(self.users[0].id, [row.id for row in rankings])
+
+
+class WindowedRankingsTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.now = timezone.now()
+        self.recent, self.old = UserFactory.create_batch(size=2)
+        SubmissionFactory.create_batch(size=3, user=self.recent, score=1000)
+        SubmissionFactory.create_batch(size=3, user=self.old, score=5000)
+        Submission.objects.filter(user=self.old).update(
+            created_at=self.now - timedelta(days=60)
+        )
+        # Old submissions still count towards the window if there are enough recent
+        SubmissionFactory.create_batch(size=3, user=self.old, score=100)
+
+    def test_get_window_bounds(self) -> None:
+        """Test the start and end of each window"""
+        now = datetime(2021, 12, 16, 15, 30, 12, tzinfo=dt_timezone.utc)
+        cases = [
+            (RankingWindow.WEEK, (2021, 12, 13), (2021, 12, 20)),
+            (RankingWindow.MONTH, (2021, 12, 1), (2022, 1, 1)),
+            (RankingWindow.LAST_30_DAYS, (2021, 11, 16, 15), (2021, 12, 16, 16)),
+        ]
+        for window, start, end in cases:
+            with self.subTest(window=window):
+                self.assertEqual(
+                    get_window_bounds(window, now),
+                    (
+                        datetime(*start, tzinfo=dt_timezone.utc),
+                        datetime(*end, tzinfo=dt_timezone.utc),
+                    ),
+                )
+
+        with self.assertRaises(ValueError):
+            get_window_bounds('year', now)
+
+    def test_windowed_rankings(self) -> None:
+        """Test only submissions made within the window are ranked"""
+        rankings = UserService.get_user_rankings(window=RankingWindow.LAST_30_DAYS)
+
+        self.assertEqual(
+            [(row.id, row.total_score, row.rank) for row in rankings],
+            [(self.recent.id, 3000, 1), (self.old.id, 300, 2)],
+        )
+        self.assertEqual(UserService.get_user_rankings()[0].id, self.old.id)
+
+    def test_windowed_rankings_cached(self) -> None:
+        """Test windowed rankings are cached until the next write"""
+        UserService.get_user_rankings(window=RankingWindow.LAST_30_DAYS)
+        with self.assertNumQueries(0):
+            UserService.get_user_rankings(window=RankingWindow.LAST_30_DAYS)
+
+        SubmissionFactory(user=self.old, score=9000)
+        rankings = UserService.get_user_rankings(window=RankingWindow.LAST_30_DAYS)
+        self.assertEqual(rankings[0].id, self.old.id)
@@ -0,0 +1,47 @@
+import json
+import uuid
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from leaderboard.renderers import ORJSONRenderer, dumps, stream_json_array
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    def test_matches_json_renderer(self) -> None:
+        """Test the rendered bytes are identical to DRF's JSONRenderer"""
+        data = [
+            {
+                'id': uuid.uuid4(),
+                'created_at': timezone.now(),
+                'name': 'Zoë Smith',
+                'score': 1000,
+                'ratio': 0.5,
+                'total': Decimal('10.50'),
+                'submissions': [],
+                'last_login': None,
+            }
+        ]
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent(self) -> None:
+        """Test an indent can be asked for in the media type"""
+        rendered = ORJSONRenderer().render(
+            {'rank': 1}, accepted_media_type='application/json; indent=4'
+        )
+
+        self.assertEqual(rendered, b'{\n  "rank": 1\n}')
+
+    def test_stream_json_array(self) -> None:
+        """Test streaming rows in chunks produces the same array as encoding it"""
+        for size in [0, 1, 5, 6]:
+            with self.subTest(size=size):
+                rows = [{'rank': rank} for rank in range(size)]
+
+                body = b''.join(stream_json_array(rows, dict, chunk_size=2))
+
+                self.assertEqual(body, dumps(rows))
+                self.assertEqual(json.loads(body), rows)
@@ -0,0 +1,395 @@
+import json
+import re
+import uuid
+from datetime import timedelta
+from typing import List, Optional
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from leaderboard.models import Submission
+from leaderboard.tests.factories import (
+    CompetitionFactory,
+    SubmissionFactory,
+    UserFactory,
+)
+
+
+class RankingsAPITestCase(TestCase):
+    url = '/api/submissions/rankings/'
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.users = UserFactory.create_batch(size=5)
+        for index, user in enumerate(self.users):
+            SubmissionFactory.create_batch(size=3, user=user, score=1000 * (index + 1))
+        # Two users share third place
+        SubmissionFactory.create_batch(size=3, user=UserFactory(), score=3000)
+
+    def test_rankings_limit_offset(self) -> None:
+        """Test the rankings are paginated with limit and offset"""
+        response = self.client.get(self.url, {'limit': 2, 'offset': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Total-Count'], '6')
+        self.assertIn('rel="next"', response['Link'])
+        self.assertIn('rel="prev"', response['Link'])
+        self.assertEqual([row['rank'] for row in response.json()], [3, 3])
+
+    def test_rankings_after_rank(self) -> None:
+        """Test keyset pagination returns rows after a rank"""
+        response = self.client.get(self.url, {'limit': 2, 'after_rank': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Total-Count'], '6')
+        self.assertEqual([row['rank'] for row in response.json()], [2, 3, 3])
+        self.assertIn('after_rank=3', response['Link'])
+
+    def test_rankings_after_last_rank(self) -> None:
+        """Test there is no next page after the last rank"""
+        response = self.client.get(self.url, {'after_rank': 5})
+
+        self.assertEqual(response.json()[0]['username'], self.users[0].username)
+        self.assertNotIn('Link', response)
+
+    def test_rankings_invalid_after_rank(self) -> None:
+        """Test an invalid rank is rejected"""
+        response = self.client.get(self.url, {'after_rank': 'first'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class WindowedRankingsAPITestCase(TestCase):
+    url = '/api/submissions/rankings/'
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.users = UserFactory.create_batch(size=3)
+        for index, user in enumerate(self.users):
+            SubmissionFactory.create_batch(size=3, user=user, score=1000 * (index + 1))
+        Submission.objects.filter(user=self.users[2]).update(
+            created_at=timezone.now() - timedelta(days=60)
+        )
+
+    def test_windowed_rankings(self) -> None:
+        """Test the rankings can be limited to a window"""
+        response = self.client.get(self.url, {'window': '30d', 'limit': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Total-Count'], '2')
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    'id': str(self.users[1].id),
+                    'username': self.users[1].username,
+                    'total_score': 6000,
+                    'rank': 1,
+                }
+            ],
+        )
+
+    def test_windowed_rankings_stream(self) -> None:
+        """Test the rankings of a window can be streamed"""
+        response = self.client.get(self.url, {'window': '30d', 'stream': 'true'})
+
+        self.assertEqual(
+            [row['rank'] for row in json.loads(b''.join(response.streaming_content))],
+            [1, 2],
+        )
+
+    def test_invalid_window(self) -> None:
+        """Test an unknown window is rejected"""
+        response = self.client.get(self.url, {'window': 'year'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class CompetitionRankingsAPITestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.competition = CompetitionFactory()
+        self.users = UserFactory.create_batch(size=3)
+        for index, user in enumerate(self.users):
+            SubmissionFactory(
+                user=user, competition=self.competition, score=1000 * (index + 1)
+            )
+        SubmissionFactory(user=self.users[0], score=90000)
+        self.url = f'/api/competitions/{self.competition.id}/rankings/'
+
+    def test_competition_rankings(self) -> None:
+        """Test the rankings only count submissions to the competition"""
+        response = self.client.get(self.url, {'limit': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Total-Count'], '3')
+        self.assertIn('rel="next"', response['Link'])
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    'id': str(self.users[2].id),
+                    'username': self.users[2].username,
+                    'total_score': 3000,
+                    'rank': 1,
+                },
+                {
+                    'id': str(self.users[1].id),
+                    'username': self.users[1].username,
+                    'total_score': 2000,
+                    'rank': 2,
+                },
+            ],
+        )
+
+    def test_competition_rankings_empty(self) -> None:
+        """Test a competition without submissions has empty rankings"""
+        response = self.client.get(
+            f'/api/competitions/{CompetitionFactory().id}/rankings/'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_competition_rankings_missing(self) -> None:
+        """Test the rankings of a competition that does not exist are not found"""
+        response = self.client.get(f'/api/competitions/{uuid.uuid4()}/rankings/')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryBudgetTestCase(TestCase):
+    """Test every endpoint makes a constant amount of queries whatever the page size"""
+
+    page_sizes = [1, 20, 40]
+
+    # ATOMIC_REQUESTS wraps every request in a savepoint and its release
+    transaction_queries = 2
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.users = UserFactory.create_batch(size=40)
+        cls.competitions = CompetitionFactory.create_batch(size=40)
+        for user, competition in zip(cls.users, cls.competitions):
+            SubmissionFactory.create_batch(size=3, user=user, competition=competition)
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def assertListQueries(self, url: str, queries: int) -> None:
+        for limit in self.page_sizes:
+            with self.subTest(url=url, limit=limit):
+                with self.assertNumQueries(queries + self.transaction_queries):
+                    response = self.client.get(url, {'limit': limit})
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()), limit)
+
+    def test_users_list(self) -> None:
+        """Test listing users pages and prefetches their submissions"""
+        self.assertListQueries('/api/users/', 2)
+
+    def test_competitions_list(self) -> None:
+        """Test listing competitions pages and prefetches their submissions"""
+        self.assertListQueries('/api/competitions/', 2)
+
+    def test_submissions_list(self) -> None:
+        """Test listing submissions joins their user and competition"""
+        self.assertListQueries('/api/submissions/', 1)
+
+    def test_rankings_list(self) -> None:
+        """Test listing rankings joins their user"""
+        self.assertListQueries('/api/submissions/rankings/', 2)
+
+    def test_retrieve(self) -> None:
+        """Test retrieving a single object does not query per submission"""
+        submission = self.users[0].submissions.first()
+        urls = {
+            f'/api/users/{self.users[0].id}/': 2,
+            f'/api/competitions/{self.competitions[0].id}/': 2,
+            f'/api/submissions/{submission.id}/': 1,
+        }
+
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries + self.transaction_queries):
+                    response = self.client.get(url)
+
+                self.assertEqual(response.status_code, 200)
+
+
+class SubmissionsLimitTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.user = UserFactory()
+        self.competition = CompetitionFactory()
+        for score in [500, 100, 400, 200, 300]:
+            SubmissionFactory(user=self.user, competition=self.competition, score=score)
+        # Another user's submissions must not count towards the limit
+        SubmissionFactory.create_batch(size=3, competition=self.competition, score=50)
+
+    def test_nested_submissions_limited(self) -> None:
+        """Test only the first few submissions of each result are nested"""
+        urls = [
+            '/api/users/',
+            f'/api/users/{self.user.id}/',
+            f'/api/competitions/{self.competition.id}/',
+        ]
+
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, {'submissions_limit': 2})
+
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                if isinstance(data, list):
+                    data = next(row for row in data if row['id'] == str(self.user.id))
+                self.assertEqual(len(data['submissions']), 2)
+
+    def test_nested_submissions_in_score_order(self) -> None:
+        """Test the lowest scoring submissions are kept in order"""
+        response = self.client.get(
+            f'/api/users/{self.user.id}/', {'submissions_limit': 3}
+        )
+
+        names = [submission['name'] for submission in response.json()['submissions']]
+        expected = self.user.submissions.order_by('score').values_list(
+            'name', flat=True
+        )[:3]
+        self.assertEqual(names, list(expected))
+
+    def test_invalid_submissions_limit(self) -> None:
+        """Test a limit outside of the allowed range is rejected"""
+        for limit in ['0', '101', 'all']:
+            with self.subTest(limit=limit):
+                response = self.client.get('/api/users/', {'submissions_limit': limit})
+
+                self.assertEqual(response.status_code, 400)
+
+
+class EmptyListAPITestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_empty_page(self) -> None:
+        """Test a list with nothing on the page is returned empty"""
+        CompetitionFactory(name='Photography')
+        requests = [
+            ('/api/users/', {}),
+            ('/api/users/', {'count': 'estimate'}),
+            ('/api/competitions/', {'name': 'nomatch'}),
+        ]
+
+        for url, params in requests:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), [])
+
+
+class KeysetPaginationTestCase(TestCase):
+    url = '/api/submissions/'
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.users = UserFactory.create_batch(size=3)
+        # Several submissions share each score so the ID has to break ties
+        for index in range(10):
+            SubmissionFactory(user=self.users[index % 3], score=100 * (index // 3 + 1))
+
+    def get_link(self, response, rel: str) -> Optional[str]:
+        match = re.search(f'<([^>]+)>; rel="{rel}"', response.get('Link', ''))
+        return match.group(1) if match else None
+
+    def walk(self, url: str, rel: str, **params) -> List[List[str]]:
+        """Follow the links in one direction, returning the IDs on each page"""
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.json()])
+            link = self.get_link(response, rel)
+            if link is None:
+                return pages
+            response = self.client.get(link)
+
+    def test_pages_follow_ordering(self) -> None:
+        """Test following next links returns every row once in order"""
+        orderings = {
+            'score': ['score', 'id'],
+            '-score': ['-score', 'id'],
+            'user': ['user_id', 'id'],
+        }
+
+        for ordering, order_by in orderings.items():
+            with self.subTest(ordering=ordering):
+                pages = self.walk(self.url, 'next', limit=3, ordering=ordering)
+
+                expected = [
+                    str(submission_id)
+                    for submission_id in Submission.objects.order_by(
+                        *order_by
+                    ).values_list('id', flat=True)
+                ]
+                self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+                self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_links(self) -> None:
+        """Test following previous links from the last page returns the same pages"""
+        forward = self.walk(self.url, 'next', limit=3)
+        last_page = self.client.get(self.url, {'limit': 3})
+        while self.get_link(last_page, 'next'):
+            last_page = self.client.get(self.get_link(last_page, 'next'))
+
+        backward = self.walk(self.get_link(last_page, 'prev'), 'prev')
+
+        self.assertEqual(backward, forward[-2::-1])
+
+    def test_count_is_opt_in(self) -> None:
+        """Test the total count is only sent when asked for"""
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Total-Count', response)
+
+        response = self.client.get(self.url, {'count': 'true'})
+        self.assertEqual(response['X-Total-Count'], '10')
+
+        response = self.client.get(self.url, {'count': 'estimate'})
+        self.assertEqual(response['X-Total-Count-Estimate'], '10')
+
+    def test_offset_fallback(self) -> None:
+        """Test passing an offset uses limit/offset pagination"""
+        response = self.client.get(self.url, {'limit': 3, 'offset': 3})
+
+        self.assertEqual(response['X-Total-Count'], '10')
+        self.assertIn('offset=6', self.get_link(response, 'next'))
+
+    def test_invalid_parameters(self) -> None:
+        """Test invalid cursors and counts are rejected"""
+        for params in [{'cursor': 'nonsense'}, {'cursor': 'e30='}, {'count': 'maybe'}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+
+                self.assertEqual(response.status_code, 400)
+
+
+class StreamingTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = APIClient()
+        users = UserFactory.create_batch(size=3)
+        for index in range(9):
+            SubmissionFactory(user=users[index % 3], score=100 * (index + 1))
+
+    def test_stream(self) -> None:
+        """Test every row is streamed in the same format as the paginated list"""
+        for url in ['/api/submissions/', '/api/submissions/rankings/']:
+            with self.subTest(url=url):
+                paginated = self.client.get(url, {'limit': 40})
+                streamed = self.client.get(url, {'stream': 'true'})
+
+                self.assertTrue(streamed.streaming)
+                self.assertEqual(streamed['Content-Type'], 'application/json')
+                self.assertEqual(
+                    b''.join(streamed.streaming_content), paginated.content
+                )
@@ -0,0 +1,115 @@
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from leaderboard.services import UserService
+from leaderboard.slow_queries import explain, get_fingerprint, get_report
+from leaderboard.tests.factories import UserFactory
+
+
+@override_settings(LEADERBOARD_SLOW_QUERY_THRESHOLD=0.000001)
+class SlowQueryTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = UserFactory(username='Slow')
+        cache.clear()
+
+    def get_queries(self, caller: str) -> list:
+        return [query for query in get_report() if query['caller'] == caller]
+
+    def test_log(self) -> None:
+        """Test a slow query is logged with its caller and plan"""
+        with self.assertLogs('photocrowd', level='WARNING') as logs:
+            UserService.get_user_by_username(username='slow')
+
+        (message,) = [
+            message
+            for message in logs.output
+            if 'UserService.get_user_by_username' in message
+        ]
+        self.assertIn('LOWER', message)
+        self.assertIn("'slow'", message)
+        self.assertRegex(message, 'SEARCH|SCAN')
+
+    def test_report(self) -> None:
+        """Test repeated slow queries are added up in the report"""
+        with self.assertLogs('photocrowd', level='WARNING'):
+            UserService.get_user_by_username(username='slow')
+            UserService.get_user_by_username(username='SLOW')
+
+        (query,) = self.get_queries('UserService.get_user_by_username')
+        self.assertEqual(query['count'], 2)
+        self.assertGreaterEqual(query['total_ms'], query['duration_ms'])
+        self.assertIn('SEARCH', query['plan'])
+
+    def test_caller_outside_services(self) -> None:
+        """Test queries run outside of a service are attributed to their code"""
+        with self.assertLogs('photocrowd', level='WARNING'):
+            self.client.get('/api/users/')
+
+        self.assertTrue(
+            [
+                query
+                for query in get_report()
+                if query['caller'].startswith('leaderboard.pagination')
+            ]
+        )
+
+    @override_settings(LEADERBOARD_SLOW_QUERY_REPORT_SIZE=1)
+    def test_report_size(self) -> None:
+        """Test only the slowest queries are kept"""
+        with self.assertLogs('photocrowd', level='WARNING'):
+            UserService.get_user_by_username(username='slow')
+            UserService.get_user(user_id=self.user.id)
+
+        self.assertEqual(len(get_report()), 1)
+
+    def test_threshold(self) -> None:
+        """Test queries faster than the threshold are not recorded"""
+        with self.settings(LEADERBOARD_SLOW_QUERY_THRESHOLD=60000):
+            UserService.get_user_by_username(username='slow')
+
+        self.assertEqual(get_report(), [])
+
+    def test_fingerprint(self) -> None:
+        """Test queries only differing in the length of an IN list are grouped"""
+        self.assertEqual(
+            get_fingerprint('SELECT 1 WHERE id IN (%s, %s)'),
+            get_fingerprint('SELECT 1 WHERE id IN (%s, %s, %s)'),
+        )
+        self.assertNotEqual(
+            get_fingerprint('SELECT 1 WHERE id = %s'),
+            get_fingerprint('SELECT 2 WHERE id = %s'),
+        )
+
+    def test_explain_writes(self) -> None:
+        """Test only SELECT queries are explained"""
+        self.assertIsNone(explain(connection, 'DELETE FROM leaderboard_user', []))
+
+    def test_command(self) -> None:
+        """Test the report command shows and clears the slow queries"""
+        with tempfile.TemporaryDirectory() as directory, self.settings(
+            CACHES={
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': directory,
+                }
+            }
+        ):
+            with self.assertLogs('photocrowd', level='WARNING'):
+                UserService.get_user_by_username(username='slow')
+
+            stdout = StringIO()
+            call_command('slow_queries', '--clear', stdout=stdout)
+
+            self.assertIn('UserService.get_user_by_username', stdout.getvalue())
+            self.assertIn('SEARCH', stdout.getvalue())
+            self.assertEqual(get_report(), [])
+
+    def test_command_process_local_cache(self) -> None:
+        """Test the report command refuses to read a cache of this process only"""
+        with self.assertRaises(CommandError):
+            call_command('slow_queries', stdout=StringIO())
@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from leaderboard.services import UserService
+from leaderboard.tests.factories import SubmissionFactory, UserFactory
+from leaderboard.timing import get_server_timing, span
+
+
+def parse_server_timing(header: str) -> dict:
+    metrics = {}
+    for entry in header.split(', '):
+        name, *parameters = entry.split(';')
+        metrics[name] = dict(parameter.split('=', 1) for parameter in parameters)
+
+    return metrics
+
+
+@override_settings(LEADERBOARD_TIMING_SAMPLE_RATE=1)
+class ServerTimingTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        user = UserFactory()
+        SubmissionFactory.create_batch(size=3, user=user)
+
+    def test_api(self) -> None:
+        """Test an API response reports its queries, serializing and services"""
+        with self.assertLogs('photocrowd', level='INFO') as logs:
+            response = self.client.get('/api/submissions/rankings/')
+
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertIn('total', metrics)
+        self.assertIn('serialize', metrics)
+        self.assertIn('RankingService.get_rankings', metrics)
+        self.assertRegex(metrics['db']['desc'], r'^"\d+ queries"$')
+        self.assertGreater(float(metrics['db']['dur']), 0)
+
+        (record,) = [
+            record for record in logs.records if 'request_timing' in record.message
+        ]
+        self.assertEqual(record.timing['path'], '/api/submissions/rankings/')
+        self.assertEqual(record.timing['status'], 200)
+        self.assertIn('db_queries', record.timing)
+        self.assertIn('total_ms', record.timing)
+
+    def test_template(self) -> None:
+        """Test a page reports the time spent rendering its template"""
+        response = self.client.get('/leaderboard/')
+
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertIn('template', metrics)
+        self.assertIn('RankingService.get_ranking_rows', metrics)
+
+    def test_not_sampled(self) -> None:
+        """Test requests outside the sample are not timed"""
+        with self.settings(LEADERBOARD_TIMING_SAMPLE_RATE=0):
+            response = self.client.get('/api/submissions/rankings/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_span_outside_request(self) -> None:
+        """Test spans and services work without a sampled request"""
+        with span('outside'):
+            rankings = UserService.get_user_rankings()
+
+        self.assertEqual(len(rankings), 1)
+
+    def test_get_server_timing(self) -> None:
+        """Test the header format"""
+        self.assertEqual(
+            get_server_timing({'total': 12.5, 'db': 3.25}, 4),
+            'total;dur=12.5, db;dur=3.25;desc="4 queries"',
+        )
@@ -1,6 +1,9 @@
+from unittest import skipUnless
 from uuid import uuid4
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from leaderboard.models import Submission, User
 from leaderboard.services import UserService
@@ -64,6 +67,22 @@ class GetUserByUsernameTestCase(TestCase):
         """Test getting a User by it's username"""
         self.assertEqual(self.service(username=self.user.username), self.user)
 
+    def test_get_user_by_username_case_insensitive(self):
+        """Test getting a User by it's username ignores the case of the username"""
+        self.assertEqual(self.service(username=self.user.username.upper()), self.user)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Checks the SQLite query plan')
+    def test_get_user_by_username_uses_index(self):
+        """Test the username lookup is served by the LOWER(username) index"""
+        with CaptureQueriesContext(connection) as context:
+            self.service(username=self.user.username)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {context.captured_queries[0]["sql"]}')
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+        self.assertIn('USING INDEX user_username_lower_idx', plan)
+
     def test_get_user_with_invalid_username(self):
         """Test getting a User by it's username when the username doesn't exist"""
         with self.assertRaises(User.DoesNotExist):
@@ -111,3 +130,17 @@ class GetUserRankingsTestCase(TestCase):
             rankings[0].total_score, self.old_ranking_score  # type: ignore
         )
         self.assertEqual(rankings[0].rank, 1)  # type: ignore
+
+    def test_equal_scores_share_a_rank(self):
+        """Test users with the same ranking score are given the same rank"""
+        self.old_user.delete()
+        tied_user = UserFactory()
+        for submission in self.submissions:
+            SubmissionFactory(user=tied_user, score=submission.score)
+
+        rankings = self.service()
+
+        self.assertEqual([ranking.rank for ranking in rankings], [1, 1])
+        self.assertEqual(
+            {ranking.id for ranking in rankings}, {self.user.id, tied_user.id}
+        )
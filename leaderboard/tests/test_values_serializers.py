@@ -0,0 +1,93 @@
+from django.db.models import Prefetch
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from leaderboard.apis.rest_api import (
+    CompetitionSerializer,
+    RankingSerializer,
+    SubmissionSerializer,
+    UserSerializer,
+)
+from leaderboard.apis.values_serializers import (
+    CompetitionValuesSerializer,
+    RankingValuesSerializer,
+    SubmissionValuesSerializer,
+    UserValuesSerializer,
+    attach_submissions,
+)
+from leaderboard.models import Competition, Submission, User
+from leaderboard.services import RankingService, SubmissionService
+from leaderboard.tests.factories import SubmissionFactory, UserFactory
+
+
+class ValuesSerializerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.users = UserFactory.create_batch(size=3)
+        self.users[0].last_login = timezone.now()
+        self.users[0].save()
+        for user in self.users:
+            SubmissionFactory.create_batch(size=3, user=user)
+
+    def assertRenderedEqual(self, expected, actual) -> None:
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(expected), renderer.render(actual))
+
+    def get_submission_values(self, parent_field, rows):
+        return SubmissionService.get_submissions_per_parent(
+            parent_field=parent_field, parent_ids=[row['id'] for row in rows]
+        ).values(*SubmissionValuesSerializer.values)
+
+    def test_submissions(self) -> None:
+        """Test submission rows are serialised exactly like the model serializer"""
+        submissions = Submission.objects.order_by('id')
+
+        self.assertRenderedEqual(
+            SubmissionSerializer(submissions, many=True).data,
+            SubmissionValuesSerializer(
+                submissions.values(*SubmissionValuesSerializer.values), many=True
+            ).data,
+        )
+
+    def test_users(self) -> None:
+        """Test user rows are serialised exactly like the model serializer"""
+        users = User.objects.order_by('id')
+        rows = list(users.values(*UserValuesSerializer.values))
+        attach_submissions(rows, self.get_submission_values('user', rows), 'user')
+
+        self.assertRenderedEqual(
+            UserSerializer(
+                users.prefetch_related(
+                    Prefetch(
+                        'submissions',
+                        queryset=Submission.objects.order_by('score', 'id'),
+                    )
+                ),
+                many=True,
+            ).data,
+            UserValuesSerializer(rows, many=True).data,
+        )
+
+    def test_competitions(self) -> None:
+        """Test competition rows are serialised exactly like the model serializer"""
+        competitions = Competition.objects.order_by('id')
+        rows = list(competitions.values(*CompetitionValuesSerializer.values))
+        attach_submissions(
+            rows, self.get_submission_values('competition', rows), 'competition'
+        )
+
+        self.assertRenderedEqual(
+            CompetitionSerializer(competitions, many=True).data,
+            CompetitionValuesSerializer(rows, many=True).data,
+        )
+
+    def test_rankings(self) -> None:
+        """Test ranking rows are serialised exactly like the model serializer"""
+        rankings = RankingService.get_rankings()
+
+        self.assertRenderedEqual(
+            RankingSerializer(rankings, many=True).data,
+            RankingValuesSerializer(
+                rankings.values(*RankingValuesSerializer.values), many=True
+            ).data,
+        )
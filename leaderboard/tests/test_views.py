@@ -0,0 +1,192 @@
+import uuid
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from leaderboard.services import RankingService
+from leaderboard.tests.factories import (
+    CompetitionFactory,
+    SubmissionFactory,
+    UserFactory,
+)
+
+
+class LeaderboardViewTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.users = [
+            UserFactory(username=f'player{index}', first_name='Player', last_name='')
+            for index in range(5)
+        ]
+        self.users[0].first_name = 'Sam'
+        self.users[0].save()
+        for index, user in enumerate(self.users):
+            SubmissionFactory.create_batch(size=3, user=user, score=1000 * (index + 1))
+
+    def test_page_rows_cached(self) -> None:
+        """Test the rendered rows are cached until the leaderboard changes"""
+        first = self.client.get(reverse('leaderboard'))
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(reverse('leaderboard'))
+
+        self.assertEqual(first.content, second.content)
+        self.assertFalse([query for query in queries if 'SELECT' in query['sql']])
+
+        user = UserFactory(first_name='Newcomer', last_name='')
+        SubmissionFactory.create_batch(size=3, user=user, score=10000)
+        self.assertContains(self.client.get(reverse('leaderboard')), 'Newcomer')
+
+    def get_data(self, **params) -> dict:
+        query = {'draw': '3', 'start': '0', 'length': '10'}
+        query.update(params)
+        response = self.client.get(reverse('leaderboard-data'), query)
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def test_page_renders_first_rows(self) -> None:
+        """Test the page only renders the first page of the leaderboard"""
+        with mock.patch('leaderboard.views.LEADERBOARD_PAGE_SIZE', 2):
+            response = self.client.get(reverse('leaderboard'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row.id for row in response.context['users']()],
+            [self.users[4].id, self.users[3].id],
+        )
+        self.assertEqual(response.context['total'], 5)
+        self.assertContains(response, 'deferLoading: 5')
+        self.assertContains(response, reverse('leaderboard-data'))
+
+    def test_data_pages(self) -> None:
+        """Test the data is paged in rank order and echoes the draw counter"""
+        data = self.get_data(start='1', length='2')
+
+        self.assertEqual(data['draw'], 3)
+        self.assertEqual(data['recordsTotal'], 5)
+        self.assertEqual(data['recordsFiltered'], 5)
+        self.assertEqual(
+            [row['username'] for row in data['data']], ['player3', 'player2']
+        )
+        self.assertEqual(
+            data['data'][0],
+            {
+                'full_name': 'Player',
+                'username': 'player3',
+                'rank': 2,
+                'total_score': 12000,
+            },
+        )
+
+    def test_data_ordering(self) -> None:
+        """Test ordering by rank or score in either direction"""
+        cases = [
+            ({'order[0][column]': '2', 'order[0][dir]': 'desc'}, [1, 2, 3, 4, 5]),
+            ({'order[0][column]': '2', 'order[0][dir]': 'asc'}, [5, 4, 3, 2, 1]),
+            ({'order[0][column]': '1', 'order[0][dir]': 'asc'}, [1, 2, 3, 4, 5]),
+            ({'order[0][column]': '1', 'order[0][dir]': 'desc'}, [5, 4, 3, 2, 1]),
+        ]
+        for params, ranks in cases:
+            with self.subTest(params=params):
+                data = self.get_data(**params)
+                self.assertEqual([row['rank'] for row in data['data']], ranks)
+
+    def test_data_search(self) -> None:
+        """Test searching by username and name filters the rows"""
+        data = self.get_data(**{'search[value]': 'PLAYER3'})
+        self.assertEqual([row['username'] for row in data['data']], ['player3'])
+        self.assertEqual(data['recordsTotal'], 5)
+        self.assertEqual(data['recordsFiltered'], 1)
+
+        data = self.get_data(**{'search[value]': 'sam'})
+        self.assertEqual([row['username'] for row in data['data']], ['player0'])
+
+    def test_data_invalid(self) -> None:
+        """Test invalid paging or ordering parameters are rejected"""
+        for params in [
+            {'length': '101'},
+            {'start': '-1'},
+            {'order[0][column]': '0'},
+            {'order[0][dir]': 'sideways'},
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(reverse('leaderboard-data'), params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_data_invalid_message(self) -> None:
+        """Test the reason a request was rejected is sent back"""
+        response = self.client.get(reverse('leaderboard-data'), {'length': 'abc'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()['length'][0],
+            {'message': 'Enter a whole number.', 'code': 'invalid'},
+        )
+
+    def test_count_cached(self) -> None:
+        """Test the leaderboard total is cached until the leaderboard changes"""
+        self.assertEqual(RankingService.count_rankings(), 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(RankingService.count_rankings(), 5)
+
+        SubmissionFactory.create_batch(size=3, user=UserFactory())
+        self.assertEqual(RankingService.count_rankings(), 6)
+
+
+class CompetitionLeaderboardViewTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.competition = CompetitionFactory()
+        for index in range(3):
+            SubmissionFactory(
+                user=UserFactory(username=f'entrant{index}'),
+                competition=self.competition,
+                score=1000 * (index + 1),
+            )
+        SubmissionFactory(competition=CompetitionFactory(), score=90000)
+
+    def test_page(self) -> None:
+        """Test the page renders the competition's leaderboard"""
+        response = self.client.get(
+            reverse('competition-leaderboard', args=[self.competition.id])
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row.username for row in response.context['users']],
+            ['entrant2', 'entrant1', 'entrant0'],
+        )
+        self.assertContains(response, self.competition.name)
+        self.assertContains(
+            response,
+            reverse('competition-leaderboard-data', args=[self.competition.id]),
+        )
+
+    def test_data(self) -> None:
+        """Test the competition's leaderboard is paged, ordered and searched"""
+        url = reverse('competition-leaderboard-data', args=[self.competition.id])
+
+        response = self.client.get(
+            url, {'draw': '1', 'start': '1', 'length': '1', 'order[0][dir]': 'asc'}
+        )
+        data = response.json()
+        self.assertEqual(data['recordsTotal'], 3)
+        self.assertEqual([row['username'] for row in data['data']], ['entrant1'])
+
+        data = self.client.get(url, {'search[value]': 'ENTRANT0'}).json()
+        self.assertEqual(data['recordsFiltered'], 1)
+        self.assertEqual([row['rank'] for row in data['data']], [3])
+
+    def test_missing_competition(self) -> None:
+        """Test the leaderboard of a competition that does not exist is not found"""
+        for name in ['competition-leaderboard', 'competition-leaderboard-data']:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=[uuid.uuid4()]))
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,175 @@
+"""
+Per-request performance instrumentation
+
+:class:`ServerTimingMiddleware` times a sample of requests, set by the
+``LEADERBOARD_TIMING_SAMPLE_RATE`` setting. For each sampled request it records:
+
+- the amount and total duration of database queries
+- the time spent serializing and rendering templates
+- the time spent in each service method
+
+These are sent back as ``Server-Timing`` headers, which browser developer tools
+display, and are logged as one line per request. Requests that are not sampled only
+pay for a context variable lookup per span.
+"""
+
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional, Type, TypeVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+LOGGER = logging.getLogger('photocrowd')
+
+T = TypeVar('T')
+
+
+class RequestTimings:
+    """The durations recorded while handling a single request"""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.durations: Dict[str, float] = defaultdict(float)
+
+    def add(self, name: str, duration: float) -> None:
+        self.durations[name] += duration
+
+    def record_query(
+        self, execute: Callable, sql: str, params: Any, many: bool, context: Dict
+    ) -> Any:
+        """A database execute wrapper that times every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.add('db', time.perf_counter() - started)
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Get the recorded durations
+
+        :return: The milliseconds spent in each span, starting with the whole request.
+        """
+        metrics = {'total': time.perf_counter() - self.started, **self.durations}
+
+        return {name: round(duration * 1000, 2) for name, duration in metrics.items()}
+
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar('timings', default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time a block of code as part of the current request if it is being sampled
+
+    The time spent in spans with the same name is added up.
+
+    :param name: The name of the span, a ``Server-Timing`` metric name.
+    """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def instrument_service(cls: Type[T]) -> Type[T]:
+    """
+    Decorate a service class so each of its public static methods is timed in a
+    span named after the class and method, e.g. ``UserService.get_user``
+    """
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith('_') or not isinstance(attribute, staticmethod):
+            continue
+
+        def timed(function: Callable, span_name: str) -> Callable:
+            @wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(span_name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        setattr(
+            cls, name, staticmethod(timed(attribute.__func__, f'{cls.__name__}.{name}'))
+        )
+
+    return cls
+
+
+def get_server_timing(metrics: Dict[str, float], query_count: int) -> str:
+    """
+    Format the recorded durations as a ``Server-Timing`` header value
+
+    :param metrics: The milliseconds spent in each span.
+    :param query_count: The amount of database queries made.
+    :return: The header value.
+    """
+    entries = []
+    for name, duration in metrics.items():
+        entry = f'{name};dur={duration}'
+        if name == 'db':
+            entry += f';desc="{query_count} queries"'
+        entries.append(entry)
+
+    return ', '.join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Time a sample of requests and report where the time went in ``Server-Timing``
+    headers and the ``photocrowd`` log
+
+    The timings end when the response is returned, so the body of a streaming
+    response is not included.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        sample_rate = settings.LEADERBOARD_TIMING_SAMPLE_RATE
+        if sample_rate <= 0 or random.random() >= sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+
+        metrics = timings.get_metrics()
+        response['Server-Timing'] = get_server_timing(metrics, timings.query_count)
+
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'db_queries': timings.query_count,
+            **{f'{name}_ms': duration for name, duration in metrics.items()},
+        }
+        message = ' '.join(f'{key}={value}' for key, value in fields.items())
+        LOGGER.info(f'request_timing {message}', extra={'timing': fields})
+
+        return response
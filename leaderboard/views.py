@@ -1,9 +1,29 @@
+from functools import partial
+from typing import Any, Dict, Sequence, Tuple, Union
+from uuid import UUID
+
+from django.conf import settings
+from django.http import Http404
 from django.http.request import HttpRequest
-from django.http.response import HttpResponse
+from django.http.response import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+)
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from django.views import View
+from prometheus_client import CONTENT_TYPE_LATEST
 
-from leaderboard.services import UserService
+from leaderboard.cache import get_competition_key, get_leaderboard_version
+from leaderboard.conditional import leaderboard_conditional
+from leaderboard.forms import LEADERBOARD_PAGE_SIZE, LeaderboardTableForm
+from leaderboard.metrics import can_view_metrics, generate_metrics
+from leaderboard.models import Competition
+from leaderboard.rankings import Ranking
+from leaderboard.renderers import dumps
+from leaderboard.services import CompetitionService, RankingService
+from leaderboard.timing import span
 
 
 class HomeView(View):
@@ -20,7 +40,8 @@ class HomeView(View):
 
         :param request: The request made to the server
         """
-        return render(request, self.template_name, {'page_name': self.page_name})
+        with span('template'):
+            return render(request, self.template_name, {'page_name': self.page_name})
 
 
 class LeaderboardView(View):
@@ -31,14 +52,186 @@ class LeaderboardView(View):
     template_name = 'leaderboard.html'
     page_name = 'leaderboard'
 
+    def get_context_data(self, **kwargs) -> Dict[str, Any]:
+        """
+        Get the rows of the first page of the leaderboard and what their rendered
+        fragment is cached against
+
+        The rows are passed as a callable so they are only fetched when the
+        fragment is not cached.
+        """
+        return {
+            'users': partial(
+                RankingService.get_ranking_rows, limit=LEADERBOARD_PAGE_SIZE
+            ),
+            'rows_version': get_leaderboard_version(),
+            'total': RankingService.count_rankings(),
+        }
+
+    @method_decorator(leaderboard_conditional('leaderboard'))
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         """
         Get the leaderboard page
 
         :param request: The request made to the server
         """
-        return render(
-            request,
-            self.template_name,
-            {'page_name': self.page_name, 'users': UserService.get_user_rankings()},
+        context = self.get_context_data(**kwargs)
+
+        # The rows of the first page are fetched while rendering, unless cached
+        with span('template'):
+            return render(
+                request,
+                self.template_name,
+                {
+                    'page_name': self.page_name,
+                    'fragment_timeout': settings.LEADERBOARD_CACHE_TIMEOUT,
+                    'page_size': LEADERBOARD_PAGE_SIZE,
+                    **context,
+                },
+            )
+
+
+class CompetitionLeaderboardView(LeaderboardView):
+    """
+    This view displays the leaderboard of a single competition
+    """
+
+    template_name = 'competition_leaderboard.html'
+
+    def get_context_data(self, **kwargs) -> Dict[str, Any]:
+        competition = get_competition_or_404(kwargs['competition_id'])
+        rankings = RankingService.get_competition_rankings(
+            competition_id=competition.id
+        )
+
+        return {
+            'competition': competition,
+            'users': rankings[:LEADERBOARD_PAGE_SIZE],
+            'rows_version': get_competition_key(competition.id, 'rows'),
+            'total': len(rankings),
+        }
+
+
+class LeaderboardDataView(View):
+    """
+    This view pages, orders and searches the leaderboard for server side DataTables
+    """
+
+    def get_page(
+        self, form: LeaderboardTableForm, **kwargs
+    ) -> Tuple[Sequence[Ranking], int, int]:
+        """
+        Get the rows of the requested page
+
+        :param form: The validated DataTables parameters.
+        :return: The rows of the page, the amount of rows on the leaderboard and the
+            amount of rows matching the search.
+        """
+        search = form.cleaned_data['search']
+        rows = RankingService.get_ranking_rows(
+            search=search,
+            descending=form.descending_rank,
+            offset=form.cleaned_data['start'],
+            limit=form.cleaned_data['length'],
+        )
+        total = RankingService.count_rankings()
+        filtered = RankingService.count_rankings(search=search) if search else total
+
+        return rows, total, filtered
+
+    @method_decorator(leaderboard_conditional('leaderboard'))
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Get a page of the leaderboard as DataTables JSON
+
+        :param request: The request made to the server
+        """
+        form = LeaderboardTableForm.from_query(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(
+                dumps(form.errors.get_json_data()), content_type='application/json'
+            )
+
+        rows, total, filtered = self.get_page(form, **kwargs)
+
+        with span('serialize'):
+            body = dumps(
+                {
+                    'draw': form.cleaned_data['draw'],
+                    'recordsTotal': total,
+                    'recordsFiltered': filtered,
+                    'data': [
+                        {
+                            'full_name': row.get_full_name(),
+                            'username': row.username,
+                            'rank': row.rank,
+                            'total_score': row.total_score,
+                        }
+                        for row in rows
+                    ],
+                }
+            )
+
+        return HttpResponse(body, content_type='application/json')
+
+
+class CompetitionLeaderboardDataView(LeaderboardDataView):
+    """
+    This view pages, orders and searches the leaderboard of a single competition
+    for server side DataTables
+    """
+
+    def get_page(
+        self, form: LeaderboardTableForm, **kwargs
+    ) -> Tuple[Sequence[Ranking], int, int]:
+        competition = get_competition_or_404(kwargs['competition_id'])
+        rankings = RankingService.get_competition_rankings(
+            competition_id=competition.id
+        )
+
+        # The whole competition leaderboard is cached so it is paged in memory
+        rows = RankingService.search_ranking_rows(
+            rankings, search=form.cleaned_data['search']
         )
+        if form.descending_rank:
+            rows = rows[::-1]
+        start = form.cleaned_data['start']
+        end = start + form.cleaned_data['length']
+
+        return (
+            rows[start:end],
+            len(rankings),
+            len(rows),
+        )
+
+
+class MetricsView(View):
+    """
+    This view exposes the metrics of every worker in the Prometheus text format to
+    the scrapers and users allowed by :func:`leaderboard.metrics.can_view_metrics`
+    """
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Get the metrics
+
+        :param request: The request made to the server
+        """
+        if not can_view_metrics(request):
+            return HttpResponseForbidden()
+
+        return HttpResponse(generate_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+def get_competition_or_404(competition_id: Union[UUID, str]) -> Competition:
+    """
+    Get a :class:`Competition` or raise :class:`django.http.Http404` if it does not
+    exist
+
+    :param competition_id: The ID of the :class:`Competition`.
+    :return: The :class:`Competition`.
+    """
+    try:
+        return CompetitionService.get_competition(competition_id=competition_id)
+    except Competition.DoesNotExist:
+        raise Http404('No competition matches the given query.')